@@ -0,0 +1,128 @@
+import asyncio
+import json
+import logging
+import os
+import re
+import time
+from urllib.parse import urlsplit, parse_qs
+
+logger = logging.getLogger()
+
+CART_MOCK_DIR = os.path.join('test_data', 'cart_mock')
+
+# URL patterns of the cart endpoints called by product and cart pages. Regexes rather than globs:
+# in a Playwright glob "*" stops at "/", and mtop URLs continue with a version path
+# (/h5/mtop.lazada.carts.ultron.add/1.0/?...), so "**/mtop...add*" never matched them.
+CART_ENDPOINTS = {
+    'add': re.compile(r"/(?:cart/api/add|mtop\.lazada\.carts\.ultron\.add|mtop\.lazada\.trade\.cart\.add)(?:[/?]|$)",
+                      re.IGNORECASE),
+    'list': re.compile(r"/(?:cart/api/(?:list|count)|mtop\.lazada\.carts\.ultron\.(?:cartlist|count))(?:[/?]|$)",
+                       re.IGNORECASE)
+}
+
+# Fixture responses used when no override exists in test_data/cart_mock/
+DEFAULT_FIXTURES = {
+    'add': {
+        "success": True,
+        "ret": ["SUCCESS::Thêm vào giỏ hàng thành công"],
+        "data": {"success": True, "message": "Đã thêm sản phẩm vào giỏ hàng"}
+    },
+    'list': {
+        "success": True,
+        "ret": ["SUCCESS::SUCCESS"],
+        "data": {"cartCount": 0, "items": []}
+    }
+}
+
+
+class CartMock:
+    """
+    Intercept cart add/list endpoints and answer them from fixture responses.
+
+    Added items are kept in memory so the list endpoint reflects what the UI
+    added during the test. `latency_ms` delays every mocked answer to keep
+    the UI flow realistic while staying deterministic. Endpoints passed to
+    `expect()` must have been answered by the time `verify()` runs, which
+    proves the routes actually intercepted the page's requests.
+    """
+
+    def __init__(self, latency_ms=200, fixtures_dir=CART_MOCK_DIR):
+        self.latency_ms = latency_ms
+        self.fixtures = {name: self._load_fixture(fixtures_dir, name, body)
+                         for name, body in DEFAULT_FIXTURES.items()}
+        self.items = []
+        self.calls = {name: 0 for name in CART_ENDPOINTS}
+        self.expected = set()
+        self._events = {name: asyncio.Event() for name in CART_ENDPOINTS}
+
+    @staticmethod
+    def _load_fixture(fixtures_dir, name, default):
+        path = os.path.join(fixtures_dir, f"{name}.json")
+        if os.path.exists(path):
+            try:
+                with open(path, "r", encoding="utf-8") as file:
+                    return json.load(file)
+            except Exception as e:
+                logger.warning(f"Could not load cart mock fixture {path}: {str(e)}")
+        return default
+
+    async def install(self, context):
+        """Route the cart endpoints of a browser context to the mock"""
+        for name, pattern in CART_ENDPOINTS.items():
+            await context.route(pattern, lambda route, request, n=name: self._handle(n, route, request))
+        logger.info(f"Cart API mock installed (latency {self.latency_ms} ms)")
+
+    def _item_from_request(self, request):
+        item = {'added_at': time.time()}
+        query = parse_qs(urlsplit(request.url).query)
+        for key in ('itemId', 'skuId', 'quantity'):
+            if key in query:
+                item[key] = query[key][0]
+        try:
+            body = request.post_data_json
+            if isinstance(body, dict):
+                item.update({k: body[k] for k in ('itemId', 'skuId', 'quantity') if k in body})
+        except Exception:
+            pass
+        return item
+
+    async def _handle(self, name, route, request):
+        self.calls[name] += 1
+        if self.latency_ms:
+            await asyncio.sleep(self.latency_ms / 1000)
+
+        body = json.loads(json.dumps(self.fixtures[name]))
+        if name == 'add':
+            self.items.append(self._item_from_request(request))
+        elif isinstance(body.get('data'), dict):
+            body['data']['items'] = body['data'].get('items', []) + self.items
+            body['data']['cartCount'] = len(body['data']['items'])
+
+        logger.info(f"Cart mock answered '{name}' request: {request.url}")
+        await route.fulfill(
+            status=200,
+            content_type="application/json;charset=UTF-8",
+            headers={"Access-Control-Allow-Origin": request.headers.get("origin", "*"),
+                     "Access-Control-Allow-Credentials": "true"},
+            body=json.dumps(body, ensure_ascii=False)
+        )
+        self._events[name].set()
+
+    async def wait_for(self, name, timeout=5000):
+        """Wait until the mock has answered at least one request of the given endpoint"""
+        try:
+            await asyncio.wait_for(self._events[name].wait(), timeout / 1000)
+            return True
+        except asyncio.TimeoutError:
+            return False
+
+    def expect(self, name):
+        """Require at least one request of the endpoint before verify()"""
+        self.expected.add(name)
+
+    def verify(self):
+        missed = sorted(name for name in self.expected if self.calls[name] == 0)
+        assert not missed, f"Cart mock never intercepted {', '.join(missed)} requests (calls: {self.calls})"
+
+    def report(self):
+        logger.info(f"Cart mock calls: {self.calls}, items in cart: {len(self.items)}")
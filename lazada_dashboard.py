@@ -0,0 +1,196 @@
+import bisect
+import html
+import json
+import logging
+import math
+import os
+import time
+from datetime import datetime
+from lazada_history import RunIndex
+from lazada_report import compile_template
+
+logger = logging.getLogger()
+
+AGGREGATES_PATH = os.path.join('test_data', 'aggregates.json')
+DASHBOARD_PATH = os.path.join('reports', 'dashboard.html')
+
+# Rows shown on the dashboard; older buckets stay in the aggregates file
+DASHBOARD_DAYS = 90
+DASHBOARD_WEEKS = 52
+
+
+def percentile(sorted_values, fraction):
+    """Nearest-rank percentile of an already sorted list"""
+    if not sorted_values:
+        return 0.0
+    return sorted_values[max(1, math.ceil(len(sorted_values) * fraction)) - 1]
+
+
+def run_artifact_bytes(store, run_id):
+    """Bytes of the distinct screenshot objects referenced by a run"""
+    return sum({entry['hash']: entry['size'] for entry in store.entries(run_id=run_id)}.values())
+
+
+def _new_bucket():
+    return {'run_ids': [], 'tests_total': 0, 'passed': 0, 'failed': 0, 'skipped': 0,
+            'pass_rate': 0.0, 'artifact_bytes': 0, 'tests': {}}
+
+
+class DashboardAggregates:
+    """
+    Daily and weekly aggregates over indexed runs, kept in one JSON file.
+
+    `add_run()` folds a single run summary into its day and ISO week and
+    refreshes only those two buckets' derived figures (pass rate, per-test
+    median and p95 duration), so the cost of an update does not depend on
+    how many runs came before. A run already counted is ignored.
+    """
+
+    def __init__(self, path=AGGREGATES_PATH):
+        self.path = path
+        self.data = {'daily': {}, 'weekly': {}}
+        if os.path.exists(path):
+            try:
+                with open(path, "r", encoding="utf-8") as file:
+                    self.data = json.load(file)
+            except Exception as e:
+                logger.warning(f"Could not load dashboard aggregates {path}: {str(e)}")
+
+    @property
+    def empty(self):
+        return not self.data['daily']
+
+    def add_run(self, summary, artifact_bytes=0):
+        """Fold a RunIndex summary into its buckets, return False if it was already counted"""
+        started = datetime.fromtimestamp(summary['timestamp'])
+        year, week, _ = started.isocalendar()
+        keys = (('daily', started.strftime("%Y-%m-%d")), ('weekly', f"{year}-W{week:02d}"))
+        if summary['run_id'] in self.data['daily'].get(keys[0][1], {}).get('run_ids', []):
+            return False
+
+        for period, key in keys:
+            bucket = self.data[period].setdefault(key, _new_bucket())
+            bucket['run_ids'].append(summary['run_id'])
+            bucket['tests_total'] += summary['total']
+            for outcome in ('passed', 'failed', 'skipped'):
+                bucket[outcome] += summary[outcome]
+            bucket['artifact_bytes'] += artifact_bytes
+            executed = bucket['passed'] + bucket['failed']
+            bucket['pass_rate'] = round(bucket['passed'] / executed * 100, 1) if executed else 0.0
+
+            for nodeid, result in summary['tests'].items():
+                test = bucket['tests'].setdefault(nodeid, {'durations': [], 'runs': 0, 'failures': 0})
+                test['runs'] += 1
+                test['failures'] += result['outcome'] == 'failed'
+                if result['outcome'] != 'skipped':
+                    # Kept sorted so the percentiles are a lookup
+                    bisect.insort(test['durations'], result['duration'])
+                    test['median'] = percentile(test['durations'], 0.5)
+                    test['p95'] = percentile(test['durations'], 0.95)
+        return True
+
+    def save(self):
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        temp_path = f"{self.path}.{os.getpid()}.tmp"
+        with open(temp_path, "w", encoding="utf-8") as file:
+            json.dump(self.data, file, ensure_ascii=False)
+        os.replace(temp_path, self.path)
+
+    def write_html(self, path=DASHBOARD_PATH):
+        """Write the static dashboard from the stored aggregates; nothing is recomputed"""
+        escape = html.escape
+        period_row = compile_template(DASHBOARD_PERIOD_ROW)
+        test_row = compile_template(DASHBOARD_TEST_ROW)
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        temp_path = f"{path}.{os.getpid()}.tmp"
+        with open(temp_path, "w", encoding="utf-8") as file:
+            file.write(compile_template(DASHBOARD_HEAD)(generated=datetime.now().strftime('%d/%m/%Y %H:%M:%S')))
+            for period, title, limit in (('daily', "Theo ngày", DASHBOARD_DAYS), ('weekly', "Theo tuần", DASHBOARD_WEEKS)):
+                file.write(compile_template(DASHBOARD_PERIOD_START)(title=title))
+                for key in sorted(self.data[period], reverse=True)[:limit]:
+                    bucket = self.data[period][key]
+                    file.write(period_row(key=escape(key), runs=len(bucket['run_ids']), tests=bucket['tests_total'],
+                                          passed=bucket['passed'], failed=bucket['failed'],
+                                          pass_rate=bucket['pass_rate'],
+                                          artifact_mb=bucket['artifact_bytes'] / 1024 / 1024))
+                file.write("</tbody>\n</table>\n")
+
+            if self.data['weekly']:
+                week = max(self.data['weekly'])
+                tests = self.data['weekly'][week]['tests']
+                longest = max((test.get('p95', 0) for test in tests.values()), default=0) or 1
+                file.write(compile_template(DASHBOARD_TESTS_START)(week=escape(week)))
+                for nodeid in sorted(tests, key=lambda nodeid: tests[nodeid].get('p95', 0), reverse=True):
+                    test = tests[nodeid]
+                    file.write(test_row(name=escape(nodeid.split("::")[-1]), runs=test['runs'],
+                                        failures=test['failures'], median=test.get('median', 0),
+                                        p95=test.get('p95', 0), bar=round(test.get('p95', 0) / longest * 100)))
+                file.write("</tbody>\n</table>\n")
+            file.write("</body>\n</html>\n")
+        os.replace(temp_path, path)
+        return path
+
+
+def update_dashboard(run_id, store=None, aggregates_path=AGGREGATES_PATH, dashboard_path=DASHBOARD_PATH):
+    """
+    Add a finished run to the aggregates and rewrite the dashboard.
+
+    The first call backfills every run already in the run index; after
+    that each call only folds in the given run.
+    """
+    start = time.perf_counter()
+    index = RunIndex()
+    aggregates = DashboardAggregates(aggregates_path)
+    run_ids = [record['run_id'] for record in index.runs()] if aggregates.empty else []
+    if run_id not in run_ids:
+        run_ids.append(run_id)
+    for indexed_run in run_ids:
+        try:
+            summary = index.load(indexed_run)
+        except KeyError:
+            continue
+        aggregates.add_run(summary, run_artifact_bytes(store, indexed_run) if store else 0)
+    aggregates.save()
+    aggregates.write_html(dashboard_path)
+    logger.info(f"Dashboard updated with {len(run_ids)} run(s): {dashboard_path} "
+                f"({(time.perf_counter() - start) * 1000:.0f} ms)")
+    return dashboard_path
+
+
+DASHBOARD_HEAD = """<!DOCTYPE html>
+<html lang="vi">
+<head>
+<meta charset="utf-8">
+<title>Dashboard kiểm thử Lazada</title>
+<style>
+    body {{ font-family: Arial, sans-serif; margin: 20px; color: #333; }}
+    h1, h2 {{ color: #2c3e50; }}
+    table {{ border-collapse: collapse; width: 100%; margin: 10px 0 30px 0; }}
+    th, td {{ border: 1px solid #ddd; padding: 6px 10px; text-align: left; }}
+    th {{ background-color: #f2f2f2; }}
+    .bar {{ background-color: #007bff; height: 10px; }}
+    .rate {{ font-weight: bold; }}
+</style>
+</head>
+<body>
+<h1>Dashboard kiểm thử Lazada</h1>
+<p>Cập nhật lúc: {generated}</p>
+"""
+
+DASHBOARD_PERIOD_START = """<h2>{title}</h2>
+<table>
+<thead><tr><th>Thời gian</th><th>Số lần chạy</th><th>Số test</th><th>Đạt</th><th>Lỗi</th><th>Tỷ lệ đạt</th><th>Dung lượng ảnh (MB)</th></tr></thead>
+<tbody>
+"""
+
+DASHBOARD_PERIOD_ROW = """<tr><td>{key}</td><td>{runs}</td><td>{tests}</td><td>{passed}</td><td>{failed}</td><td class="rate">{pass_rate:.1f}%</td><td>{artifact_mb:.1f}</td></tr>
+"""
+
+DASHBOARD_TESTS_START = """<h2>Thời gian từng test tuần {week}</h2>
+<table>
+<thead><tr><th>Test</th><th>Số lần chạy</th><th>Số lần lỗi</th><th>Trung vị (s)</th><th>p95 (s)</th><th></th></tr></thead>
+<tbody>
+"""
+
+DASHBOARD_TEST_ROW = """<tr><td>{name}</td><td>{runs}</td><td>{failures}</td><td>{median:.2f}</td><td>{p95:.2f}</td><td style="width:30%"><div class="bar" style="width:{bar}%"></div></td></tr>
+"""
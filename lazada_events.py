@@ -0,0 +1,233 @@
+import json
+import logging
+import os
+import threading
+import time
+import xml.etree.ElementTree as ET
+from datetime import datetime
+
+import pytest
+
+logger = logging.getLogger()
+
+EVENTS_DIR = os.path.join('reports', 'events')
+
+
+def current_run_id():
+    """Session id shared by every pytest process of a run (TEST_RUN_ID)"""
+    return os.environ.setdefault('TEST_RUN_ID', datetime.now().strftime("%Y%m%d_%H%M%S"))
+
+
+def events_path(run_id, events_dir=EVENTS_DIR):
+    return os.path.join(events_dir, f"{run_id}.jsonl")
+
+
+def junit_path(run_id, events_dir=EVENTS_DIR):
+    return os.path.join(events_dir, f"{run_id}.xml")
+
+
+class EventStream:
+    """
+    Append-only JSONL writer. Each event is one write of one line in append
+    mode, so concurrent pytest processes and writer threads never interleave
+    partial lines.
+    """
+
+    def __init__(self, path, run_id):
+        self.path = path
+        self.run_id = run_id
+        self._lock = threading.Lock()
+
+    def emit(self, event_type, **fields):
+        event = {'type': event_type, 'run': self.run_id, 'ts': round(time.time(), 3), 'pid': os.getpid()}
+        event.update(fields)
+        line = json.dumps(event, ensure_ascii=False) + "\n"
+        try:
+            with self._lock:
+                os.makedirs(os.path.dirname(self.path), exist_ok=True)
+                with open(self.path, "a", encoding="utf-8") as file:
+                    file.write(line)
+        except Exception as e:
+            logger.warning(f"Failed to write {event_type} event: {str(e)}")
+
+
+class EventReader:
+    """Incremental reader: each call parses only the complete lines appended since the previous one"""
+
+    def __init__(self, path):
+        self.path = path
+        self.offset = 0
+
+    def read_new(self):
+        try:
+            size = os.path.getsize(self.path)
+        except OSError:
+            return []
+        if size <= self.offset:
+            return []
+        with open(self.path, "rb") as file:
+            file.seek(self.offset)
+            chunk = file.read(size - self.offset)
+        complete = chunk.rfind(b"\n") + 1
+        self.offset += complete
+        events = []
+        for line in chunk[:complete].splitlines():
+            try:
+                events.append(json.loads(line))
+            except ValueError:
+                continue
+        return events
+
+
+def read_events(path):
+    return EventReader(path).read_new()
+
+
+def summarize_events(events):
+    """Outcome counts and the last test_end event of every test"""
+    tests = {}
+    for event in events:
+        if event['type'] == 'test_end':
+            tests[event['nodeid']] = event
+    counts = {'passed': 0, 'failed': 0, 'skipped': 0}
+    for event in tests.values():
+        counts[event['outcome']] = counts.get(event['outcome'], 0) + 1
+    return {'tests': tests, 'total': len(tests), **counts}
+
+
+def is_error(event):
+    """A failure outside the test body (fixture setup or teardown), reported as a JUnit error"""
+    return event['outcome'] == 'failed' and event.get('when', 'call') != 'call'
+
+
+def write_junit(events, path):
+    """Write a JUnit XML testsuite for the test_end events of a session"""
+    summary = summarize_events(events)
+    errors = sum(is_error(event) for event in summary['tests'].values())
+    suite = ET.Element("testsuite", name="lazada", tests=str(summary['total']),
+                       failures=str(summary['failed'] - errors), errors=str(errors), skipped=str(summary['skipped']),
+                       time=f"{sum(e['duration'] for e in summary['tests'].values()):.3f}")
+    for nodeid, event in summary['tests'].items():
+        parts = nodeid.split("::")
+        case = ET.SubElement(suite, "testcase", classname=".".join(parts[:-1]).replace(".py", ""),
+                             name=parts[-1], time=f"{event['duration']:.3f}")
+        if event['outcome'] == 'failed':
+            failure = ET.SubElement(case, "error" if is_error(event) else "failure",
+                                    message=(event.get('message') or "")[:500])
+            failure.text = event.get('error') or ""
+        elif event['outcome'] == 'skipped':
+            ET.SubElement(case, "skipped", message=(event.get('message') or "")[:500])
+    temp_path = f"{path}.{os.getpid()}.tmp"
+    ET.ElementTree(suite).write(temp_path, encoding="utf-8", xml_declaration=True)
+    os.replace(temp_path, path)
+
+
+_stream = None
+
+
+def get_stream():
+    """Event stream of the current run, shared by the plugin hooks and the test module"""
+    global _stream
+    if _stream is None:
+        run_id = current_run_id()
+        _stream = EventStream(events_path(run_id), run_id)
+    return _stream
+
+
+def emit(event_type, **fields):
+    get_stream().emit(event_type, **fields)
+
+
+# =============== PYTEST PLUGIN HOOKS ===============
+# Loaded with `-p lazada_events` (the only way it is loaded, so session_start is
+# never missed): every pytest process of a session appends to
+# reports/events/<run id>.jsonl, appends its finished tests to the session
+# report from those events and rebuilds the session's JUnit XML when it ends.
+
+_phases = {}  # nodeid -> phase reports seen so far
+_report_reader = None
+_session_report = None
+
+
+def _test_end_fields(reports):
+    """
+    Outcome of a test from all of its phase reports: the first failed phase
+    decides, so a failing teardown overrides a passing call; otherwise a
+    skipped setup or call makes it skipped.
+    """
+    durations = {report.when: round(report.duration, 3) for report in reports}
+    deciding = next((report for report in reports if report.failed), None)
+    if deciding is None:
+        deciding = next((report for report in reports if report.skipped), None)
+    if deciding is None:
+        deciding = next((report for report in reports if report.when == "call"), reports[0])
+    message = None
+    if deciding.failed:
+        crash = getattr(deciding.longrepr, 'reprcrash', None)
+        message = crash.message if crash else (deciding.longreprtext.strip().splitlines() or [None])[-1]
+    elif deciding.skipped and isinstance(deciding.longrepr, tuple):
+        message = deciding.longrepr[2]
+    return {
+        'outcome': deciding.outcome,
+        'when': deciding.when,
+        # Test body time, or setup time when the body never ran
+        'duration': durations.get('call', durations.get('setup', 0.0)),
+        'phases': durations,
+        'message': message,
+        'error': deciding.longreprtext[-5000:] if deciding.failed else None
+    }
+
+
+def _update_session_report():
+    """Feed this process' new events to the session report, which appends a block per finished test"""
+    global _session_report
+    if _report_reader is None:
+        return
+    try:
+        from lazada_report import SessionReport
+        if _session_report is None:
+            _session_report = SessionReport(get_stream().run_id)
+        pid = os.getpid()
+        _session_report.add_events([event for event in _report_reader.read_new() if event.get('pid') == pid])
+    except Exception as e:
+        logger.warning(f"Failed to update session report: {str(e)}")
+
+
+def pytest_sessionstart(session):
+    global _report_reader
+    stream = get_stream()
+    _report_reader = EventReader(stream.path)
+    try:
+        _report_reader.offset = os.path.getsize(stream.path)
+    except OSError:
+        pass
+    emit('session_start', args=list(session.config.invocation_params.args))
+
+
+@pytest.hookimpl(hookwrapper=True)
+def pytest_runtest_makereport(item, call):
+    outcome = yield
+    report = outcome.get_result()
+    # Expose the phase reports to fixtures (rep_setup, rep_call) so teardown knows the outcome
+    setattr(item, f"rep_{report.when}", report)
+
+
+def pytest_runtest_logstart(nodeid, location):
+    emit('test_start', nodeid=nodeid)
+
+
+def pytest_runtest_logreport(report):
+    # One test_end per test, once teardown has reported and the outcome is final
+    _phases.setdefault(report.nodeid, []).append(report)
+    if report.when == "teardown":
+        emit('test_end', nodeid=report.nodeid, **_test_end_fields(_phases.pop(report.nodeid)))
+        _update_session_report()
+
+
+def pytest_sessionfinish(session, exitstatus):
+    emit('session_end', exitstatus=int(exitstatus))
+    stream = get_stream()
+    try:
+        write_junit(read_events(stream.path), junit_path(stream.run_id))
+    except Exception as e:
+        logger.warning(f"Failed to write JUnit XML: {str(e)}")
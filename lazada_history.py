@@ -0,0 +1,351 @@
+import itertools
+import html
+import json
+import logging
+import os
+import statistics
+import time
+from lazada_events import EVENTS_DIR, events_path, read_events
+from lazada_report import compile_template
+
+logger = logging.getLogger()
+
+RUNS_DIR = os.path.join('test_data', 'runs')
+TRACING_LOG = os.path.join('reports', 'tracing.jsonl')
+
+# Steps are "newly slow" when they grow by more than this fraction and at least MIN_SLOW_DELTA seconds
+SLOW_THRESHOLD = 0.2
+MIN_SLOW_DELTA = 0.5
+
+
+def summarize_run(run_id, events):
+    """
+    Condense the event stream of a run into per-test outcomes and durations.
+
+    A step lasts from its step event to the next step of the same test, or
+    to the test's test_end for the last one. Repeated step names get a
+    "#2", "#3" suffix so they stay comparable between runs.
+    """
+    tests = {}
+    steps = {}
+    started = None
+    for event in events:
+        if event['type'] == 'session_start' and started is None:
+            started = event['ts']
+        elif event['type'] == 'step':
+            steps.setdefault(event.get('nodeid'), []).append((event['ts'], event['step']))
+        elif event['type'] == 'test_end':
+            tests[event['nodeid']] = {'outcome': event['outcome'], 'duration': event['duration'],
+                                      'message': event.get('message'), 'end': event['ts'], 'steps': {}}
+
+    for nodeid, marks in steps.items():
+        if nodeid not in tests:
+            continue
+        marks.sort()
+        seen = {}
+        for position, (ts, step) in enumerate(marks):
+            seen[step] = seen.get(step, 0) + 1
+            name = step if seen[step] == 1 else f"{step}#{seen[step]}"
+            end = marks[position + 1][0] if position + 1 < len(marks) else tests[nodeid]['end']
+            tests[nodeid]['steps'][name] = round(max(end - ts, 0.0), 3)
+    for result in tests.values():
+        del result['end']
+
+    outcomes = [result['outcome'] for result in tests.values()]
+    return {
+        'run_id': run_id,
+        'timestamp': started or (events[0]['ts'] if events else time.time()),
+        'total': len(tests),
+        'passed': outcomes.count('passed'),
+        'failed': outcomes.count('failed'),
+        'skipped': outcomes.count('skipped'),
+        'duration': round(sum(result['duration'] for result in tests.values()), 3),
+        'tests': tests
+    }
+
+
+class RunIndex:
+    """
+    Per-run summaries stored as test_data/runs/<run id>.json plus an
+    append-only index.jsonl listing them.
+
+    A summary is built once from the run's event stream when the run ends,
+    so loading any run is a single small file read no matter how many runs
+    exist or whether the event file has since been archived.
+    """
+
+    def __init__(self, runs_dir=RUNS_DIR, events_dir=EVENTS_DIR):
+        self.runs_dir = runs_dir
+        self.events_dir = events_dir
+        self.index_path = os.path.join(runs_dir, 'index.jsonl')
+
+    def run_path(self, run_id):
+        return os.path.join(self.runs_dir, f"{run_id}.json")
+
+    def record(self, run_id):
+        """Build (or rebuild) the summary of a run from its events and list it in the index"""
+        path = events_path(run_id, self.events_dir)
+        if not os.path.exists(path):
+            raise KeyError(f"No events recorded for run {run_id}")
+        summary = summarize_run(run_id, read_events(path))
+        os.makedirs(self.runs_dir, exist_ok=True)
+        is_new = not os.path.exists(self.run_path(run_id))
+        temp_path = f"{self.run_path(run_id)}.{os.getpid()}.tmp"
+        with open(temp_path, "w", encoding="utf-8") as file:
+            json.dump(summary, file, ensure_ascii=False)
+        os.replace(temp_path, self.run_path(run_id))
+        if is_new:
+            record = {key: summary[key] for key in ('run_id', 'timestamp', 'total', 'passed', 'failed', 'skipped', 'duration')}
+            with open(self.index_path, "a", encoding="utf-8") as file:
+                file.write(json.dumps(record) + "\n")
+        logger.info(f"Run {run_id} indexed: {summary['passed']}/{summary['total']} passed")
+        return summary
+
+    def load(self, run_id):
+        """Return the summary of a run, indexing it from its events on first use"""
+        try:
+            with open(self.run_path(run_id), "r", encoding="utf-8") as file:
+                return json.load(file)
+        except FileNotFoundError:
+            return self.record(run_id)
+
+    def runs(self):
+        """Index records of every indexed run, oldest first"""
+        if not os.path.exists(self.index_path):
+            return []
+        records = {}
+        with open(self.index_path, "r", encoding="utf-8") as file:
+            for line in file:
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    continue
+                records[record['run_id']] = record
+        return sorted(records.values(), key=lambda record: record['timestamp'])
+
+    def recent(self, limit):
+        """Index records of the `limit` most recently indexed runs, newest first"""
+        return list(itertools.islice(self.iter_recent(), limit))
+
+    def iter_recent(self):
+        """
+        Yield the index records newest first, reading index.jsonl backwards
+        in blocks so only one block and the run ids already seen are held
+        in memory however many runs are indexed.
+        """
+        try:
+            position = os.path.getsize(self.index_path)
+        except OSError:
+            return
+        seen = set()
+        partial = b""
+        with open(self.index_path, "rb") as file:
+            while position > 0:
+                step = min(64 * 1024, position)
+                position -= step
+                file.seek(position)
+                lines = (file.read(step) + partial).split(b"\n")
+                # The first line of a block may continue in the previous block
+                partial = lines.pop(0) if position > 0 else b""
+                for line in reversed(lines):
+                    if not line.strip():
+                        continue
+                    try:
+                        record = json.loads(line)
+                    except ValueError:
+                        continue
+                    if record['run_id'] not in seen:
+                        seen.add(record['run_id'])
+                        yield record
+
+
+def _delta(base, head):
+    if base is None or head is None:
+        return None, None
+    delta = round(head - base, 3)
+    return delta, (round(delta / base * 100, 1) if base > 0 else None)
+
+
+def _status_change(base, head):
+    if base is None:
+        return 'added'
+    if head is None:
+        return 'removed'
+    if base != 'failed' and head == 'failed':
+        return 'new failure'
+    if base == 'failed' and head != 'failed':
+        return 'fixed'
+    return 'changed' if base != head else ''
+
+
+def compare_runs(base, head, slow_threshold=SLOW_THRESHOLD, min_delta=MIN_SLOW_DELTA):
+    """
+    Compare two run summaries.
+
+    Returns per-test status changes and duration deltas, per-step deltas,
+    and the steps that became slower by more than `slow_threshold`
+    (fraction) and `min_delta` seconds, slowest growth first.
+    """
+    tests = []
+    steps = []
+    for nodeid in sorted(set(base['tests']) | set(head['tests'])):
+        before = base['tests'].get(nodeid)
+        after = head['tests'].get(nodeid)
+        delta, percent = _delta(before and before['duration'], after and after['duration'])
+        tests.append({'nodeid': nodeid,
+                      'base_outcome': before and before['outcome'], 'head_outcome': after and after['outcome'],
+                      'change': _status_change(before and before['outcome'], after and after['outcome']),
+                      'base_duration': before and before['duration'], 'head_duration': after and after['duration'],
+                      'delta': delta, 'percent': percent,
+                      'message': after and after.get('message')})
+        before_steps = before['steps'] if before else {}
+        after_steps = after['steps'] if after else {}
+        for step in list(before_steps) + [step for step in after_steps if step not in before_steps]:
+            delta, percent = _delta(before_steps.get(step), after_steps.get(step))
+            steps.append({'nodeid': nodeid, 'step': step,
+                          'base_duration': before_steps.get(step), 'head_duration': after_steps.get(step),
+                          'delta': delta, 'percent': percent})
+
+    slow_steps = [step for step in steps
+                  if step['delta'] is not None and step['delta'] >= min_delta
+                  and (step['percent'] is None or step['percent'] >= slow_threshold * 100)]
+    slow_steps.sort(key=lambda step: step['delta'], reverse=True)
+    return {
+        'base': {key: base[key] for key in ('run_id', 'timestamp', 'total', 'passed', 'failed', 'skipped', 'duration')},
+        'head': {key: head[key] for key in ('run_id', 'timestamp', 'total', 'passed', 'failed', 'skipped', 'duration')},
+        'tests': tests,
+        'steps': steps,
+        'new_failures': [test for test in tests if test['change'] == 'new failure'],
+        'fixed': [test for test in tests if test['change'] == 'fixed'],
+        'slow_steps': slow_steps,
+        'slow_threshold': slow_threshold
+    }
+
+
+def tracing_overhead(path=TRACING_LOG):
+    """
+    Median call duration of each passing test with and without tracing.
+
+    Records are the per-test lines the browser fixture appends to
+    reports/tracing.jsonl; runs with TRACING=off are the untraced baseline.
+    A test seen in only one mode has no delta.
+    """
+    durations = {}
+    if os.path.exists(path):
+        with open(path, "r", encoding="utf-8") as file:
+            for line in file:
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    continue
+                call_ms = record.get('call_ms', record.get('test_ms'))
+                if record.get('outcome') != 'passed' or call_ms is None:
+                    continue
+                mode = 'untraced' if record.get('tracing') == 'off' else 'traced'
+                durations.setdefault(record['test'], {'traced': [], 'untraced': []})[mode].append(call_ms)
+
+    rows = []
+    for test in sorted(durations):
+        traced, untraced = durations[test]['traced'], durations[test]['untraced']
+        traced_ms = statistics.median(traced) if traced else None
+        untraced_ms = statistics.median(untraced) if untraced else None
+        delta, percent = _delta(untraced_ms, traced_ms)
+        rows.append({'test': test, 'traced_ms': traced_ms, 'untraced_ms': untraced_ms,
+                     'traced_runs': len(traced), 'untraced_runs': len(untraced),
+                     'delta_ms': delta, 'percent': percent})
+    return rows
+
+
+COMPARISON_HEAD = """<!DOCTYPE html>
+<html lang="vi">
+<head>
+<meta charset="utf-8">
+<title>So sánh {base_run} và {head_run}</title>
+<style>
+    body {{ font-family: Arial, sans-serif; margin: 20px; color: #333; }}
+    table {{ border-collapse: collapse; width: 100%; margin: 10px 0 30px 0; }}
+    th, td {{ border: 1px solid #ddd; padding: 6px 10px; text-align: left; }}
+    th {{ background-color: #f2f2f2; }}
+    .slower {{ color: #dc3545; }}
+    .faster {{ color: #28a745; }}
+    .new-failure {{ background-color: #f8d7da; }}
+    .fixed {{ background-color: #d4edda; }}
+</style>
+</head>
+<body>
+<h1>So sánh lần chạy {base_run} &rarr; {head_run}</h1>
+<p>Đạt: {base_passed} &rarr; {head_passed} &middot; Lỗi: {base_failed} &rarr; {head_failed}
+&middot; Tổng thời gian: {base_duration:.2f}s &rarr; {head_duration:.2f}s</p>
+"""
+
+COMPARISON_TABLE_START = """<h2>{title}</h2>
+<table>
+<thead><tr>{headings}</tr></thead>
+<tbody>
+"""
+
+COMPARISON_TEST_ROW = """<tr class="{row_class}"><td>{name}</td><td>{base_outcome}</td><td>{head_outcome}</td><td>{change}</td>
+<td>{base_duration}</td><td>{head_duration}</td><td class="{delta_class}">{delta}</td><td class="{delta_class}">{percent}</td></tr>
+"""
+
+COMPARISON_STEP_ROW = """<tr><td>{name}</td><td>{step}</td><td>{base_duration}</td><td>{head_duration}</td>
+<td class="{delta_class}">{delta}</td><td class="{delta_class}">{percent}</td></tr>
+"""
+
+TEST_HEADINGS = ("Test", "Trạng thái cũ", "Trạng thái mới", "Thay đổi", "Thời gian cũ (s)", "Thời gian mới (s)",
+                 "Chênh lệch (s)", "%")
+STEP_HEADINGS = ("Test", "Bước", "Thời gian cũ (s)", "Thời gian mới (s)", "Chênh lệch (s)", "%")
+
+
+def _cells(row):
+    """Formatted duration, delta and percentage cells of a comparison row"""
+    def seconds(value):
+        return "" if value is None else f"{value:.2f}"
+    return {
+        'base_duration': seconds(row['base_duration']),
+        'head_duration': seconds(row['head_duration']),
+        'delta': "" if row['delta'] is None else f"{row['delta']:+.2f}",
+        'percent': "" if row['percent'] is None else f"{row['percent']:+.1f}%",
+        'delta_class': "" if not row['delta'] else ("slower" if row['delta'] > 0 else "faster")
+    }
+
+
+def write_comparison_report(comparison, path):
+    """Stream a comparison from compare_runs() to an HTML file and return its path"""
+    escape = html.escape
+    table_start = compile_template(COMPARISON_TABLE_START)
+    test_row = compile_template(COMPARISON_TEST_ROW)
+    step_row = compile_template(COMPARISON_STEP_ROW)
+    base, head = comparison['base'], comparison['head']
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    with open(path, "w", encoding="utf-8") as file:
+        file.write(compile_template(COMPARISON_HEAD)(
+            base_run=escape(base['run_id']), head_run=escape(head['run_id']),
+            base_passed=base['passed'], head_passed=head['passed'], base_failed=base['failed'],
+            head_failed=head['failed'], base_duration=base['duration'], head_duration=head['duration']))
+
+        file.write(table_start(title=f"Bước chậm hơn trên {comparison['slow_threshold'] * 100:.0f}%",
+                               headings="".join(f"<th>{heading}</th>" for heading in STEP_HEADINGS)))
+        for step in comparison['slow_steps']:
+            file.write(step_row(name=escape(step['nodeid'].split("::")[-1]), step=escape(step['step']), **_cells(step)))
+        file.write("</tbody>\n</table>\n")
+
+        file.write(table_start(title="Kết quả từng test",
+                               headings="".join(f"<th>{heading}</th>" for heading in TEST_HEADINGS)))
+        for test in comparison['tests']:
+            file.write(test_row(row_class=test['change'].replace(" ", "-"), name=escape(test['nodeid'].split("::")[-1]),
+                                base_outcome=test['base_outcome'] or "", head_outcome=test['head_outcome'] or "",
+                                change=escape(test['change']), **_cells(test)))
+        file.write("</tbody>\n</table>\n")
+
+        file.write(table_start(title="Thời gian từng bước",
+                               headings="".join(f"<th>{heading}</th>" for heading in STEP_HEADINGS)))
+        for step in comparison['steps']:
+            file.write(step_row(name=escape(step['nodeid'].split("::")[-1]), step=escape(step['step']), **_cells(step)))
+        file.write("</tbody>\n</table>\n</body>\n</html>\n")
+    logger.info(f"Comparison report written: {path}")
+    return path
+
+
+def comparison_report_path(base_run, head_run, reports_dir='reports'):
+    return os.path.join(reports_dir, f"compare_{base_run}_{head_run}.html")
@@ -0,0 +1,497 @@
+import asyncio
+import json
+import logging
+import os
+import time
+from array import array
+from datetime import datetime
+from urllib.parse import urldefrag, urljoin, urlsplit
+
+logger = logging.getLogger()
+
+NETWORK_DIR = os.path.join('reports', 'network')
+
+# Resource types reported by Playwright, stored as a one-byte code per request
+RESOURCE_TYPES = [
+    "other", "document", "stylesheet", "image", "media", "font", "script",
+    "texttrack", "xhr", "fetch", "eventsource", "websocket", "manifest"
+]
+_RESOURCE_TYPE_CODES = {name: code for code, name in enumerate(RESOURCE_TYPES)}
+
+
+class NetworkRecorder:
+    """
+    Capture every request/response of a page into compact column arrays.
+
+    Each request is one row: URL id, host id, resource type, status, bytes,
+    start offset, TTFB and duration. URLs and hosts are interned so a row is
+    a few dozen bytes, and event handlers never await anything.
+
+    Bytes start from Content-Length, which chunked and compressed responses
+    often lack; once a request finishes, its transferred size (headers plus
+    encoded body) is read from the browser in a background task. Await
+    `settle()` before reading the summary.
+    """
+
+    def __init__(self):
+        self.urls = []
+        self.hosts = []
+        self._url_ids = {}
+        self._host_ids = {}
+        self._rows = {}
+        self._pending = []
+        self._origin = time.perf_counter()
+
+        self.url_id = array('I')
+        self.host_id = array('I')
+        self.rtype = array('B')
+        self.status = array('H')
+        self.size = array('Q')
+        self.start = array('d')
+        self.ttfb = array('f')
+        self.duration = array('f')
+
+    def _intern(self, value, table, ids):
+        index = ids.get(value)
+        if index is None:
+            index = len(table)
+            table.append(value)
+            ids[value] = index
+        return index
+
+    def attach(self, page):
+        """Start recording network events of the given page"""
+        page.on("request", self._on_request)
+        page.on("response", self._on_response)
+        page.on("requestfinished", self._on_finished)
+        page.on("requestfailed", self._on_failed)
+
+    def _on_request(self, request):
+        url = request.url
+        row = len(self.url_id)
+        self._rows[request] = row
+        self.url_id.append(self._intern(url, self.urls, self._url_ids))
+        self.host_id.append(self._intern(urlsplit(url).hostname or "", self.hosts, self._host_ids))
+        self.rtype.append(_RESOURCE_TYPE_CODES.get(request.resource_type, 0))
+        self.status.append(0)
+        self.size.append(0)
+        self.start.append((time.perf_counter() - self._origin) * 1000)
+        self.ttfb.append(-1.0)
+        self.duration.append(-1.0)
+
+    def _on_response(self, response):
+        row = self._rows.get(response.request)
+        if row is None:
+            return
+        self.status[row] = response.status
+        self.ttfb[row] = (time.perf_counter() - self._origin) * 1000 - self.start[row]
+        length = response.headers.get("content-length")
+        if length and length.isdigit():
+            self.size[row] = int(length)
+
+    def _on_finished(self, request):
+        row = self._rows.pop(request, None)
+        if row is None:
+            return
+        # Prefer the browser's own timing, fall back to wall clock offsets
+        timing = request.timing
+        if timing.get("responseStart", -1) >= 0:
+            self.ttfb[row] = timing["responseStart"]
+        if timing.get("responseEnd", -1) >= 0:
+            self.duration[row] = timing["responseEnd"]
+        else:
+            self.duration[row] = (time.perf_counter() - self._origin) * 1000 - self.start[row]
+        self._pending.append(asyncio.ensure_future(self._read_sizes(request, row)))
+
+    async def _read_sizes(self, request, row):
+        try:
+            sizes = await request.sizes()
+        except Exception:
+            # Page already closed; keep the Content-Length value
+            return
+        body = sizes.get("responseBodySize", -1)
+        if body > 0:
+            self.size[row] = body + max(sizes.get("responseHeadersSize", 0), 0)
+
+    async def settle(self):
+        """Wait for the transferred sizes of finished requests"""
+        pending, self._pending = self._pending, []
+        if pending:
+            await asyncio.gather(*pending, return_exceptions=True)
+
+    def _on_failed(self, request):
+        row = self._rows.pop(request, None)
+        if row is not None:
+            self.duration[row] = (time.perf_counter() - self._origin) * 1000 - self.start[row]
+
+    def __len__(self):
+        return len(self.url_id)
+
+    def summary(self, top=5):
+        """Aggregate the recorded rows into a per-test summary"""
+        count = len(self)
+        hosts = {}
+        for row in range(count):
+            host = self.hosts[self.host_id[row]]
+            stats = hosts.setdefault(host, {'host': host, 'requests': 0, 'bytes': 0,
+                                            'total_ms': 0.0, 'max_ms': 0.0})
+            duration = max(self.duration[row], 0.0)
+            stats['requests'] += 1
+            stats['bytes'] += self.size[row]
+            stats['total_ms'] += duration
+            stats['max_ms'] = max(stats['max_ms'], duration)
+
+        slowest_hosts = sorted(hosts.values(), key=lambda h: h['total_ms'], reverse=True)[:top]
+        for stats in slowest_hosts:
+            stats['total_ms'] = round(stats['total_ms'], 1)
+            stats['max_ms'] = round(stats['max_ms'], 1)
+
+        largest = sorted(range(count), key=lambda r: self.size[r], reverse=True)[:top]
+        largest_resources = [{
+            'url': self.urls[self.url_id[row]],
+            'type': RESOURCE_TYPES[self.rtype[row]],
+            'status': self.status[row],
+            'bytes': self.size[row],
+            'duration_ms': round(self.duration[row], 1)
+        } for row in largest if self.size[row] > 0]
+
+        return {
+            'requests': count,
+            'total_bytes': sum(self.size),
+            'failed': sum(1 for row in range(count) if self.status[row] == 0 or self.status[row] >= 400),
+            'slowest_hosts': slowest_hosts,
+            'largest_resources': largest_resources
+        }
+
+    def rows(self):
+        """Return the raw records as column lists for serialization"""
+        return {
+            'urls': self.urls,
+            'hosts': self.hosts,
+            'types': RESOURCE_TYPES,
+            'url_id': self.url_id.tolist(),
+            'host_id': self.host_id.tolist(),
+            'type': self.rtype.tolist(),
+            'status': self.status.tolist(),
+            'bytes': self.size.tolist(),
+            'start_ms': [round(v, 1) for v in self.start],
+            'ttfb_ms': [round(v, 1) for v in self.ttfb],
+            'duration_ms': [round(v, 1) for v in self.duration]
+        }
+
+    def save(self, test_name):
+        """Write summary and records next to the HTML report, return the file path"""
+        os.makedirs(NETWORK_DIR, exist_ok=True)
+        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+        path = os.path.join(NETWORK_DIR, f"{test_name}_{timestamp}.json")
+        summary = self.summary()
+        with open(path, "w", encoding="utf-8") as file:
+            json.dump({'test': test_name, 'summary': summary, 'records': self.rows()}, file)
+
+        logger.info(f"Network summary for {test_name}: {summary['requests']} requests, "
+                    f"{summary['total_bytes'] / 1024:.1f} KB")
+        for host in summary['slowest_hosts']:
+            logger.info(f"  {host['host']}: {host['requests']} requests, {host['total_ms']} ms total")
+        return path
+
+
+LINK_CACHE_PATH = os.path.join('test_data', 'link_cache.json')
+
+
+class LinkChecker:
+    """
+    Check link targets through Playwright's request API instead of navigations.
+
+    Links are checked with HEAD (falling back to GET when the server rejects
+    HEAD), redirects are followed, at most `concurrency` requests are in flight,
+    and results are cached on disk for `ttl` seconds across runs. Broken
+    results are cached only for `failure_ttl` seconds, so a transient error
+    (timeout, 5xx, rate limiting) is retried on the next run. URLs differing
+    only by #fragment are the same request and are checked once.
+    """
+
+    # Statuses for which servers commonly refuse HEAD but serve GET fine
+    HEAD_FALLBACK_STATUSES = (403, 404, 405, 501)
+
+    def __init__(self, request_context, concurrency=16, ttl=6 * 3600, failure_ttl=300, timeout=10000,
+                 cache_path=LINK_CACHE_PATH):
+        self.request_context = request_context
+        self.concurrency = concurrency
+        self.ttl = ttl
+        self.failure_ttl = failure_ttl
+        self.timeout = timeout
+        self.cache_path = cache_path
+        self.cache = self._load_cache()
+
+    def _load_cache(self):
+        if not os.path.exists(self.cache_path):
+            return {}
+        try:
+            with open(self.cache_path, "r", encoding="utf-8") as file:
+                return json.load(file)
+        except Exception as e:
+            logger.warning(f"Could not load link cache: {str(e)}")
+            return {}
+
+    def _save_cache(self):
+        try:
+            os.makedirs(os.path.dirname(self.cache_path), exist_ok=True)
+            with open(self.cache_path, "w", encoding="utf-8") as file:
+                json.dump(self.cache, file)
+        except Exception as e:
+            logger.warning(f"Could not save link cache: {str(e)}")
+
+    async def _fetch(self, method, url):
+        response = await self.request_context.fetch(url, method=method, timeout=self.timeout)
+        try:
+            return response.status, response.url
+        finally:
+            await response.dispose()
+
+    async def _check(self, url, semaphore):
+        async with semaphore:
+            start = time.perf_counter()
+            result = {'url': url, 'status': 0, 'final_url': url, 'method': 'HEAD', 'error': None}
+            try:
+                result['status'], result['final_url'] = await self._fetch("HEAD", url)
+                if result['status'] in self.HEAD_FALLBACK_STATUSES:
+                    result['method'] = 'GET'
+                    result['status'], result['final_url'] = await self._fetch("GET", url)
+            except Exception as e:
+                try:
+                    result['method'] = 'GET'
+                    result['status'], result['final_url'] = await self._fetch("GET", url)
+                except Exception as get_error:
+                    result['error'] = str(get_error).splitlines()[0]
+            result['time_ms'] = round((time.perf_counter() - start) * 1000, 1)
+            result['checked_at'] = time.time()
+            return result
+
+    async def check(self, urls):
+        """Check the given URLs and return one result dict per unique URL (fragments removed)"""
+        unique_urls = list(dict.fromkeys(urldefrag(u)[0] for u in urls if u.startswith(("http://", "https://"))))
+        now = time.time()
+        results = {}
+        pending = []
+        for url in unique_urls:
+            cached = self.cache.get(url)
+            ttl = self.failure_ttl if cached and self.is_broken(cached) else self.ttl
+            if cached and now - cached.get('checked_at', 0) < ttl:
+                results[url] = dict(cached, cached=True)
+            else:
+                pending.append(url)
+
+        logger.info(f"Checking {len(pending)} links ({len(results)} from cache), "
+                    f"concurrency {self.concurrency}")
+        semaphore = asyncio.Semaphore(self.concurrency)
+        for result in await asyncio.gather(*(self._check(url, semaphore) for url in pending)):
+            result['cached'] = False
+            results[result['url']] = result
+            self.cache[result['url']] = {k: v for k, v in result.items() if k != 'cached'}
+
+        self._save_cache()
+        return [results[url] for url in unique_urls]
+
+    @staticmethod
+    def is_broken(result):
+        return result['error'] is not None or result['status'] == 0 or result['status'] >= 400
+
+    @classmethod
+    def broken_link_table(cls, results):
+        """Format broken links as a plain text table"""
+        broken = [r for r in results if cls.is_broken(r)]
+        if not broken:
+            return ""
+        lines = [f"{'Status':<8}{'Method':<8}{'URL':<70}Error"]
+        for r in broken:
+            lines.append(f"{r['status']:<8}{r['method']:<8}{r['url'][:68]:<70}{r['error'] or ''}")
+        return "\n".join(lines)
+
+
+SECURITY_HEADERS = [
+    "Content-Security-Policy",
+    "X-XSS-Protection",
+    "X-Frame-Options",
+    "Strict-Transport-Security",
+    "X-Content-Type-Options",
+    "Referrer-Policy"
+]
+
+
+def parse_set_cookie(header_value, default_domain):
+    """Parse a Set-Cookie header into the same shape as Playwright's context.cookies()"""
+    parts = [p.strip() for p in header_value.split(";")]
+    name = parts[0].split("=", 1)[0]
+    cookie = {'name': name, 'domain': default_domain, 'secure': False, 'httpOnly': False, 'sameSite': None}
+    for attribute in parts[1:]:
+        key, _, value = attribute.partition("=")
+        key = key.strip().lower()
+        if key == "domain" and value:
+            cookie['domain'] = value.strip()
+        elif key == "secure":
+            cookie['secure'] = True
+        elif key == "httponly":
+            cookie['httpOnly'] = True
+        elif key == "samesite":
+            cookie['sameSite'] = value.strip().capitalize()
+    return cookie
+
+
+def summarize_cookies(cookies):
+    """Count cookie security attributes per domain"""
+    domains = {}
+    for cookie in cookies:
+        domain = cookie.get('domain', '').lstrip('.')
+        stats = domains.setdefault(domain, {'total': 0, 'secure': 0, 'httpOnly': 0, 'sameSite': 0})
+        stats['total'] += 1
+        if cookie.get('secure', False):
+            stats['secure'] += 1
+        if cookie.get('httpOnly', False):
+            stats['httpOnly'] += 1
+        if cookie.get('sameSite') in ('Lax', 'Strict'):
+            stats['sameSite'] += 1
+    return domains
+
+
+class SecurityAudit:
+    """
+    Fetch a set of URLs concurrently through the request API and collect
+    their security headers and Set-Cookie attributes, without rendering.
+    """
+
+    def __init__(self, request_context, concurrency=16, timeout=15000):
+        self.request_context = request_context
+        self.concurrency = concurrency
+        self.timeout = timeout
+
+    async def _audit_url(self, url, semaphore):
+        async with semaphore:
+            result = {'url': url, 'final_url': url, 'status': 0, 'headers': {}, 'cookies': [], 'error': None}
+            try:
+                response = await self.request_context.get(url, timeout=self.timeout)
+                try:
+                    result['status'] = response.status
+                    result['final_url'] = response.url
+                    headers = response.headers
+                    result['headers'] = {h: headers.get(h.lower()) for h in SECURITY_HEADERS}
+                    host = urlsplit(response.url).hostname or ""
+                    result['cookies'] = [parse_set_cookie(h['value'], host)
+                                         for h in response.headers_array if h['name'].lower() == 'set-cookie']
+                finally:
+                    await response.dispose()
+            except Exception as e:
+                result['error'] = str(e).splitlines()[0]
+            return result
+
+    async def run(self, urls):
+        """Audit all URLs at once, return per-URL results in input order"""
+        semaphore = asyncio.Semaphore(self.concurrency)
+        unique_urls = list(dict.fromkeys(urls))
+        return await asyncio.gather(*(self._audit_url(url, semaphore) for url in unique_urls))
+
+    @staticmethod
+    def header_matrix(results):
+        """Format a header x URL matrix, one row per header and one column per URL"""
+        columns = [f"#{i + 1}" for i in range(len(results))]
+        lines = [f"{'Header':<28}" + "".join(f"{c:<5}" for c in columns)]
+        for header in SECURITY_HEADERS:
+            cells = []
+            for r in results:
+                if r['error']:
+                    cells.append("ERR")
+                else:
+                    cells.append("✓" if r['headers'].get(header) else "-")
+            lines.append(f"{header:<28}" + "".join(f"{c:<5}" for c in cells))
+        lines.append("")
+        for column, r in zip(columns, results):
+            https = "https" if r['final_url'].startswith("https://") else "NOT HTTPS"
+            lines.append(f"{column}: {r['url']} -> {r['status']} ({https}){' ' + r['error'] if r['error'] else ''}")
+        return "\n".join(lines)
+
+    @staticmethod
+    def cookie_summary(results):
+        return summarize_cookies(c for r in results for c in r['cookies'])
+
+
+class HttpProbe:
+    """
+    Answer HTTP-only checks (status, body text, redirects, HTTPS) without rendering.
+
+    All checks share one APIRequestContext, so connections are pooled across
+    checks of a test, and every check records its latency for the report.
+    """
+
+    def __init__(self, request_context, timeout=15000):
+        self.request_context = request_context
+        self.timeout = timeout
+        self.timings = []
+
+    @classmethod
+    async def create(cls, playwright, user_agent=None, timeout=15000):
+        request_context = await playwright.request.new_context(user_agent=user_agent)
+        return cls(request_context, timeout=timeout)
+
+    async def close(self):
+        await self.request_context.dispose()
+
+    async def _fetch(self, check, url, method="HEAD", **kwargs):
+        start = time.perf_counter()
+        try:
+            response = await self.request_context.fetch(url, method=method, timeout=self.timeout, **kwargs)
+            # Some servers reject HEAD, retry those with GET
+            if method == "HEAD" and response.status in LinkChecker.HEAD_FALLBACK_STATUSES:
+                await response.dispose()
+                response = await self.request_context.fetch(url, method="GET", timeout=self.timeout, **kwargs)
+            await response.dispose()
+            return response
+        finally:
+            self.timings.append((check, url, (time.perf_counter() - start) * 1000))
+
+    async def status(self, url):
+        """Return the final status code of a URL after redirects"""
+        response = await self._fetch("status", url)
+        return response.status
+
+    async def text(self, url):
+        """Return (status, body text) of a GET, for content checks that need no rendering"""
+        start = time.perf_counter()
+        try:
+            response = await self.request_context.get(url, timeout=self.timeout)
+            try:
+                return response.status, await response.text()
+            finally:
+                await response.dispose()
+        finally:
+            self.timings.append(("text", url, (time.perf_counter() - start) * 1000))
+
+    async def redirects(self, url, max_hops=10):
+        """Follow redirects hop by hop and return the list of (url, status)"""
+        chain = []
+        start = time.perf_counter()
+        try:
+            for _ in range(max_hops):
+                response = await self.request_context.fetch(url, method="GET", timeout=self.timeout,
+                                                            max_redirects=0)
+                await response.dispose()
+                chain.append((url, response.status))
+                location = response.headers.get("location")
+                if not (300 <= response.status < 400 and location):
+                    break
+                url = urljoin(url, location)
+        finally:
+            self.timings.append(("redirects", chain[0][0] if chain else url, (time.perf_counter() - start) * 1000))
+        return chain
+
+    async def uses_https(self, url):
+        """Return (final_url, is_https) after following redirects"""
+        chain = await self.redirects(url)
+        final_url = chain[-1][0] if chain else url
+        return final_url, final_url.startswith("https://")
+
+    def report(self):
+        """Log the latency of every probe check"""
+        if not self.timings:
+            return
+        logger.info(f"HTTP probe checks ({len(self.timings)}):")
+        for check, url, elapsed in self.timings:
+            logger.info(f"  {check:<10}{elapsed:>9.1f} ms  {url}")
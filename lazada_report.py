@@ -0,0 +1,570 @@
+import base64
+import functools
+import html
+import logging
+import os
+import re
+import shutil
+import string
+import time
+import zipfile
+from datetime import datetime
+from urllib.parse import quote
+from lazada_screenshots import mime_type
+from lazada_thumbs import ThumbnailGenerator, THUMBNAIL_WIDTH
+
+logger = logging.getLogger()
+
+REPORT_MEDIA_DIR = os.path.join('reports', 'media')
+
+# A thumbnail not rendered yet shows the full image it links to
+THUMBNAIL_FALLBACK = 'onerror="this.onerror=null; this.src=this.parentNode.href;"'
+
+
+def _publish_file(source, target):
+    """Place a file next to the report: hard link when possible, copy otherwise"""
+    if os.path.exists(target):
+        return
+    os.makedirs(os.path.dirname(target), exist_ok=True)
+    try:
+        os.link(source, target)
+    except OSError:
+        shutil.copyfile(source, target)
+
+
+class ReportAssets:
+    """
+    Image files referenced by an HTML report instead of inline base64.
+
+    Screenshots are placed next to the report under `media/` by content
+    hash (hard link when possible, copy otherwise) with their shared
+    thumbnail in `media/thumbs/`; an object already published by an
+    earlier test or run is reused as is.
+
+    Publishing never renders a thumbnail: one already in the shared cache
+    is linked right away, a missing one is only referenced (counted in
+    `deferred`) and publish_thumbnails() fills it in after the run. Until
+    then the page falls back to the full image.
+    """
+
+    def __init__(self, media_dir=REPORT_MEDIA_DIR, report_dir='reports', thumbnail_width=THUMBNAIL_WIDTH):
+        self.media_dir = media_dir
+        self.thumbs_dir = os.path.join(media_dir, 'thumbs')
+        self.report_dir = report_dir
+        self.thumbnails = ThumbnailGenerator(thumbnail_width)
+        self.build_ms = 0.0
+        self.deferred = 0
+
+    def _relative(self, path):
+        return os.path.relpath(path, self.report_dir).replace(os.sep, "/")
+
+    def publish(self, entry):
+        """Publish a store entry, return (thumbnail href, full image href) relative to the report"""
+        start = time.perf_counter()
+        extension = os.path.splitext(entry['path'])[1]
+        full_path = os.path.join(self.media_dir, f"{entry['hash']}{extension}")
+        _publish_file(entry['path'], full_path)
+
+        thumb_path = full_path
+        if self.thumbnails.enabled:
+            try:
+                source = self.thumbnails.path_for(entry)
+                thumb_path = os.path.join(self.thumbs_dir, os.path.basename(source))
+                if os.path.exists(source):
+                    _publish_file(source, thumb_path)
+                    self.thumbnails.cache.add(source)
+                else:
+                    self.deferred += 1
+            except OSError as e:
+                logger.warning(f"Could not publish thumbnail for {entry['path']}: {str(e)}")
+        self.build_ms += (time.perf_counter() - start) * 1000
+        return self._relative(thumb_path), self._relative(full_path)
+
+    def figure_html(self, entry):
+        """Lazy-loaded thumbnail linking to the full image (shown instead while the thumbnail is missing)"""
+        thumb_href, full_href = self.publish(entry)
+        return (f'<div style="margin: 10px 0;"><strong>Screenshot: {html.escape(entry["step"])}</strong><br/>'
+                f'<a href="{html.escape(full_href)}" target="_blank">'
+                f'<img src="{html.escape(thumb_href)}" loading="lazy" {THUMBNAIL_FALLBACK} '
+                f'style="max-width:600px; border:1px solid #ddd; padding:5px;" />'
+                f'</a></div>')
+
+
+def publish_thumbnails(entries, media_dir=REPORT_MEDIA_DIR, generator=None):
+    """
+    Render the thumbnails of a finished run in the generator's process pool
+    and link them into `media_dir`/thumbs, for every entry a report has
+    published. Returns the generator's counts.
+    """
+    generator = generator or ThumbnailGenerator()
+    entries = [entry for entry in entries if os.path.exists(
+        os.path.join(media_dir, f"{entry['hash']}{os.path.splitext(entry['path'])[1]}"))]
+    stats = generator.generate(entries)
+    for entry in entries:
+        try:
+            source = generator.path_for(entry)
+            if os.path.exists(source):
+                _publish_file(source, os.path.join(media_dir, 'thumbs', os.path.basename(source)))
+        except OSError as e:
+            logger.warning(f"Could not publish thumbnail for {entry['path']}: {str(e)}")
+    return stats
+
+
+def inline_figure_html(entry):
+    """Screenshot embedded as a base64 data URI, for reports that must stand alone"""
+    with open(entry['path'], "rb") as file:
+        data = base64.b64encode(file.read()).decode("ascii")
+    return (f'<div style="margin: 10px 0;"><strong>Screenshot: {html.escape(entry["step"])}</strong><br/>'
+            f'<img src="data:{mime_type(entry["path"])};base64,{data}" '
+            f'style="max-width:600px; border:1px solid #ddd; padding:5px;" /></div>')
+
+
+# Relative src/href attributes of a report that point to local files
+LOCAL_REFERENCE = re.compile(r'(?:src|href)="(?!https?:|data:|#|mailto:)([^"]+)"')
+
+
+def archive_report(report_path, archive_path=None):
+    """
+    Bundle an HTML report and every local file it references into one zip
+    for sharing, keeping relative paths so it opens after extraction.
+    Returns the archive path.
+    """
+    report_dir = os.path.dirname(os.path.abspath(report_path))
+    archive_path = archive_path or f"{os.path.splitext(report_path)[0]}.zip"
+    with open(report_path, "r", encoding="utf-8") as file:
+        content = file.read()
+
+    references = set()
+    for reference in LOCAL_REFERENCE.findall(content):
+        path = os.path.normpath(os.path.join(report_dir, reference.split("?")[0].split("#")[0]))
+        if path.startswith(report_dir) and os.path.isfile(path):
+            references.add(path)
+    # Stylesheets and scripts written by pytest-html next to a non self-contained report
+    assets_dir = os.path.join(report_dir, 'assets')
+    if os.path.isdir(assets_dir):
+        for name in os.listdir(assets_dir):
+            references.add(os.path.join(assets_dir, name))
+
+    with zipfile.ZipFile(archive_path, "w", zipfile.ZIP_DEFLATED) as archive:
+        archive.write(report_path, os.path.basename(report_path))
+        for path in sorted(references):
+            # Images are already compressed, store them as is
+            compression = zipfile.ZIP_STORED if path.lower().endswith((".png", ".jpg", ".webp", ".zip")) else zipfile.ZIP_DEFLATED
+            archive.write(path, os.path.relpath(path, report_dir), compress_type=compression)
+    logger.info(f"Report archive written: {archive_path} ({len(references)} files, "
+                f"{os.path.getsize(archive_path) / 1024 / 1024:.1f} MB)")
+    return archive_path
+
+
+SESSION_REPORT_HEAD = """<!DOCTYPE html>
+<html lang="vi">
+<head>
+<meta charset="utf-8">
+<title>Lazada test session {run_id}</title>
+<style>
+    body {{ font-family: Arial, sans-serif; margin: 20px; color: #333; }}
+    #report {{ display: flex; flex-direction: column; }}
+    #summary {{ order: -1; display: flex; gap: 10px; margin-bottom: 20px; }}
+    .summary-item {{ flex: 1; padding: 10px; border-radius: 5px; text-align: center; }}
+    .test {{ border: 1px solid #ddd; border-radius: 5px; margin: 8px 0; padding: 10px; }}
+    .test h3 {{ margin: 0 0 6px 0; font-size: 15px; }}
+    .passed {{ border-left: 6px solid #28a745; }}
+    .failed {{ border-left: 6px solid #dc3545; }}
+    .skipped {{ border-left: 6px solid #ffc107; }}
+    .error {{ white-space: pre-wrap; background: #f8f9fa; border: 1px solid #ddd; padding: 8px; max-height: 300px; overflow: auto; }}
+    #progress {{ color: #666; font-style: italic; }}
+    table {{ border-collapse: collapse; }}
+    td, th {{ border: 1px solid #ddd; padding: 4px 8px; }}
+</style>
+<script>
+    // Refresh while the session is running; finalize() appends #session-complete.
+    // A session that crashed never gets it, so stop once nothing was appended for a while.
+    window.addEventListener("load", function () {{
+        if (document.getElementById("session-complete")) return;
+        const tests = document.querySelectorAll(".test");
+        const failed = document.querySelectorAll(".test.failed").length;
+        const progress = document.getElementById("progress");
+        let updated = Number(document.getElementById("report").dataset.started);
+        tests.forEach(function (test) {{ updated = Math.max(updated, Number(test.dataset.ts)); }});
+        if (Date.now() - updated * 1000 > {stale_minutes} * 60000) {{
+            progress.textContent = "Không có cập nhật trong " + {stale_minutes} +
+                " phút, đã dừng tự động tải lại (" + tests.length + " test đã xong, " + failed + " lỗi)";
+            return;
+        }}
+        progress.textContent = "Đang chạy... " + tests.length + " test đã xong, " + failed + " lỗi";
+        setTimeout(function () {{ location.reload(); }}, 5000);
+    }});
+</script>
+</head>
+<body>
+<h1>Báo cáo phiên kiểm thử {run_id}</h1>
+<p id="progress"></p>
+<div id="report" data-started="{started:.0f}">
+"""
+
+SESSION_TEST_BLOCK = """<section class="test {outcome}" data-outcome="{outcome}" data-duration="{duration:.2f}" data-ts="{ts:.0f}">
+<h3>{name} &mdash; {outcome} ({duration:.2f}s)</h3>
+{body}
+</section>
+"""
+
+SESSION_REPORT_SUMMARY = """<section id="summary">
+<div class="summary-item" style="background:#d4edda">Đạt<br><strong>{passed}</strong></div>
+<div class="summary-item" style="background:#f8d7da">Lỗi<br><strong>{failed}</strong></div>
+<div class="summary-item" style="background:#fff3cd">Bỏ qua<br><strong>{skipped}</strong></div>
+<div class="summary-item" style="background:#e2e3e5">Tổng số<br><strong>{total}</strong><br>{duration:.1f}s</div>
+</section>
+<div id="session-complete"></div>
+</div>
+</body>
+</html>
+"""
+
+OUTCOME_ATTRIBUTE = re.compile(r'data-outcome="(\w+)" data-duration="([\d.]+)"')
+
+
+def trace_link_html(path, report_dir):
+    """Link to a Playwright trace zip relative to the report"""
+    href = quote(os.path.relpath(path, report_dir).replace(os.sep, "/"))
+    return (f'<div style="margin: 10px 0;"><strong>Playwright trace:</strong> '
+            f'<a href="{href}">{html.escape(os.path.basename(path))}</a> '
+            f'(<code>playwright show-trace</code> or https://trace.playwright.dev)</div>')
+
+
+def visual_table_html(results, report_dir):
+    """Table of visual regression results, linking diff images relative to the report"""
+    rows = ""
+    for result in results:
+        diff_link = ""
+        if result.get('diff_path'):
+            diff_href = quote(os.path.relpath(result['diff_path'], report_dir).replace(os.sep, "/"))
+            diff_link = f'<a href="{html.escape(diff_href)}" target="_blank">diff</a>'
+        color = {"fail": "#721c24", "no baseline": "#856404"}.get(result['status'], "#155724")
+        rows += (f'<tr><td>{html.escape(str(result["page"]))}</td>'
+                 f'<td style="color:{color}">{html.escape(str(result["status"]))}</td>'
+                 f'<td>{result["diff_ratio"] * 100:.2f}%</td><td>{"yes" if result["size_changed"] else "no"}</td>'
+                 f'<td>{result["ms"]} ms</td><td>{diff_link}</td></tr>')
+    return ('<div style="margin: 10px 0;"><strong>Visual regression</strong>'
+            '<table><tr><th>Page</th><th>Status</th><th>Changed</th><th>Size changed</th><th>Time</th><th></th></tr>'
+            f'{rows}</table></div>')
+
+
+# Minutes without a new test block after which an unfinished session report stops reloading
+SESSION_STALE_MINUTES = 10
+
+# Screenshots shown for a passed test in the session report; a failed test shows all of its own
+SESSION_SCREENSHOTS = 3
+
+
+def session_report_path(run_id, reports_dir='reports'):
+    return os.path.join(reports_dir, f"session_{run_id}.html")
+
+
+def latest_session_report(reports_dir='reports'):
+    """Most recently written session report, or None"""
+    try:
+        paths = [os.path.join(reports_dir, name) for name in os.listdir(reports_dir)
+                 if name.startswith("session_") and name.endswith(".html")]
+    except FileNotFoundError:
+        return None
+    return max(paths, key=os.path.getmtime, default=None)
+
+
+class SessionReport:
+    """
+    HTML report of one test session, built by appending.
+
+    Every pytest process of the session appends its test blocks as they
+    complete (one write per block, append mode) and `finalize()` appends
+    the summary once the session ends, so earlier sections are never
+    rewritten. The page reloads itself until the summary is present and
+    is laid out with the summary first. A report that gets no new block
+    for SESSION_STALE_MINUTES (e.g. the run was killed before finalize())
+    stops reloading.
+
+    Blocks are derived from the event stream: `add_events()` collects the
+    screenshot, visual and trace events of a test and writes its block when
+    the final test_end arrives. Screenshots are embedded as base64 when
+    REPORT_ASSETS is "inline", linked from reports/media otherwise.
+    """
+
+    def __init__(self, run_id, reports_dir='reports', assets=None, inline=None):
+        self.run_id = run_id
+        self.reports_dir = reports_dir
+        self.path = session_report_path(run_id, reports_dir)
+        self.assets = assets
+        self.inline = os.environ.get('REPORT_ASSETS', 'external').lower() == 'inline' if inline is None else inline
+        self._recorded = {}  # nodeid -> events seen before its test_end
+
+    def _ensure_header(self):
+        try:
+            with open(self.path, "x", encoding="utf-8") as file:
+                file.write(SESSION_REPORT_HEAD.format(run_id=html.escape(str(self.run_id)), started=time.time(),
+                                                      stale_minutes=SESSION_STALE_MINUTES))
+        except FileExistsError:
+            pass
+
+    def _append(self, text):
+        self._ensure_header()
+        with open(self.path, "a", encoding="utf-8") as file:
+            file.write(text)
+
+    def append_test(self, nodeid, outcome, duration, sections=(), error=None):
+        """Append the result block of one test; `sections` are HTML fragments"""
+        body = "\n".join(sections)
+        if error:
+            body += f'\n<div class="error">{html.escape(error[-5000:])}</div>'
+        self._append(SESSION_TEST_BLOCK.format(name=html.escape(nodeid.split("::")[-1]), outcome=outcome,
+                                               duration=duration, ts=time.time(), body=body))
+
+    def add_events(self, events):
+        """Append a block for every test_end in `events`, with what the test recorded before it"""
+        for event in events:
+            if event['type'] in ('screenshot', 'visual', 'trace'):
+                self._recorded.setdefault(event.get('nodeid'), []).append(event)
+            elif event['type'] == 'test_end':
+                failed = event['outcome'] == 'failed'
+                sections = self._sections(self._recorded.pop(event['nodeid'], []), failed)
+                self.append_test(event['nodeid'], event['outcome'], event['duration'], sections,
+                                 error=event.get('error') if failed else None)
+
+    def _sections(self, recorded, failed):
+        screenshots = [event for event in recorded if event['type'] == 'screenshot']
+        if not failed:
+            screenshots = screenshots[-SESSION_SCREENSHOTS:]
+        sections = []
+        if screenshots and self.assets is None and not self.inline:
+            self.assets = ReportAssets(os.path.join(self.reports_dir, 'media'), self.reports_dir,
+                                       thumbnail_width=int(os.environ.get('THUMBNAIL_WIDTH', THUMBNAIL_WIDTH)))
+        for event in screenshots:
+            try:
+                sections.append(inline_figure_html(event) if self.inline else self.assets.figure_html(event))
+            except Exception as e:
+                logger.warning(f"Could not add screenshot {event.get('path')} to session report: {str(e)}")
+        sections.extend(trace_link_html(event['path'], self.reports_dir)
+                        for event in recorded if event['type'] == 'trace')
+        visual = [event for event in recorded if event['type'] == 'visual']
+        if visual:
+            sections.append(visual_table_html(visual, self.reports_dir))
+        return sections
+
+    @property
+    def complete(self):
+        if not os.path.exists(self.path):
+            return False
+        with open(self.path, "rb") as file:
+            file.seek(max(os.path.getsize(self.path) - 512, 0))
+            return b'id="session-complete"' in file.read()
+
+    def finalize(self, duration=None):
+        """Append the summary counts, computed from the appended blocks; idempotent"""
+        if self.complete:
+            return
+        self._ensure_header()
+        counts = {'passed': 0, 'failed': 0, 'skipped': 0}
+        total_duration = 0.0
+        with open(self.path, "r", encoding="utf-8") as file:
+            for outcome, test_duration in OUTCOME_ATTRIBUTE.findall(file.read()):
+                counts[outcome] = counts.get(outcome, 0) + 1
+                total_duration += float(test_duration)
+        self._append(SESSION_REPORT_SUMMARY.format(
+            total=sum(counts.values()), duration=duration if duration is not None else total_duration, **counts))
+        logger.info(f"Session report finalized: {self.path}")
+
+
+REPORT_CHUNK_SIZE = 64 * 1024
+
+
+@functools.lru_cache(maxsize=None)
+def compile_template(source):
+    """
+    Compile a str.format-style template into a function taking its fields
+    as keyword arguments.
+
+    The template is parsed once into (literal, field, conversion, spec)
+    parts, cached by source and reused by every report built in the
+    process, so rendering only looks up and formats the fields. Semantics
+    are those of `source.format(**fields)`: attribute and index lookups,
+    !r/!s/!a conversions and nested format specs; positional fields are
+    rejected.
+    """
+    formatter = string.Formatter()
+    parts = []
+    for literal, field_name, format_spec, conversion in formatter.parse(source):
+        if field_name is not None and (not field_name or field_name[0].isdigit()):
+            raise ValueError(f"Report templates only take named fields, got {{{field_name}}}")
+        # A plain name is a dict lookup; anything else goes through Formatter.get_field
+        parts.append((literal, field_name, field_name is not None and field_name.isidentifier(),
+                      conversion, format_spec, "{" in (format_spec or "")))
+
+    def render(**fields):
+        out = []
+        for literal, field_name, simple, conversion, format_spec, nested_spec in parts:
+            out.append(literal)
+            if field_name is None:
+                continue
+            value = fields[field_name] if simple else formatter.get_field(field_name, (), fields)[0]
+            if conversion:
+                value = formatter.convert_field(value, conversion)
+            if nested_spec:
+                format_spec = formatter.vformat(format_spec, (), fields)
+            out.append(format(value, format_spec))
+        return "".join(out)
+
+    return render
+
+
+TEST_REPORT_HEAD = """<!DOCTYPE html>
+<html lang="vi">
+<head>
+<meta charset="UTF-8">
+<meta name="viewport" content="width=device-width, initial-scale=1.0">
+<title>{title} Kiểm thử Lazada</title>
+<style>
+    body {{ font-family: Arial, sans-serif; line-height: 1.6; margin: 0; padding: 20px; color: #333; }}
+    h1, h2, h3 {{ color: #2c3e50; }}
+    .container {{ max-width: 1200px; margin: 0 auto; display: flex; flex-direction: column; }}
+    .header {{ order: -2; }}
+    .summary {{ order: -1; background-color: #f8f9fa; border-radius: 5px; padding: 20px; margin-bottom: 20px;
+                box-shadow: 0 2px 5px rgba(0,0,0,0.1); }}
+    .stats {{ display: flex; justify-content: space-around; margin: 20px 0; }}
+    .stat-item {{ text-align: center; padding: 10px; border-radius: 5px; }}
+    .pass {{ background-color: #d4edda; color: #155724; }}
+    .fail {{ background-color: #f8d7da; color: #721c24; }}
+    .skip {{ background-color: #fff3cd; color: #856404; }}
+    .total {{ background-color: #cce5ff; color: #004085; }}
+    .time {{ background-color: #e2e3e5; color: #383d41; }}
+    table {{ width: 100%; border-collapse: collapse; margin: 20px 0; }}
+    th, td {{ padding: 12px 15px; text-align: left; border-bottom: 1px solid #ddd; }}
+    th {{ background-color: #f2f2f2; }}
+    tr:hover {{ background-color: #f5f5f5; }}
+    .status-pass {{ color: #28a745; font-weight: bold; }}
+    .status-fail {{ color: #dc3545; font-weight: bold; }}
+    .status-skip {{ color: #856404; font-weight: bold; }}
+    .footer {{ margin-top: 30px; text-align: center; font-size: 0.9em; color: #6c757d; }}
+    .screenshot-container {{ display: grid; grid-template-columns: repeat(auto-fill, minmax(250px, 1fr));
+                             gap: 15px; margin: 20px 0; }}
+    .screenshot-item {{ border: 1px solid #ddd; border-radius: 4px; padding: 10px; text-align: center; }}
+    .screenshot-item img {{ max-width: 100%; height: auto; margin-bottom: 10px; }}
+    .screenshot-item a {{ display: block; color: #007bff; text-decoration: none; margin-top: 5px; }}
+    .screenshot-item a:hover {{ text-decoration: underline; }}
+</style>
+</head>
+<body>
+<div class="container">
+<div class="header">
+<h1>{title} Kiểm thử Trang Web Lazada</h1>
+<p>Ngày tạo báo cáo: {generated}</p>
+</div>
+"""
+
+TEST_RESULTS_START = """<h2>Kết quả chi tiết</h2>
+<table>
+<thead><tr><th>STT</th><th>Test ID</th><th>Tên Test</th><th>Trạng thái</th><th>Thời gian (ms)</th></tr></thead>
+<tbody>
+"""
+
+TEST_RESULT_ROW = """<tr><td>{index}</td><td>{test_id}</td><td>{name}</td><td class="{status_class}">{status}</td><td>{time}</td></tr>
+"""
+
+SCREENSHOTS_START = """<h2>Ảnh chụp màn hình</h2>
+<div class="screenshot-container">
+"""
+
+SCREENSHOT_ITEM = """<div class="screenshot-item">
+<a href="{full_href}" target="_blank"><img src="{thumb_href}" alt="{label}" loading="lazy" {fallback}></a>
+<p>{label}</p>
+<a href="{full_href}" target="_blank">Mở ảnh đầy đủ</a>
+</div>
+"""
+
+HISTORY_START = """<h2>Lịch sử kiểm thử</h2>
+<table>
+<thead><tr><th>Thời gian</th><th>Mã lần chạy</th><th>Đạt</th><th>Lỗi</th><th>Bỏ qua</th><th>Tổng số</th><th>Thời gian (s)</th></tr></thead>
+<tbody>
+"""
+
+HISTORY_ROW = """<tr><td>{timestamp}</td><td>{run_id}</td><td>{passed}</td><td>{failed}</td><td>{skipped}</td><td>{total}</td><td>{duration:.2f}</td></tr>
+"""
+
+TEST_REPORT_SUMMARY = """<div class="summary">
+<h2>Tóm tắt kết quả</h2>
+<div class="stats">
+<div class="stat-item pass"><h3>Đạt</h3><p>{passed}</p></div>
+<div class="stat-item fail"><h3>Lỗi</h3><p>{failed}</p></div>
+<div class="stat-item skip"><h3>Bỏ qua</h3><p>{skipped}</p></div>
+<div class="stat-item total"><h3>Tổng số</h3><p>{total}</p></div>
+<div class="stat-item time"><h3>Tổng thời gian</h3><p>{seconds:.2f}s</p></div>
+</div>
+</div>
+<div class="footer"><p>Báo cáo được tạo tự động bởi công cụ kiểm thử Lazada</p></div>
+</div>
+</body>
+</html>
+"""
+
+STATUS_CLASSES = {'Đạt': ('passed', 'status-pass'), 'Bỏ qua': ('skipped', 'status-skip')}
+
+
+def write_test_report(path, results, summary=False, entries=(), history=(), assets=None):
+    """
+    Stream a test report to `path` and return its outcome counts.
+
+    `results` yields (test_id, result) pairs, `entries` screenshot store
+    entries and `history` test history items, newest first; each is
+    rendered row by row through the compiled templates into a buffered
+    file, so memory stays bounded however many tests, screenshots and runs
+    the report covers. The summary is written last and placed first by
+    CSS, since its counts are only known once every row is out.
+    Screenshots and history are skipped for a summary report.
+    """
+    start = time.perf_counter()
+    escape = html.escape
+    result_row = compile_template(TEST_RESULT_ROW)
+    counts = {'passed': 0, 'failed': 0, 'skipped': 0}
+    total_ms = 0
+    temp_path = f"{path}.{os.getpid()}.tmp"
+    with open(temp_path, "w", encoding="utf-8", buffering=REPORT_CHUNK_SIZE) as file:
+        file.write(compile_template(TEST_REPORT_HEAD)(
+            title='Tóm tắt' if summary else 'Báo cáo đầy đủ', generated=datetime.now().strftime('%d/%m/%Y %H:%M:%S')))
+        file.write(TEST_RESULTS_START)
+        for index, (test_id, result) in enumerate(results, 1):
+            outcome, status_class = STATUS_CLASSES.get(result.get('status'), ('failed', 'status-fail'))
+            counts[outcome] += 1
+            total_ms += result.get('time', 0) or 0
+            file.write(result_row(index=index, test_id=escape(str(test_id)), name=escape(result.get('name', '')),
+                                  status_class=status_class, status=escape(result.get('status', '')),
+                                  time=result.get('time', '')))
+        file.write("</tbody>\n</table>\n")
+
+        if not summary:
+            file.write(SCREENSHOTS_START)
+            assets = assets or ReportAssets(os.path.join(os.path.dirname(path) or '.', 'media'),
+                                            os.path.dirname(path) or '.')
+            screenshot_item = compile_template(SCREENSHOT_ITEM)
+            for entry in entries:
+                try:
+                    thumb_href, full_href = assets.publish(entry)
+                except Exception as e:
+                    logger.warning(f"Could not publish screenshot {entry['path']}: {str(e)}")
+                    continue
+                file.write(screenshot_item(full_href=escape(full_href), thumb_href=escape(thumb_href),
+                                           label=escape(f"{entry['step']}_{entry['hash'][:8]}"),
+                                           fallback=THUMBNAIL_FALLBACK))
+            file.write("</div>\n")
+
+            file.write(HISTORY_START)
+            history_row = compile_template(HISTORY_ROW)
+            for item in history:
+                file.write(history_row(timestamp=escape(str(item.get('timestamp', ''))),
+                                       run_id=escape(str(item.get('run_id') or '')),
+                                       passed=item.get('passed', 0), failed=item.get('failed', 0),
+                                       skipped=item.get('skipped', 0), total=item.get('total', 0),
+                                       duration=item.get('duration', 0)))
+            file.write("</tbody>\n</table>\n")
+
+        file.write(compile_template(TEST_REPORT_SUMMARY)(total=sum(counts.values()), seconds=total_ms / 1000, **counts))
+    os.replace(temp_path, path)
+    logger.info(f"Test report written: {path} ({sum(counts.values())} tests, "
+                f"{(time.perf_counter() - start) * 1000:.0f} ms)")
+    return counts
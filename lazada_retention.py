@@ -0,0 +1,308 @@
+import gzip
+import io
+import json
+import logging
+import os
+import shutil
+import tarfile
+import threading
+import time
+from datetime import datetime
+from lazada_report import LOCAL_REFERENCE
+
+logger = logging.getLogger()
+
+ARCHIVE_DIR = 'archive'
+HISTORY_PATH = os.path.join('test_data', 'test_history.json')
+LOG_FILES = ('lazada_test.log', 'lazada_test_gui.log')
+
+# Unreferenced report media younger than this may belong to a report still being written
+MEDIA_GRACE_SECONDS = 3600
+
+
+class RetentionPolicy:
+    """
+    Limits applied to stored artifacts.
+
+    Runs beyond `keep_runs` or older than `max_age_days` expire; if what is
+    left still exceeds `max_total_bytes`, the oldest remaining runs expire
+    too. Runs with failed tests are never expired when `keep_failures` is set.
+    """
+
+    def __init__(self, max_total_bytes=500 * 1024 * 1024, max_age_days=14, keep_runs=10,
+                 keep_failures=True, max_log_bytes=10 * 1024 * 1024):
+        self.max_total_bytes = max_total_bytes
+        self.max_age_days = max_age_days
+        self.keep_runs = keep_runs
+        self.keep_failures = keep_failures
+        self.max_log_bytes = max_log_bytes
+
+    @classmethod
+    def from_config(cls, config):
+        """Build a policy from the GUI config.json values (strings, sizes in MB)"""
+        return cls(
+            max_total_bytes=int(float(config.get('retention_max_mb', 500)) * 1024 * 1024),
+            max_age_days=float(config.get('retention_max_days', 14)),
+            keep_runs=int(config.get('retention_keep_runs', 10)),
+            keep_failures=bool(config.get('retention_keep_failures', True)),
+            max_log_bytes=int(float(config.get('retention_max_log_mb', 10)) * 1024 * 1024)
+        )
+
+
+class RetentionEngine:
+    """
+    Apply a RetentionPolicy to screenshots, reports and log files.
+
+    Expired runs are bundled into `archive/run_<id>.tar.gz` (manifest plus
+    image objects) before their entries are dropped from the screenshot
+    store; objects still referenced by a kept run stay in place. Old
+    top-level HTML reports are bundled per cleanup, after which report media
+    no surviving report links to is removed. Oversized logs are renamed,
+    reopened by this process' logging handlers and gzipped.
+    """
+
+    def __init__(self, store, policy, reports_dir='reports', archive_dir=ARCHIVE_DIR,
+                 history_path=HISTORY_PATH, log_files=LOG_FILES):
+        self.store = store
+        self.policy = policy
+        self.reports_dir = reports_dir
+        self.archive_dir = archive_dir
+        self.history_path = history_path
+        self.log_files = log_files
+
+    def failed_runs(self):
+        """Run ids recorded in the test history with at least one failed test"""
+        try:
+            with open(self.history_path, "r") as file:
+                history = json.load(file)
+        except Exception:
+            return set()
+        return {item['run_id'] for item in history if item.get('run_id') and item.get('failed', 0) > 0}
+
+    def _report_files(self):
+        for directory, _, names in os.walk(self.reports_dir):
+            for name in names:
+                yield os.path.join(directory, name)
+
+    def plan(self, now=None):
+        """Return the run ids to expire, oldest first"""
+        now = now or time.time()
+        runs = self.store.runs()
+        protected = self.failed_runs() if self.policy.keep_failures else set()
+
+        # Reference counts so objects shared between runs are only counted once
+        references = {}
+        sizes = {}
+        for entries in runs.values():
+            for path in {entry['path'] for entry in entries}:
+                references[path] = references.get(path, 0) + 1
+        for entries in runs.values():
+            for entry in entries:
+                sizes[entry['path']] = entry['size']
+
+        def release(run_id):
+            freed = 0
+            for path in {entry['path'] for entry in runs[run_id]}:
+                references[path] -= 1
+                if references[path] == 0:
+                    freed += sizes[path]
+            return freed
+
+        total = sum(sizes.values()) + sum(os.path.getsize(path) for path in self._report_files())
+        newest_first = sorted(runs, key=lambda run_id: runs[run_id][-1]['timestamp'], reverse=True)
+        expired = []
+        for position, run_id in enumerate(newest_first):
+            if run_id in protected:
+                continue
+            age_days = (now - runs[run_id][-1]['timestamp']) / 86400
+            if position >= self.policy.keep_runs or age_days > self.policy.max_age_days:
+                expired.append(run_id)
+                total -= release(run_id)
+
+        # Size budget: expire the oldest remaining runs, never the latest one
+        for run_id in reversed(newest_first[1:]):
+            if total <= self.policy.max_total_bytes:
+                break
+            if run_id in protected or run_id in expired:
+                continue
+            expired.append(run_id)
+            total -= release(run_id)
+
+        return sorted(expired, key=lambda run_id: runs[run_id][-1]['timestamp'])
+
+    def _archive_run(self, run_id, entries):
+        bundle_path = os.path.join(self.archive_dir, f"run_{run_id}.tar.gz")
+        with tarfile.open(bundle_path, "w:gz") as bundle:
+            manifest = "".join(json.dumps(entry) + "\n" for entry in entries).encode("utf-8")
+            info = tarfile.TarInfo("manifest.jsonl")
+            info.size = len(manifest)
+            info.mtime = time.time()
+            bundle.addfile(info, io.BytesIO(manifest))
+            for path in sorted({entry['path'] for entry in entries}):
+                if os.path.exists(path):
+                    bundle.add(path, arcname=os.path.relpath(path, self.store.root))
+        return os.path.getsize(bundle_path)
+
+    def _expired_reports(self, cutoff):
+        """Top-level HTML reports last written before `cutoff`"""
+        if not os.path.isdir(self.reports_dir):
+            return []
+        expired = []
+        for name in os.listdir(self.reports_dir):
+            path = os.path.join(self.reports_dir, name)
+            if name.endswith(".html") and os.path.isfile(path) and os.path.getmtime(path) < cutoff:
+                expired.append(path)
+        return expired
+
+    def _referenced_media(self, skip=()):
+        """Absolute paths of local files linked from the HTML reports under reports_dir"""
+        media_dir = os.path.abspath(os.path.join(self.reports_dir, 'media'))
+        skip = {os.path.abspath(path) for path in skip}
+        referenced = set()
+        for path in self._report_files():
+            path = os.path.abspath(path)
+            if not path.endswith(".html") or path in skip or path.startswith(media_dir + os.sep):
+                continue
+            directory = os.path.dirname(path)
+            with open(path, "r", encoding="utf-8", errors="replace") as file:
+                for line in file:
+                    for reference in LOCAL_REFERENCE.findall(line):
+                        target = reference.split("?")[0].split("#")[0]
+                        referenced.add(os.path.normpath(os.path.join(directory, target)))
+        return referenced
+
+    def _unreferenced_media(self, now, skip=()):
+        media_dir = os.path.join(self.reports_dir, 'media')
+        if not os.path.isdir(media_dir):
+            return []
+        referenced = self._referenced_media(skip)
+        unreferenced = []
+        for directory, _, names in os.walk(media_dir):
+            for name in names:
+                path = os.path.join(directory, name)
+                if os.path.abspath(path) in referenced:
+                    continue
+                stat = os.stat(path)
+                # Linking a media object updates its ctime on POSIX; mtime is the object's own age
+                if now - max(stat.st_mtime, stat.st_ctime) > MEDIA_GRACE_SECONDS:
+                    unreferenced.append(path)
+        return unreferenced
+
+    def _archive_reports(self, now, stamp):
+        """
+        Archive top-level HTML reports older than the age limit, then the
+        media files under reports/media that no remaining report references.
+
+        Media objects are shared by content hash between reports, so their
+        own mtime says nothing about whether a newer report still uses them.
+        """
+        cutoff = now - self.policy.max_age_days * 86400
+        expired = self._expired_reports(cutoff)
+        expired += self._unreferenced_media(now, skip=expired)
+        if not expired:
+            return 0, 0, 0
+        bundle_path = os.path.join(self.archive_dir, f"reports_{stamp}.tar.gz")
+        with tarfile.open(bundle_path, "w:gz") as bundle:
+            for path in expired:
+                bundle.add(path, arcname=os.path.relpath(path, self.reports_dir))
+        freed = 0
+        for path in expired:
+            freed += os.path.getsize(path)
+            os.remove(path)
+        return len(expired), freed, os.path.getsize(bundle_path)
+
+    @staticmethod
+    def _log_handlers(log_path):
+        """File handlers of this process writing to `log_path`"""
+        target = os.path.abspath(log_path)
+        return [handler for handler in logging.getLogger().handlers
+                if isinstance(handler, logging.FileHandler) and os.path.abspath(handler.baseFilename) == target]
+
+    def _rename_log(self, log_path, rotated_path):
+        """Move the live log aside and reopen this process' handlers on a fresh file"""
+        handlers = self._log_handlers(log_path)
+        for handler in handlers:
+            handler.acquire()
+        try:
+            # Windows cannot rename a file that is still open
+            for handler in handlers:
+                if handler.stream:
+                    handler.stream.close()
+                    handler.stream = None
+            os.replace(log_path, rotated_path)
+        finally:
+            for handler in handlers:
+                handler.stream = handler._open()
+                handler.release()
+
+    def _rotate_logs(self, stamp):
+        rotated, freed, archived = 0, 0, 0
+        for log_path in self.log_files:
+            if not os.path.exists(log_path) or os.path.getsize(log_path) <= self.policy.max_log_bytes:
+                continue
+            name = os.path.splitext(os.path.basename(log_path))[0]
+            rotated_path = f"{log_path}.{stamp}"
+            try:
+                self._rename_log(log_path, rotated_path)
+            except OSError as e:
+                # Another process (e.g. a running pytest) still holds the log open
+                logger.warning(f"Could not rotate {log_path}: {str(e)}")
+                continue
+            archive_path = os.path.join(self.archive_dir, f"{name}_{stamp}.log.gz")
+            with open(rotated_path, "rb") as source, gzip.open(archive_path, "wb") as target:
+                shutil.copyfileobj(source, target)
+            freed += os.path.getsize(rotated_path)
+            os.remove(rotated_path)
+            archived += os.path.getsize(archive_path)
+            rotated += 1
+        return rotated, freed, archived
+
+    def run(self):
+        """Apply the policy once and return a summary of what was archived and reclaimed"""
+        start = time.perf_counter()
+        now = time.time()
+        stamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+        os.makedirs(self.archive_dir, exist_ok=True)
+
+        expired = self.plan(now)
+        runs = self.store.runs()
+        archive_bytes = 0
+        for run_id in expired:
+            archive_bytes += self._archive_run(run_id, runs[run_id])
+        objects_removed, screenshot_bytes = self.store.remove_runs(expired) if expired else (0, 0)
+
+        reports_archived, report_bytes, report_archive_bytes = self._archive_reports(now, stamp)
+        logs_rotated, log_bytes, log_archive_bytes = self._rotate_logs(stamp)
+
+        freed = screenshot_bytes + report_bytes + log_bytes
+        archived = archive_bytes + report_archive_bytes + log_archive_bytes
+        summary = {
+            'runs_archived': expired,
+            'objects_removed': objects_removed,
+            'reports_archived': reports_archived,
+            'logs_rotated': logs_rotated,
+            'bytes_freed': freed,
+            'archive_bytes': archived,
+            'bytes_reclaimed': freed - archived,
+            'duration_ms': round((time.perf_counter() - start) * 1000, 1)
+        }
+        logger.info(f"Retention: archived {len(expired)} runs, {reports_archived} report files, "
+                    f"rotated {logs_rotated} logs; freed {freed / 1024 / 1024:.1f} MB, "
+                    f"archives {archived / 1024 / 1024:.1f} MB, "
+                    f"reclaimed {(freed - archived) / 1024 / 1024:.1f} MB in {summary['duration_ms']} ms")
+        return summary
+
+    def run_in_background(self, callback=None):
+        """Run the policy on a daemon thread, calling `callback(summary)` when done"""
+        def worker():
+            try:
+                summary = self.run()
+            except Exception as e:
+                logger.error(f"Retention failed: {str(e)}")
+                return
+            if callback:
+                callback(summary)
+
+        thread = threading.Thread(target=worker, name="retention", daemon=True)
+        thread.start()
+        return thread
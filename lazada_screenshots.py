@@ -0,0 +1,503 @@
+import asyncio
+import hashlib
+import io
+import json
+import logging
+import os
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, wait as wait_futures
+
+try:
+    from PIL import Image
+except ImportError:
+    Image = None
+
+logger = logging.getLogger()
+
+# Output formats and their file extensions; WebP is encoded by PIL on the writer thread
+SCREENSHOT_FORMATS = {"png": ".png", "jpeg": ".jpg", "webp": ".webp"}
+MIME_TYPES = {".png": "image/png", ".jpg": "image/jpeg", ".webp": "image/webp"}
+
+
+def mime_type(path):
+    return MIME_TYPES.get(os.path.splitext(path)[1].lower(), "image/png")
+
+
+def encode_webp(data, quality):
+    """Re-encode PNG bytes as WebP"""
+    image = Image.open(io.BytesIO(data))
+    output = io.BytesIO()
+    image.save(output, format="WEBP", quality=quality, method=4)
+    return output.getvalue()
+
+
+# Logical element names accepted by take_screenshot(element=...), tried in order
+ELEMENT_TARGETS = {
+    "price": ["div.pdp-product-price", "div.pdp-price", "span.price", ".product-price", "div.price-container"],
+    "cart_button": ["button.add-to-cart-buy-now-btn", "button.add-to-cart", "button.btn-add-cart",
+                    "button:has-text('Thêm vào giỏ')", "button:has-text('Add to Cart')"],
+    "buy_box": ["div.pdp-block__main-information", "#module_add_to_cart", "div.pdp-product-price"],
+    "toast": [".atc-succ-toast", "div.add-to-cart-success", "div.cart-message", "div[class*='toast']"],
+    "footer": ["footer", "div.footer", "#footer"]
+}
+
+
+async def element_clip(page, target, padding=16):
+    """
+    Resolve a logical element name, CSS selector or locator to a viewport
+    clip rectangle around its bounding box plus padding, or None if no
+    candidate is visible.
+    """
+    if isinstance(target, str):
+        locators = [page.locator(selector).first for selector in ELEMENT_TARGETS.get(target, [target])]
+    else:
+        locators = [target]
+    viewport = page.viewport_size or {'width': 1366, 'height': 768}
+    for locator in locators:
+        try:
+            if not await locator.is_visible():
+                continue
+            await locator.scroll_into_view_if_needed(timeout=2000)
+            box = await locator.bounding_box()
+        except Exception:
+            continue
+        if not box or box['width'] <= 0 or box['height'] <= 0:
+            continue
+        x = max(box['x'] - padding, 0)
+        y = max(box['y'] - padding, 0)
+        width = min(box['x'] + box['width'] + padding, viewport['width']) - x
+        height = min(box['y'] + box['height'] + padding, viewport['height']) - y
+        if width > 0 and height > 0:
+            return {'x': x, 'y': y, 'width': width, 'height': height}
+    return None
+
+
+async def capture(page, fmt="png", quality=80, full_page=True, timeout=5000, clip=None):
+    """
+    Capture a screenshot to bytes in the requested format.
+
+    Returns (data, convert_to, capture_ms). PNG and JPEG are encoded by the
+    browser; for WebP a PNG is captured and `convert_to` tells the writer to
+    re-encode it off the event loop. A `clip` rectangle (viewport
+    coordinates) captures only that region.
+    """
+    if fmt == "webp" and Image is None:
+        logger.warning("Pillow is not installed, falling back to PNG screenshots")
+        fmt = "png"
+    options = {'timeout': timeout, 'full_page': full_page and clip is None}
+    if clip is not None:
+        options['clip'] = clip
+    if fmt == "jpeg":
+        options.update(type="jpeg", quality=quality)
+    else:
+        options['type'] = "png"
+    start = time.perf_counter()
+    data = await page.screenshot(**options)
+    return data, ("webp" if fmt == "webp" else None), (time.perf_counter() - start) * 1000
+
+
+async def compare_formats(page, quality=80, full_page=True):
+    """Capture the current page in every format and return size/time per format"""
+    rows = []
+    png_data = None
+    for fmt in ("png", "jpeg", "webp"):
+        if fmt == "webp":
+            if Image is None or png_data is None:
+                continue
+            start = time.perf_counter()
+            data = await asyncio.get_running_loop().run_in_executor(None, encode_webp, png_data, quality)
+            elapsed = png_capture_ms + (time.perf_counter() - start) * 1000
+        else:
+            data, _, elapsed = await capture(page, fmt, quality, full_page)
+            if fmt == "png":
+                png_data, png_capture_ms = data, elapsed
+        rows.append({'format': fmt, 'full_page': full_page, 'bytes': len(data), 'ms': round(elapsed, 1)})
+    return rows
+
+
+class ScreenshotStore:
+    """
+    Content-addressed screenshot storage.
+
+    Each unique image is saved once under its SHA-256 in `objects/`, and an
+    append-only manifest (`index.jsonl`) maps (run, test, step) to the hash
+    together with path, size and timestamp. Readers look screenshots up
+    through the manifest, never through file names.
+
+    The manifest is mirrored in memory, keyed by run, test and
+    (run, test, step). Only lines appended since the last lookup are parsed,
+    so lookups stay constant-time however many screenshots are on disk, and
+    entries written by other pytest processes are picked up on the next read.
+    With `tail=True` history written before construction is skipped, which
+    is what a test process wants: it only ever looks up its own captures.
+    """
+
+    def __init__(self, root='screenshots', tail=False):
+        self.root = root
+        self.objects_dir = os.path.join(root, 'objects')
+        self.index_path = os.path.join(root, 'index.jsonl')
+        self.current_test = None
+        self.stored = 0
+        self.deduplicated = 0
+        self._lock = threading.Lock()
+        self._reset_index()
+        if tail and os.path.exists(self.index_path):
+            self._offset = os.path.getsize(self.index_path)
+
+    def _reset_index(self):
+        self._offset = 0
+        self._all = []
+        self._by_run = {}
+        self._by_test = {}
+        self._by_run_test = {}
+        self._by_key = {}
+        self._by_hash = {}
+
+    def _add_to_index(self, entry):
+        self._all.append(entry)
+        self._by_run.setdefault(entry['run'], []).append(entry)
+        self._by_test.setdefault(entry['test'], []).append(entry)
+        self._by_run_test.setdefault((entry['run'], entry['test']), []).append(entry)
+        self._by_key[(entry['run'], entry['test'], entry['step'])] = entry
+        self._by_hash.setdefault(entry['hash'], []).append(entry)
+
+    def _refresh(self):
+        """Parse manifest lines appended since the last call"""
+        try:
+            size = os.path.getsize(self.index_path)
+        except OSError:
+            self._reset_index()
+            return
+        if size < self._offset:
+            # Manifest was rewritten (pruned), rebuild from scratch
+            self._reset_index()
+        if size == self._offset:
+            return
+
+        with open(self.index_path, "rb") as file:
+            file.seek(self._offset)
+            chunk = file.read(size - self._offset)
+        # Leave a partially written last line for the next refresh
+        complete = chunk.rfind(b"\n") + 1
+        for line in chunk[:complete].splitlines():
+            try:
+                self._add_to_index(json.loads(line))
+            except (ValueError, KeyError):
+                continue
+        self._offset += complete
+
+    def object_path(self, digest, extension):
+        return os.path.join(self.objects_dir, digest[:2], f"{digest}{extension}")
+
+    def put(self, data, extension, run_id, test, step, timestamp=None):
+        """
+        Store image bytes once and record (run, test, step) -> hash, return the
+        manifest entry; `timestamp` is the capture time if it was taken earlier
+        """
+        digest = hashlib.sha256(data).hexdigest()
+        path = self.object_path(digest, extension)
+        exists = os.path.exists(path)
+        if not exists:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            temp_path = f"{path}.{threading.get_ident()}.tmp"
+            with open(temp_path, "wb") as file:
+                file.write(data)
+            os.replace(temp_path, path)
+
+        entry = {'run': run_id, 'test': test, 'step': step, 'hash': digest,
+                 'path': path, 'size': len(data), 'timestamp': timestamp or time.time()}
+        # Writer pool threads share the counters and the manifest
+        with self._lock:
+            if exists:
+                self.deduplicated += 1
+            else:
+                self.stored += 1
+            with open(self.index_path, "a", encoding="utf-8") as file:
+                file.write(json.dumps(entry) + "\n")
+        return entry
+
+    def entries(self, run_id=None, test=None):
+        """Return manifest entries, oldest first, optionally filtered by run and test"""
+        with self._lock:
+            self._refresh()
+            if run_id is not None and test is not None:
+                return list(self._by_run_test.get((run_id, test), []))
+            if run_id is not None:
+                return list(self._by_run.get(run_id, []))
+            if test is not None:
+                return list(self._by_test.get(test, []))
+            return list(self._all)
+
+    def lookup(self, run_id, test, step):
+        """Return the latest entry recorded for (run, test, step), or None"""
+        with self._lock:
+            self._refresh()
+            return self._by_key.get((run_id, test, step))
+
+    def by_hash(self, digest):
+        """Return every entry that points at the object with this content hash, oldest first"""
+        with self._lock:
+            self._refresh()
+            return list(self._by_hash.get(digest, []))
+
+    def latest(self, limit=None, test=None, run_id=None):
+        """Return the newest entries first, reading only the last `limit` of them"""
+        with self._lock:
+            self._refresh()
+            if run_id is not None and test is not None:
+                source = self._by_run_test.get((run_id, test), [])
+            elif run_id is not None:
+                source = self._by_run.get(run_id, [])
+            elif test is not None:
+                source = self._by_test.get(test, [])
+            else:
+                source = self._all
+            return source[-limit:][::-1] if limit else source[::-1]
+
+    def recent(self, limit):
+        """
+        Newest `limit` entries, newest first, without loading the whole
+        manifest: it is read backwards in blocks until enough lines are
+        found. Once the in-memory mirror is loaded this is latest(limit).
+        """
+        with self._lock:
+            if self._offset:
+                self._refresh()
+                return self._all[-limit:][::-1]
+        try:
+            position = os.path.getsize(self.index_path)
+        except OSError:
+            return []
+
+        entries = []
+        partial = b""
+        with open(self.index_path, "rb") as file:
+            while position > 0 and len(entries) < limit:
+                step = min(64 * 1024, position)
+                position -= step
+                file.seek(position)
+                lines = (file.read(step) + partial).split(b"\n")
+                # The first line of a block may continue in the previous block
+                partial = lines.pop(0) if position > 0 else b""
+                for line in reversed(lines):
+                    if not line.strip():
+                        continue
+                    try:
+                        entries.append(json.loads(line))
+                    except ValueError:
+                        continue
+                    if len(entries) == limit:
+                        break
+        return entries
+
+    def runs(self):
+        """Return {run_id: entries} in order of first capture"""
+        with self._lock:
+            self._refresh()
+            return {run_id: list(entries) for run_id, entries in self._by_run.items()}
+
+    def _rewrite(self, select):
+        """
+        Replace the manifest with the entries chosen by `select(entries)` and
+        delete objects no longer referenced, return (objects removed, bytes freed)
+        """
+        with self._lock:
+            self._refresh()
+            entries = self._all
+            kept = select(entries)
+            temp_path = f"{self.index_path}.tmp"
+            with open(temp_path, "w", encoding="utf-8") as file:
+                for entry in kept:
+                    file.write(json.dumps(entry) + "\n")
+            os.replace(temp_path, self.index_path)
+            self._reset_index()
+        referenced = {entry['path'] for entry in kept}
+        removed = freed = 0
+        for entry in entries:
+            if entry['path'] not in referenced and os.path.exists(entry['path']):
+                freed += os.path.getsize(entry['path'])
+                os.remove(entry['path'])
+                referenced.add(entry['path'])
+                removed += 1
+        return removed, freed
+
+    def prune(self, keep):
+        """Keep only the `keep` newest manifest entries and delete objects no longer referenced"""
+        removed, _ = self._rewrite(lambda entries: entries[-keep:] if keep else [])
+        return removed
+
+    def remove_runs(self, run_ids):
+        """Drop every entry of the given runs, return (objects removed, bytes freed)"""
+        run_ids = set(run_ids)
+        return self._rewrite(lambda entries: [entry for entry in entries if entry['run'] not in run_ids])
+
+
+class ScreenshotWriter:
+    """
+    Persist screenshot bytes on a background thread pool.
+
+    The test hands over captured bytes and continues immediately; at most
+    `max_pending` captures are held in memory, further submits wait for the
+    oldest write to finish. Call `flush()` before the test ends.
+    """
+
+    def __init__(self, store, max_workers=2, max_pending=4):
+        self.store = store
+        self.max_workers = max_workers
+        self.max_pending = max_pending
+        self._executor = None
+        self._pending = deque()
+        # Guards the metrics below, which pool threads update concurrently
+        self._lock = threading.Lock()
+
+        # Metrics
+        self.queue_depths = []
+        self.write_latencies = []
+        self.backpressure_waits = 0
+        self.bytes_written = 0
+        self.format_stats = {}
+        self.comparison = None
+
+    def _prune(self):
+        while self._pending and self._pending[0].done():
+            self._pending.popleft()
+
+    def _write(self, key, data, extension, queued_at, convert_to=None, quality=80, label=None, capture_ms=0.0):
+        encode_ms = 0.0
+        if convert_to == "webp":
+            start = time.perf_counter()
+            data = encode_webp(data, quality)
+            encode_ms = (time.perf_counter() - start) * 1000
+        entry = self.store.put(data, extension, *key)
+        with self._lock:
+            self.bytes_written += len(data)
+            self.write_latencies.append((time.perf_counter() - queued_at) * 1000)
+            if label:
+                stats = self.format_stats.setdefault(label, {'count': 0, 'bytes': 0, 'capture_ms': 0.0,
+                                                             'encode_ms': 0.0})
+                stats['count'] += 1
+                stats['bytes'] += len(data)
+                stats['capture_ms'] += capture_ms
+                stats['encode_ms'] += encode_ms
+        return entry
+
+    async def submit(self, key, data, extension=".png", convert_to=None, quality=80, label=None, capture_ms=0.0):
+        """
+        Queue bytes for the store under key (run_id, test, step), waiting only
+        when the queue is full. The returned future resolves to the index entry.
+        """
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(self.max_workers, thread_name_prefix="screenshot-writer")
+
+        self._prune()
+        while len(self._pending) >= self.max_pending:
+            self.backpressure_waits += 1
+            try:
+                await asyncio.wrap_future(self._pending[0])
+            except Exception:
+                pass
+            self._prune()
+
+        future = self._executor.submit(self._write, key, data, extension, time.perf_counter(),
+                                       convert_to, quality, label, capture_ms)
+        future.add_done_callback(self._log_failure)
+        self._pending.append(future)
+        self.queue_depths.append(len(self._pending))
+        return future
+
+    @staticmethod
+    def _log_failure(future):
+        if future.exception() is not None:
+            logger.error(f"Failed to write screenshot: {str(future.exception())}")
+
+    async def flush(self):
+        """Wait until every queued screenshot has been written"""
+        pending = list(self._pending)
+        self._pending.clear()
+        if pending:
+            await asyncio.gather(*(asyncio.wrap_future(f) for f in pending), return_exceptions=True)
+
+    def wait(self):
+        """Blocking variant of flush() for synchronous callers such as pytest hooks"""
+        pending = list(self._pending)
+        self._pending.clear()
+        if pending:
+            wait_futures(pending)
+
+    def stats(self):
+        with self._lock:
+            latencies = sorted(self.write_latencies)
+            bytes_written = self.bytes_written
+            formats = {label: dict(fmt_stats) for label, fmt_stats in self.format_stats.items()}
+        return {
+            'written': len(latencies),
+            'bytes': bytes_written,
+            'max_queue_depth': max(self.queue_depths, default=0),
+            'backpressure_waits': self.backpressure_waits,
+            'write_ms_avg': round(sum(latencies) / len(latencies), 1) if latencies else 0,
+            'write_ms_max': round(latencies[-1], 1) if latencies else 0,
+            'unique_stored': self.store.stored,
+            'deduplicated': self.store.deduplicated,
+            'formats': formats
+        }
+
+    def report(self):
+        stats = self.stats()
+        logger.info(f"Screenshot writer: {stats['written']} captures ({stats['deduplicated']} deduplicated), "
+                    f"{stats['bytes'] / 1024:.1f} KB, "
+                    f"max queue depth {stats['max_queue_depth']}, {stats['backpressure_waits']} waits, "
+                    f"write latency avg {stats['write_ms_avg']} ms / max {stats['write_ms_max']} ms")
+        for label, fmt_stats in stats['formats'].items():
+            count = fmt_stats['count']
+            logger.info(f"  {label}: {count} files, avg {fmt_stats['bytes'] / count / 1024:.1f} KB, "
+                        f"capture {fmt_stats['capture_ms'] / count:.1f} ms, encode {fmt_stats['encode_ms'] / count:.1f} ms")
+
+    def reset_stats(self):
+        with self._lock:
+            self.queue_depths = []
+            self.write_latencies = []
+            self.backpressure_waits = 0
+            self.bytes_written = 0
+            self.format_stats = {}
+            self.comparison = None
+
+
+SCREENSHOT_POLICIES = ("off", "on-failure", "key-steps", "all")
+
+# Steps whose screenshots are kept under the "key-steps" policy
+KEY_STEPS = {
+    "homepage", "search_results", "product_page", "category_page", "after_add_to_cart",
+    "cart_page_direct", "cart_page_via_icon", "mobile_viewport", "performance_homepage",
+    "footer", "footer_for_privacy", "product_page_for_images"
+}
+
+
+def is_key_step(step):
+    """Key steps are the main evidence of a test plus every error/dead-end capture"""
+    return step in KEY_STEPS or step.endswith(("_error", "_timeout")) or step.startswith("no_")
+
+
+class FailureFrameBuffer:
+    """
+    Keep the last N viewport frames of a test in memory.
+
+    Frames are only written to disk when the test fails, so a passing run
+    under the "on-failure" policy never touches the screenshots directory.
+    """
+
+    def __init__(self, size=5):
+        self.frames = deque(maxlen=size)
+
+    def add(self, step, data):
+        self.frames.append((step, time.time(), data))
+
+    def clear(self):
+        self.frames.clear()
+
+    def persist(self, store, run_id, test):
+        """Save buffered frames to the store at their capture time, return their index entries (oldest first)"""
+        entries = [store.put(data, ".png", run_id, test, step, timestamp) for step, timestamp, data in self.frames]
+        self.frames.clear()
+        return entries
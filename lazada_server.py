@@ -0,0 +1,267 @@
+import email.utils
+import gzip
+import logging
+import mimetypes
+import os
+import re
+import threading
+from collections import OrderedDict
+from http import HTTPStatus
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import quote, unquote, urlsplit
+
+logger = logging.getLogger()
+
+SERVER_HOST = '127.0.0.1'
+SERVER_PORT = 8765
+SERVED_DIRS = ('reports', 'screenshots')
+
+# Text types worth compressing; images, zips and videos are already compressed
+GZIP_TYPES = ('text/html', 'text/css', 'text/plain', 'application/json', 'application/javascript',
+              'text/javascript', 'application/xml', 'text/xml')
+GZIP_MAX_BYTES = 16 * 1024 * 1024
+GZIP_CACHE_BYTES = 64 * 1024 * 1024
+
+# Content-addressed files never change under the same name
+IMMUTABLE_PATH = re.compile(r'(^|/)(objects|thumbs|media)/.*[0-9a-f]{64}')
+
+RANGE_HEADER = re.compile(r'^bytes=(\d*)-(\d*)$')
+
+mimetypes.add_type('application/json', '.jsonl')
+mimetypes.add_type('image/webp', '.webp')
+
+
+class GzipCache:
+    """Compressed bodies keyed by (path, etag), evicted least recently used by total size"""
+
+    def __init__(self, max_bytes=GZIP_CACHE_BYTES):
+        self.max_bytes = max_bytes
+        self.size = 0
+        self.items = OrderedDict()
+        self.lock = threading.Lock()
+
+    def get(self, path, etag):
+        key = (path, etag)
+        with self.lock:
+            body = self.items.get(key)
+            if body is not None:
+                self.items.move_to_end(key)
+                return body
+        with open(path, "rb") as file:
+            body = gzip.compress(file.read(), compresslevel=6)
+        with self.lock:
+            if key not in self.items:
+                self.items[key] = body
+                self.size += len(body)
+                while self.size > self.max_bytes and len(self.items) > 1:
+                    _, evicted = self.items.popitem(last=False)
+                    self.size -= len(evicted)
+        return body
+
+
+class ReportRequestHandler(BaseHTTPRequestHandler):
+    """
+    GET/HEAD for files under the served directories.
+
+    Sends ETag and Last-Modified validators (answering If-None-Match with
+    304), long-lived Cache-Control for content-addressed files and
+    revalidation for everything else, gzip for text types (with its own
+    "-gz" ETag), and single byte ranges so trace zips and videos can be
+    fetched partially.
+    """
+
+    protocol_version = "HTTP/1.1"
+    server_version = "LazadaReportServer/1.0"
+
+    def log_message(self, format, *args):
+        logger.debug(f"Report server: {self.address_string()} {format % args}")
+
+    def do_GET(self):
+        self._send(head=False)
+
+    def do_HEAD(self):
+        self._send(head=True)
+
+    def _resolve(self):
+        """Map the URL path to a file inside a served directory, or None"""
+        relative = unquote(urlsplit(self.path).path).lstrip("/")
+        if relative.split("/")[0] not in SERVED_DIRS:
+            return None, relative
+        path = os.path.realpath(os.path.join(self.server.root, relative))
+        allowed = [os.path.realpath(os.path.join(self.server.root, name)) for name in SERVED_DIRS]
+        if not any(path == base or path.startswith(base + os.sep) for base in allowed):
+            return None, relative
+        if os.path.isdir(path):
+            path = os.path.join(path, "index.html")
+        return (path if os.path.isfile(path) else None), relative
+
+    def _send(self, head):
+        path, relative = self._resolve()
+        if path is None:
+            self.send_error(HTTPStatus.NOT_FOUND)
+            return
+
+        stat = os.stat(path)
+        content_type = mimetypes.guess_type(path)[0] or "application/octet-stream"
+        compressible = content_type in GZIP_TYPES and stat.st_size <= GZIP_MAX_BYTES
+        if content_type.startswith("text/") or content_type == "application/json":
+            content_type += "; charset=utf-8"
+        # The gzip body is a different representation, so it gets its own validator
+        identity_etag = f'"{stat.st_size:x}-{stat.st_mtime_ns:x}"'
+        gzip_etag = f'"{stat.st_size:x}-{stat.st_mtime_ns:x}-gz"'
+        etag = identity_etag
+
+        def common_headers():
+            self.send_header("ETag", etag)
+            self.send_header("Last-Modified", email.utils.formatdate(stat.st_mtime, usegmt=True))
+            self.send_header("Accept-Ranges", "bytes")
+            if compressible:
+                self.send_header("Vary", "Accept-Encoding")
+            if IMMUTABLE_PATH.search(relative):
+                self.send_header("Cache-Control", "public, max-age=31536000, immutable")
+            else:
+                # Session reports and the dashboard are rewritten while a run is going
+                self.send_header("Cache-Control", "no-cache")
+
+        start, end = 0, stat.st_size - 1
+        status = HTTPStatus.OK
+        range_header = self.headers.get("Range")
+        if_range = self.headers.get("If-Range")
+        if range_header and (not if_range or if_range == identity_etag):
+            match = RANGE_HEADER.match(range_header.strip())
+            first, last = match.groups() if match else ("", "")
+            # Multiple ranges and invalid ones (bytes=5-3) are ignored and the whole file is sent, per RFC 7233
+            if (first or last) and not (first and last and int(last) < int(first)):
+                if first:
+                    start = int(first)
+                    end = min(int(last), end) if last else end
+                else:
+                    start = max(stat.st_size - int(last), 0)
+                if start > end or start >= stat.st_size:
+                    self.send_response(HTTPStatus.REQUESTED_RANGE_NOT_SATISFIABLE)
+                    self.send_header("Content-Range", f"bytes */{stat.st_size}")
+                    self.send_header("Content-Length", "0")
+                    self.end_headers()
+                    return
+                status = HTTPStatus.PARTIAL_CONTENT
+
+        compress = (status == HTTPStatus.OK and compressible
+                    and "gzip" in self.headers.get("Accept-Encoding", ""))
+        if compress:
+            etag = gzip_etag
+
+        if etag in [tag.strip() for tag in self.headers.get("If-None-Match", "").split(",")]:
+            self.send_response(HTTPStatus.NOT_MODIFIED)
+            common_headers()
+            self.end_headers()
+            return
+
+        body = self.server.gzip_cache.get(path, etag) if compress else None
+
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        common_headers()
+        if compress:
+            self.send_header("Content-Encoding", "gzip")
+            self.send_header("Content-Length", str(len(body)))
+        else:
+            if status == HTTPStatus.PARTIAL_CONTENT:
+                self.send_header("Content-Range", f"bytes {start}-{end}/{stat.st_size}")
+            self.send_header("Content-Length", str(end - start + 1))
+        self.end_headers()
+        if head:
+            return
+
+        try:
+            if compress:
+                self.wfile.write(body)
+                return
+            with open(path, "rb") as file:
+                file.seek(start)
+                remaining = end - start + 1
+                while remaining > 0:
+                    chunk = file.read(min(remaining, 256 * 1024))
+                    if not chunk:
+                        break
+                    self.wfile.write(chunk)
+                    remaining -= len(chunk)
+        except (BrokenPipeError, ConnectionResetError):
+            # The browser cancelled the request (e.g. a lazy image scrolled away)
+            pass
+
+
+class ReportHTTPServer(ThreadingHTTPServer):
+    daemon_threads = True
+    request_queue_size = 128
+
+    def __init__(self, address, root):
+        self.root = root
+        self.gzip_cache = GzipCache()
+        super().__init__(address, ReportRequestHandler)
+
+
+class ReportServer:
+    """
+    Local HTTP server for reports/ and screenshots/, bound to 127.0.0.1.
+
+    `start()` serves on a daemon thread (one thread per connection) using
+    SERVER_PORT, or any free port when it is taken; `url_for()` turns a
+    path under a served directory into its URL.
+    """
+
+    def __init__(self, root=None, port=None):
+        self.root = os.path.abspath(root or os.getcwd())
+        self.port = int(port if port is not None else os.environ.get('REPORT_SERVER_PORT', SERVER_PORT))
+        self.httpd = None
+        self.thread = None
+
+    @property
+    def running(self):
+        return self.httpd is not None
+
+    def start(self):
+        if self.httpd:
+            return self
+        try:
+            self.httpd = ReportHTTPServer((SERVER_HOST, self.port), self.root)
+        except OSError:
+            self.httpd = ReportHTTPServer((SERVER_HOST, 0), self.root)
+        self.port = self.httpd.server_address[1]
+        self.thread = threading.Thread(target=self.httpd.serve_forever, name="report-server", daemon=True)
+        self.thread.start()
+        logger.info(f"Report server listening on http://{SERVER_HOST}:{self.port}/")
+        return self
+
+    def serve_forever(self):
+        """Serve in the calling thread until interrupted (CLI)"""
+        self.start()
+        try:
+            self.thread.join()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            self.stop()
+
+    def stop(self):
+        if self.httpd:
+            self.httpd.shutdown()
+            self.httpd.server_close()
+            self.httpd = None
+
+    def url_for(self, path):
+        """URL of a file under a served directory, or None if it is outside them"""
+        try:
+            relative = os.path.relpath(os.path.abspath(path), self.root)
+        except ValueError:
+            # Another drive on Windows
+            return None
+        if relative.startswith("..") or relative.split(os.sep)[0] not in SERVED_DIRS:
+            return None
+        return f"http://{SERVER_HOST}:{self.port}/{quote(relative.replace(os.sep, '/'))}"
+
+    def open(self, path):
+        """Open a file in the browser through the server, falling back to a file:// URL"""
+        import webbrowser
+        url = self.start().url_for(path) or "file:///" + os.path.abspath(path).replace("\\", "/").lstrip("/")
+        webbrowser.open(url)
+        return url
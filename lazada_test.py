@@ -1,14 +1,21 @@
 import asyncio
+import json
 import logging
 import os
 import time
 import sys
 import glob
-import base64
 from datetime import datetime
+from urllib.parse import urljoin, quote
 import pytest
 import pytest_asyncio
 from playwright.async_api import async_playwright, expect, TimeoutError
+from lazada_network import NetworkRecorder, LinkChecker, SecurityAudit, HttpProbe, summarize_cookies
+from lazada_cart_mock import CartMock
+from lazada_screenshots import (ScreenshotStore, ScreenshotWriter, FailureFrameBuffer, SCREENSHOT_POLICIES, SCREENSHOT_FORMATS,
+                                is_key_step, capture, compare_formats, element_clip)
+from lazada_visual import VisualRegression, VISUAL_PAGES, VISUAL_MODES
+from lazada_events import emit, current_run_id
 
 # Configure logging
 logging.basicConfig(
@@ -29,147 +36,64 @@ for dir_path in ['screenshots', 'reports', 'test_data']:
 # Global variables
 SCREENSHOTS_DIR = 'screenshots'
 REPORTS_DIR = 'reports'
+CART_URL = 'https://cart.lazada.vn/cart'
 
-# Custom hooks for pytest-html report
-@pytest.hookimpl(hookwrapper=True)
-def pytest_runtest_makereport(item, call):
-    pytest_html = item.config.pluginmanager.getplugin("html")
-    outcome = yield
-    report = outcome.get_result()
-    
-    # Add extra property to report for screenshots
-    extra = getattr(report, "extra", [])
-    
-    if report.when == "call":
-        # Get test name
-        test_name = report.nodeid.split("::")[-1]
-        short_name = test_name.split("_")[-1]
-        
-        # Find screenshots related to this test
-        screenshot_files = sorted(
-            glob.glob(os.path.join(SCREENSHOTS_DIR, f"*{short_name}*.png")),
-            key=os.path.getmtime,
-            reverse=True
-        )
-        
-        # Add test log info
-        extra.append(pytest_html.extras.text(f"Test: {test_name}"))
-        
-        # Add screenshots to report
-        if screenshot_files:
-            for i, img_path in enumerate(screenshot_files[:3]):  # Limit to 3 screenshots
-                try:
-                    with open(img_path, "rb") as img_file:
-                        img_base64 = base64.b64encode(img_file.read()).decode("utf-8")
-                        img_name = os.path.basename(img_path)
-                        extra.append(pytest_html.extras.html(
-                            f'<div style="margin: 10px 0;"><strong>Screenshot: {img_name}</strong><br/>'
-                            f'<a href="data:image/png;base64,{img_base64}" target="_blank">'
-                            f'<img src="data:image/png;base64,{img_base64}" style="max-width:600px; border:1px solid #ddd; padding:5px;" />'
-                            f'</a></div>'
-                        ))
-                except Exception as img_err:
-                    logger.error(f"Error adding screenshot {img_path} to report: {str(img_err)}")
-                    extra.append(pytest_html.extras.text(f"Error adding screenshot: {str(img_err)}"))
-        else:
-            extra.append(pytest_html.extras.text("No screenshots found for this test"))
-            
-        report.extra = extra
+# Identifies one test session across the per-test pytest processes started by the GUI
+RUN_ID = current_run_id()
+
+# Screenshots are captured to bytes and written to a content-addressed store by a background thread pool;
+# the test process only tails the manifest for its own captures
+screenshot_store = ScreenshotStore(SCREENSHOTS_DIR, tail=True)
+screenshot_writer = ScreenshotWriter(
+    screenshot_store,
+    max_workers=int(os.environ.get('SCREENSHOT_WRITERS', '2')),
+    max_pending=int(os.environ.get('SCREENSHOT_MAX_PENDING', '4'))
+)
 
-# Custom pytest-html report
-def pytest_html_report_title(report):
-    report.title = "Báo cáo kiểm thử tự động website Lazada"
+# Screenshot policy: off, on-failure, key-steps or all
+SCREENSHOT_POLICY = os.environ.get('SCREENSHOT_POLICY', 'all').lower()
+if SCREENSHOT_POLICY not in SCREENSHOT_POLICIES:
+    logger.warning(f"Unknown SCREENSHOT_POLICY '{SCREENSHOT_POLICY}', using 'all'")
+    SCREENSHOT_POLICY = 'all'
 
-def pytest_configure(config):
-    # Add custom CSS to report
-    config._metadata.clear()  # Clear default metadata
-    config._metadata["Ngày kiểm thử"] = datetime.now().strftime("%d/%m/%Y %H:%M:%S")
-    config._metadata["Website"] = "https://www.lazada.vn"
-    config._metadata["Trình duyệt"] = "Chromium (Playwright)"
-    
-    # Modify HTML report environment section
-    pytest_html = config.pluginmanager.getplugin('html')
-    if pytest_html:
-        pytest_html.css_files[0] = f"{pytest_html.css_files[0]}, custom.css"
-        pytest_html.jquery_files[0] = f"{pytest_html.jquery_files[0]}, custom.js"
+# Screenshot encoding: png, jpeg or webp, quality for lossy formats, default scope full or viewport
+SCREENSHOT_FORMAT = os.environ.get('SCREENSHOT_FORMAT', 'png').lower()
+if SCREENSHOT_FORMAT not in SCREENSHOT_FORMATS:
+    logger.warning(f"Unknown SCREENSHOT_FORMAT '{SCREENSHOT_FORMAT}', using 'png'")
+    SCREENSHOT_FORMAT = 'png'
+try:
+    SCREENSHOT_QUALITY = min(max(int(os.environ.get('SCREENSHOT_QUALITY', '80')), 1), 100)
+except ValueError:
+    logger.warning(f"Invalid SCREENSHOT_QUALITY '{os.environ.get('SCREENSHOT_QUALITY')}', using 80")
+    SCREENSHOT_QUALITY = 80
+SCREENSHOT_FULL_PAGE = os.environ.get('SCREENSHOT_SCOPE', 'full').lower() != 'viewport'
+SCREENSHOT_COMPARE = os.environ.get('SCREENSHOT_COMPARE', 'False').lower() in ('true', '1', 't')
 
-def pytest_html_assets_manifest():
-    return {
-        # Add custom CSS for report styling
-        "css": {
-            "custom.css": f"""
-                .report-logo {{ max-width: 100%; margin-bottom: 20px; }}
-                .test-summary {{ display: flex; flex-wrap: wrap; justify-content: space-between; margin-bottom: 20px; }}
-                .summary-item {{ flex: 1; min-width: 140px; padding: 10px; margin: 5px; border-radius: 5px; text-align: center; }}
-                .summary-pass {{ background-color: #d4edda; color: #155724; }}
-                .summary-fail {{ background-color: #f8d7da; color: #721c24; }}
-                .summary-skip {{ background-color: #fff3cd; color: #856404; }}
-                .summary-error {{ background-color: #f5c6cb; color: #721c24; }}
-                .summary-all {{ background-color: #e2e3e5; color: #383d41; }}
-                .screenshot-container {{ display: flex; flex-wrap: wrap; gap: 10px; margin-top: 10px; }}
-                .screenshot-item {{ border: 1px solid #ddd; padding: 5px; margin: 5px 0; }}
-                table {{ width: 100%; margin-top: 20px; }}
-                th {{ background-color: #f8f9fa; }}
-                .log {{ max-height: 300px; overflow: auto; background-color: #f8f9fa; border: 1px solid #ddd; padding: 10px; }}
-                img {{ max-width: 100%; }}
-                @media print {{ 
-                    .log {{ max-height: none; }}
-                    a[href]:after {{ content: none !important; }}
-                }}
-            """
-        },
-        "js": {
-            "custom.js": """
-                // Custom JavaScript for test report
-                $(document).ready(function() {
-                    // Add title to screenshots section
-                    $('.extra').each(function() {
-                        if ($(this).find('img').length > 0 && !$(this).prev().hasClass('screenshots-title')) {
-                            $(this).before('<h3 class="screenshots-title">Ảnh chụp màn hình</h3>');
-                        }
-                    });
-                    
-                    // Make images clickable to open in new tab
-                    $('img').click(function() {
-                        window.open($(this).attr('src'), '_blank');
-                    }).css('cursor', 'pointer');
-                    
-                    // Add summary counts at the top of the report
-                    const passed = $('.col-result:contains("Passed")').length;
-                    const failed = $('.col-result:contains("Failed")').length;
-                    const skipped = $('.col-result:contains("Skipped")').length;
-                    const error = $('.col-result:contains("Error")').length;
-                    const total = passed + failed + skipped + error;
-                    
-                    const summaryHtml = `
-                        <div class="test-summary">
-                            <div class="summary-item summary-pass">
-                                <h3>Đạt</h3>
-                                <p>${passed}</p>
-                            </div>
-                            <div class="summary-item summary-fail">
-                                <h3>Lỗi</h3>
-                                <p>${failed}</p>
-                            </div>
-                            <div class="summary-item summary-skip">
-                                <h3>Bỏ qua</h3>
-                                <p>${skipped}</p>
-                            </div>
-                            <div class="summary-item summary-all">
-                                <h3>Tổng số</h3>
-                                <p>${total}</p>
-                            </div>
-                        </div>
-                    `;
-                    
-                    $('h1').after(summaryHtml);
-                    
-                    // Add Lazada logo
-                    $('h1').before('<div class="report-logo"><img src="https://laz-img-cdn.alicdn.com/tfs/TB1T7K2d8Cw3KVjSZFuXXcAOpXa-1024-1024.png" alt="Lazada Logo" style="max-width: 100px;"></div>');
-                });
-            """
-        }
-    }
+# Visual regression of key pages against approved baselines: off, report, assert (fail the test) or update
+# Opt-in: the check takes its own PNG capture whatever SCREENSHOT_POLICY says
+VISUAL_MODE = os.environ.get('VISUAL_REGRESSION', 'off').lower()
+if VISUAL_MODE not in VISUAL_MODES:
+    logger.warning(f"Unknown VISUAL_REGRESSION '{VISUAL_MODE}', using 'off'")
+    VISUAL_MODE = 'off'
+visual_regression = VisualRegression(
+    VISUAL_MODE,
+    threshold=int(os.environ.get('VISUAL_THRESHOLD', '24')),
+    tolerance=float(os.environ.get('VISUAL_TOLERANCE', '0.5')) / 100
+)
+
+# Playwright tracing: off, on-failure (trace kept only for failed tests) or always
+TRACING_MODE = os.environ.get('TRACING', 'on-failure').lower()
+if TRACING_MODE not in ('off', 'on-failure', 'always'):
+    logger.warning(f"Unknown TRACING '{TRACING_MODE}', using 'on-failure'")
+    TRACING_MODE = 'on-failure'
+TRACES_DIR = os.path.join(REPORTS_DIR, 'traces')
+
+def trace_path(nodeid):
+    """Trace zip of a test in this run"""
+    return os.path.join(TRACES_DIR, f"{nodeid.split('::')[-1]}_{RUN_ID}.zip")
+
+# Last viewport frames of the running test, persisted only if it fails ("on-failure" policy)
+failure_frames = FailureFrameBuffer(size=int(os.environ.get('SCREENSHOT_FAILURE_FRAMES', '5')))
 
 class TestLazada:
     """
@@ -178,7 +102,7 @@ class TestLazada:
     """
     
     @pytest_asyncio.fixture(scope="function")
-    async def browser_context(self):
+    async def browser_context(self, request):
         """Set up the browser context for testing"""
         logger.info("Setting up browser context...")
         
@@ -193,53 +117,243 @@ class TestLazada:
             headless=headless,
             timeout=30000  # 30 second timeout for browser launch
         )
+        user_agent = 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/119.0.0.0 Safari/537.36'
         context = await browser.new_context(
             viewport={'width': 1366, 'height': 768},
-            user_agent='Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/119.0.0.0 Safari/537.36'
+            user_agent=user_agent
         )
         
+        # Shared request context for checks that only need HTTP facts, not the DOM
+        probe = await HttpProbe.create(playwright, user_agent=user_agent)
+        
+        # Trace every test, keep the chunk only when needed (see finish_trace)
+        trace_start_ms = 0.0
+        if TRACING_MODE != "off":
+            trace_start = time.perf_counter()
+            await context.tracing.start(screenshots=True, snapshots=True, sources=True)
+            await context.tracing.start_chunk(title=request.node.name)
+            trace_start_ms = (time.perf_counter() - trace_start) * 1000
+        
         # Create a new page with logging and set default timeout
         page = await context.new_page()
         page.set_default_timeout(15000)  # 15 second default timeout for all operations
         page.on("console", lambda msg: logger.info(f"Browser console: {msg.text}"))
         
+        # Frames of a previous test must never be attached to this one
+        failure_frames.clear()
+        screenshot_store.current_test = request.node.nodeid
+        
+        # Record every request/response of this test for the network summary
+        network = NetworkRecorder()
+        network.attach(page)
+        
         # Test data - can be customized via environment variables
         test_data = {
             'base_url': os.environ.get('TEST_URL', 'https://www.lazada.vn/'),
             'test_product': os.environ.get('TEST_PRODUCT', 'điện thoại Samsung'),
-            'category': os.environ.get('TEST_CATEGORY', 'Điện Thoại & Máy Tính Bảng')
+            'category': os.environ.get('TEST_CATEGORY', 'Điện Thoại & Máy Tính Bảng'),
+            'security_urls': [u.strip() for u in os.environ.get('SECURITY_AUDIT_URLS', '').split(',') if u.strip()],
+            'cart_mode': os.environ.get('CART_MODE', 'live').lower()
         }
         
+        # Answer cart endpoints from fixtures instead of the live backend when requested
+        cart_mock = None
+        if test_data['cart_mode'] == 'mock':
+            cart_mock = CartMock(latency_ms=int(os.environ.get('CART_MOCK_LATENCY_MS', '200')))
+            await cart_mock.install(context)
+        
         # Yield the context dict to the tests
         context_dict = {
             'page': page, 
             'context': context, 
             'browser': browser, 
             'test_data': test_data, 
-            'playwright': playwright
+            'playwright': playwright,
+            'network': network,
+            'probe': probe,
+            'cart_mock': cart_mock
         }
         
         logger.info("Browser context setup complete")
         yield context_dict
         
-        # Teardown - close browser and playwright
+        # Teardown - flush screenshots, save network summary, close probe, browser and playwright
         logger.info("Tearing down browser context...")
-        await browser.close()
-        await playwright.stop()
+        try:
+            await screenshot_writer.flush()
+            screenshot_writer.report()
+            if SCREENSHOT_POLICY == "on-failure":
+                # Only a failed test persists its buffered frames (rep_call is set by the lazada_events plugin)
+                rep_call = getattr(request.node, "rep_call", None)
+                if rep_call is not None and rep_call.failed:
+                    for entry in failure_frames.persist(screenshot_store, RUN_ID, request.node.nodeid):
+                        emit('screenshot', nodeid=entry['test'], step=entry['step'], hash=entry['hash'],
+                             path=entry['path'], size=entry['size'])
+                failure_frames.clear()
+            try:
+                # Per-run size/time log used to pick screenshot defaults
+                with open(os.path.join(REPORTS_DIR, "screenshot_formats.jsonl"), "a", encoding="utf-8") as file:
+                    file.write(json.dumps({
+                        'test': request.node.name,
+                        'timestamp': datetime.now().isoformat(timespec="seconds"),
+                        'format': SCREENSHOT_FORMAT,
+                        'quality': SCREENSHOT_QUALITY,
+                        'stats': screenshot_writer.stats(),
+                        'comparison': screenshot_writer.comparison
+                    }) + "\n")
+            except Exception as e:
+                logger.warning(f"Failed to log screenshot format stats: {str(e)}")
+            screenshot_writer.reset_stats()
+            probe.report()
+            if cart_mock:
+                cart_mock.report()
+            try:
+                await network.settle()
+                network.save(request.node.name)
+            except Exception as e:
+                logger.warning(f"Failed to save network summary: {str(e)}")
+            trace = await self.finish_trace(context, request, trace_start_ms) if TRACING_MODE != "off" else None
+            self.record_call_duration(request, trace)
+        finally:
+            # Release the probe, browser and Playwright even when saving artifacts failed
+            try:
+                await probe.close()
+            finally:
+                try:
+                    await browser.close()
+                finally:
+                    await playwright.stop()
         logger.info("Browser context teardown complete")
+        if cart_mock:
+            cart_mock.verify()
     
-    async def take_screenshot(self, page, test_name):
-        """Take and save screenshot"""
+    async def finish_trace(self, context, request, start_ms):
+        """
+        Save the trace chunk as a zip if the test failed (or TRACING=always), otherwise discard it.
+        Without a call report (outcome unknown) the trace is discarded like a pass. Returns the tracing.start/stop cost and what was kept, or None if stopping failed.
+        """
+        rep_call = getattr(request.node, "rep_call", None)
+        keep = (rep_call is not None and rep_call.failed) or TRACING_MODE == "always"
+        start = time.perf_counter()
         try:
-            timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-            screenshot_path = f"screenshots/{test_name}_{timestamp}.png"
-            await page.screenshot(path=screenshot_path, timeout=5000, full_page=True)
-            logger.info(f"Screenshot saved to {screenshot_path}")
-            return screenshot_path
+            if keep:
+                os.makedirs(TRACES_DIR, exist_ok=True)
+                await context.tracing.stop_chunk(path=trace_path(request.node.nodeid))
+                logger.info(f"Trace saved: {trace_path(request.node.nodeid)}")
+                emit('trace', nodeid=request.node.nodeid, path=trace_path(request.node.nodeid))
+            else:
+                await context.tracing.stop_chunk()
+            await context.tracing.stop()
+        except Exception as e:
+            logger.warning(f"Failed to finish trace: {str(e)}")
+            return None
+        stop_ms = (time.perf_counter() - start) * 1000
+        logger.info(f"Tracing start/stop cost: start {start_ms:.0f} ms, "
+                    f"{'save' if keep else 'discard'} {stop_ms:.0f} ms")
+        return {
+            'saved': keep,
+            'start_ms': round(start_ms, 1),
+            'stop_ms': round(stop_ms, 1),
+            'trace_bytes': os.path.getsize(trace_path(request.node.nodeid)) if keep else 0
+        }
+    
+    def record_call_duration(self, request, trace):
+        """
+        Append the test's call duration with the tracing mode it ran under to reports/tracing.jsonl.
+        Tests run with TRACING=off are the baseline the traced durations are compared against
+        (run_lazada_test.py --tracing-overhead); start/stop cost only covers the fixture's own calls.
+        """
+        rep_call = getattr(request.node, "rep_call", None)
+        try:
+            with open(os.path.join(REPORTS_DIR, "tracing.jsonl"), "a", encoding="utf-8") as file:
+                file.write(json.dumps(dict({
+                    'test': request.node.name,
+                    'run': RUN_ID,
+                    'timestamp': datetime.now().isoformat(timespec="seconds"),
+                    'tracing': TRACING_MODE,
+                    'outcome': rep_call.outcome if rep_call else "unknown",
+                    'call_ms': round(rep_call.duration * 1000, 1) if rep_call else None
+                }, **(trace or {}))) + "\n")
+        except Exception as e:
+            logger.warning(f"Failed to log test duration: {str(e)}")
+    
+    async def take_screenshot(self, page, test_name, full_page=None, element=None):
+        """
+        Capture screenshot according to SCREENSHOT_POLICY and hand it to the background writer.
+        full_page overrides the SCREENSHOT_SCOPE default for this call site. element (a locator,
+        selector or ELEMENT_TARGETS name) captures only that element's box plus padding, falling
+        back to the full page when it is missing. Returns a future resolving to the screenshot's
+        store index entry.
+        """
+        # Every screenshot call site marks a step of the test in the event stream
+        emit('step', nodeid=screenshot_store.current_test, step=test_name)
+        if full_page is None:
+            full_page = SCREENSHOT_FULL_PAGE
+        if visual_regression.enabled and test_name in VISUAL_PAGES:
+            await self.check_visual(page, test_name, full_page)
+        if SCREENSHOT_POLICY == "off" or (SCREENSHOT_POLICY == "key-steps" and not is_key_step(test_name)):
+            return None
+        try:
+            if SCREENSHOT_POLICY == "on-failure":
+                # Cheap viewport frame kept in memory until the test outcome is known
+                failure_frames.add(test_name, await page.screenshot(timeout=5000))
+                return None
+            
+            if SCREENSHOT_COMPARE and screenshot_writer.comparison is None:
+                # Once per test, log what each format would cost for this page
+                screenshot_writer.comparison = await compare_formats(page, SCREENSHOT_QUALITY, full_page)
+                for row in screenshot_writer.comparison:
+                    logger.info(f"Format comparison {row['format']:<5} full_page={row['full_page']}: "
+                                f"{row['bytes'] / 1024:.1f} KB in {row['ms']} ms")
+            
+            clip = None
+            if element is not None:
+                clip = await element_clip(page, element)
+                if clip is None:
+                    logger.info(f"Element {element} not visible for {test_name}, capturing full page")
+                    full_page = True
+            
+            data, convert_to, capture_ms = await capture(page, SCREENSHOT_FORMAT, SCREENSHOT_QUALITY, full_page, clip=clip)
+            scope = "element" if clip else ("full" if full_page else "viewport")
+            key = (RUN_ID, screenshot_store.current_test, test_name)
+            future = await screenshot_writer.submit(key, data, extension=SCREENSHOT_FORMATS[SCREENSHOT_FORMAT],
+                                                    convert_to=convert_to, quality=SCREENSHOT_QUALITY,
+                                                    label=f"{SCREENSHOT_FORMAT}/{scope}", capture_ms=capture_ms)
+            future.add_done_callback(self._emit_screenshot_event)
+            logger.info(f"Screenshot queued: {test_name}")
+            return future
         except Exception as e:
             logger.error(f"Failed to take screenshot: {str(e)}")
             return None
     
+    @staticmethod
+    def _emit_screenshot_event(future):
+        """Writer thread callback: announce the stored screenshot once it is on disk"""
+        if future.exception() is None:
+            entry = future.result()
+            emit('screenshot', nodeid=entry['test'], step=entry['step'], hash=entry['hash'],
+                 path=entry['path'], size=entry['size'])
+    
+    async def check_visual(self, page, page_name, full_page=True):
+        """
+        Compare the page against its baseline with ignore masks resolved from the live DOM.
+        The diff runs off the event loop; in "assert" mode a visual failure fails the test.
+        """
+        try:
+            rects = await visual_regression.mask_rects(page, page_name)
+            data = await page.screenshot(type="png", full_page=full_page, timeout=10000)
+            result = await asyncio.get_running_loop().run_in_executor(
+                None, visual_regression.check, page_name, data, rects, screenshot_store.current_test, RUN_ID)
+        except Exception as e:
+            logger.error(f"Visual check of {page_name} failed to run: {str(e)}")
+            return None
+        emit('visual', nodeid=screenshot_store.current_test, **{key: result[key] for key in
+             ('page', 'status', 'diff_ratio', 'diff_pixels', 'size_changed', 'diff_path', 'ms')})
+        if VISUAL_MODE == "assert":
+            assert result['status'] != "fail", \
+                f"Visual regression on {page_name}: {result['diff_ratio'] * 100:.2f}% of pixels changed"
+        return result
+    
     # =============== FUNCTIONAL TESTING ===============
     
     @pytest.mark.asyncio
@@ -302,7 +416,7 @@ class TestLazada:
             logger.info("Homepage loaded")
             
             # Take screenshot before search
-            await self.take_screenshot(page, "before_search")
+            await self.take_screenshot(page, "before_search", full_page=False)
             
             # Find search box and enter search term
             logger.info("Looking for search box...")
@@ -315,7 +429,7 @@ class TestLazada:
             logger.info(f"Entered search term: {test_data['test_product']}")
             
             # Take screenshot with search term filled
-            await self.take_screenshot(page, "search_filled")
+            await self.take_screenshot(page, "search_filled", full_page=False)
             
             # Press Enter to search
             await search_box.press("Enter", timeout=5000)
@@ -464,7 +578,7 @@ class TestLazada:
             await page.wait_for_load_state("domcontentloaded", timeout=20000)
             
             # Take screenshot of product page
-            await self.take_screenshot(page, "product_page")
+            await self.take_screenshot(page, "product_page", element="price")
             
             # Check for key elements on product page
             # Multiple selectors to try as the site structure can change
@@ -575,7 +689,7 @@ class TestLazada:
             logger.info("Homepage loaded")
             
             # Take screenshot of homepage
-            await self.take_screenshot(page, "homepage_for_category")
+            await self.take_screenshot(page, "homepage_for_category", full_page=False)
             
             # Try to find and click on a category
             # We'll try various ways of finding categories since the site structure might change
@@ -613,7 +727,7 @@ class TestLazada:
                 await asyncio.sleep(2)
                 
                 # Take screenshot after hovering
-                await self.take_screenshot(page, "after_menu_hover")
+                await self.take_screenshot(page, "after_menu_hover", full_page=False)
                 
                 # Try to find and click on a category link
                 category_link = page.locator(f"a:has-text('{test_data['category']}')")
@@ -823,7 +937,7 @@ class TestLazada:
             await page.wait_for_load_state("domcontentloaded", timeout=20000)
             
             # Take screenshot of product page
-            await self.take_screenshot(page, "product_page_for_cart")
+            await self.take_screenshot(page, "product_page_for_cart", element="cart_button")
             
             # Wait a moment for all elements to be fully loaded and visible
             await asyncio.sleep(3)
@@ -864,17 +978,27 @@ class TestLazada:
             
             if not cart_button_found:
                 logger.warning("Add to cart button not found or not clickable, skipping rest of test")
-                await self.take_screenshot(page, "no_cart_button")
+                await self.take_screenshot(page, "no_cart_button", element="buy_box")
                 return
             
             # Wait for any success message or cart count update
             try:
                 # Wait for cart success message or wait a moment
                 logger.info("Waiting after clicking Add to Cart...")
-                await asyncio.sleep(3)  # Give time for the cart to update
+                cart_mock = browser_context['cart_mock']
+                if cart_mock:
+                    # The fixture fails the test at teardown if the add request was never intercepted
+                    cart_mock.expect('add')
+                    # Mocked endpoint answers deterministically, no need for a fixed wait
+                    if await cart_mock.wait_for('add', timeout=10000):
+                        logger.info("Add to cart request answered by cart mock")
+                    else:
+                        logger.warning("Add to cart request never reached the cart mock")
+                else:
+                    await asyncio.sleep(3)  # Give time for the cart to update
                 
                 # Take screenshot after adding to cart
-                await self.take_screenshot(page, "after_add_to_cart")
+                await self.take_screenshot(page, "after_add_to_cart", element="toast")
                 
                 # Check if there's a success message
                 success_selectors = [
@@ -905,96 +1029,35 @@ class TestLazada:
                 # Try to view cart
                 logger.info("Attempting to view cart...")
                 
-                try:
-                    # Method 1: Direct URL to cart
-                    logger.info("Method 1: Navigating directly to cart URL")
-                    await page.goto("https://cart.lazada.vn/cart", timeout=20000)
-                    logger.info("Navigated to cart page via direct URL")
-                    
-                    # Wait for cart page to load
-                    await page.wait_for_load_state("domcontentloaded", timeout=20000)
-                    
-                    # Take screenshot of cart page
-                    await self.take_screenshot(page, "cart_page_direct")
-                    
-                    # Check if we're on the cart page by looking for cart-specific elements
-                    cart_element_selectors = [
-                        "div.item-list", 
-                        "div.checkout-order-total", 
-                        "div.cart-empty",
-                        ".shopping-cart-container",
-                        "div[class*='cart']" 
-                    ]
-                    
-                    cart_elements_found = False
-                    for selector in cart_element_selectors:
-                        cart_elements = page.locator(selector)
-                        if await cart_elements.count() > 0:
-                            try:
-                                is_visible = await cart_elements.is_visible(timeout=3000)
-                                if is_visible:
-                                    logger.info(f"Cart page element found with selector: {selector}")
-                                    cart_elements_found = True
-                                    break
-                            except Exception as e:
-                                logger.warning(f"Error checking cart element with selector {selector}: {str(e)}")
-                    
-                    if cart_elements_found:
-                        logger.info("Successfully viewed cart page via direct URL")
+                if cart_mock:
+                    # The live cart page cannot show a mocked add, so the mock's state is the cart: no navigation
+                    if cart_mock.items:
+                        logger.info(f"Cart mock holds {len(cart_mock.items)} item(s): {cart_mock.items}")
                     else:
-                        logger.warning("Direct URL navigation did not appear to reach cart page")
-                        raise Exception("Direct URL navigation did not reach cart page")
-                        
-                except Exception as cart_error:
-                    logger.warning(f"Error viewing cart via direct URL: {str(cart_error)}")
-                    
-                    # Method 2: Click on cart icon
+                        logger.warning("Cart mock answered but recorded no added item")
+                else:
+                    # Cart contents are rendered client-side from the browser session, so this needs the DOM
                     try:
-                        logger.info("Method 2: Clicking on cart icon")
-                        await page.goto(test_data['base_url'], timeout=20000, wait_until="domcontentloaded")
-                        logger.info("Returned to homepage")
-                        
-                        cart_icon_selectors = [
-                            "span.cart-icon", 
-                            "a.cart-link",
-                            "div.cart-icon",
-                            "a[href*='cart']"
-                        ]
-                        
-                        cart_icon_found = False
-                        for selector in cart_icon_selectors:
-                            logger.info(f"Trying cart icon selector: {selector}")
-                            cart_icon = page.locator(selector)
-                            if await cart_icon.count() > 0:
-                                try:
-                                    is_visible = await cart_icon.is_visible(timeout=3000)
-                                    if is_visible:
-                                        await cart_icon.click(timeout=10000)
-                                        logger.info(f"Clicked on cart icon with selector: {selector}")
-                                        cart_icon_found = True
-                                        break
-                                except Exception as e:
-                                    logger.warning(f"Error clicking cart icon with selector {selector}: {str(e)}")
-                        
-                        if not cart_icon_found:
-                            logger.warning("Cart icon not found or not clickable")
-                            raise Exception("Cart icon not found or not clickable")
-                        
+                        # Method 1: Direct URL to cart
+                        logger.info("Method 1: Navigating directly to cart URL")
+                        await page.goto(CART_URL, timeout=20000)
+                        logger.info("Navigated to cart page via direct URL")
+                    
                         # Wait for cart page to load
                         await page.wait_for_load_state("domcontentloaded", timeout=20000)
-                        
+                    
                         # Take screenshot of cart page
-                        await self.take_screenshot(page, "cart_page_via_icon")
-                        
-                        # Check if we're on cart page
+                        await self.take_screenshot(page, "cart_page_direct")
+                    
+                        # Check if we're on the cart page by looking for cart-specific elements
                         cart_element_selectors = [
                             "div.item-list", 
                             "div.checkout-order-total", 
                             "div.cart-empty",
                             ".shopping-cart-container",
-                            "div[class*='cart']"
+                            "div[class*='cart']" 
                         ]
-                        
+                    
                         cart_elements_found = False
                         for selector in cart_element_selectors:
                             cart_elements = page.locator(selector)
@@ -1007,14 +1070,83 @@ class TestLazada:
                                         break
                                 except Exception as e:
                                     logger.warning(f"Error checking cart element with selector {selector}: {str(e)}")
-                        
+                    
                         if cart_elements_found:
-                            logger.info("Successfully viewed cart page via cart icon")
+                            logger.info("Successfully viewed cart page via direct URL")
                         else:
-                            logger.warning("Cart icon click did not appear to reach cart page")
-                    except Exception as e:
-                        logger.warning(f"Error viewing cart via cart icon: {str(e)}")
-                        logger.warning("Failed to view cart using multiple methods, but test partially succeeded (added to cart)")
+                            logger.warning("Direct URL navigation did not appear to reach cart page")
+                            raise Exception("Direct URL navigation did not reach cart page")
+                        
+                    except Exception as cart_error:
+                        logger.warning(f"Error viewing cart via direct URL: {str(cart_error)}")
+                    
+                        # Method 2: Click on cart icon
+                        try:
+                            logger.info("Method 2: Clicking on cart icon")
+                            await page.goto(test_data['base_url'], timeout=20000, wait_until="domcontentloaded")
+                            logger.info("Returned to homepage")
+                        
+                            cart_icon_selectors = [
+                                "span.cart-icon", 
+                                "a.cart-link",
+                                "div.cart-icon",
+                                "a[href*='cart']"
+                            ]
+                        
+                            cart_icon_found = False
+                            for selector in cart_icon_selectors:
+                                logger.info(f"Trying cart icon selector: {selector}")
+                                cart_icon = page.locator(selector)
+                                if await cart_icon.count() > 0:
+                                    try:
+                                        is_visible = await cart_icon.is_visible(timeout=3000)
+                                        if is_visible:
+                                            await cart_icon.click(timeout=10000)
+                                            logger.info(f"Clicked on cart icon with selector: {selector}")
+                                            cart_icon_found = True
+                                            break
+                                    except Exception as e:
+                                        logger.warning(f"Error clicking cart icon with selector {selector}: {str(e)}")
+                        
+                            if not cart_icon_found:
+                                logger.warning("Cart icon not found or not clickable")
+                                raise Exception("Cart icon not found or not clickable")
+                        
+                            # Wait for cart page to load
+                            await page.wait_for_load_state("domcontentloaded", timeout=20000)
+                        
+                            # Take screenshot of cart page
+                            await self.take_screenshot(page, "cart_page_via_icon")
+                        
+                            # Check if we're on cart page
+                            cart_element_selectors = [
+                                "div.item-list", 
+                                "div.checkout-order-total", 
+                                "div.cart-empty",
+                                ".shopping-cart-container",
+                                "div[class*='cart']"
+                            ]
+                        
+                            cart_elements_found = False
+                            for selector in cart_element_selectors:
+                                cart_elements = page.locator(selector)
+                                if await cart_elements.count() > 0:
+                                    try:
+                                        is_visible = await cart_elements.is_visible(timeout=3000)
+                                        if is_visible:
+                                            logger.info(f"Cart page element found with selector: {selector}")
+                                            cart_elements_found = True
+                                            break
+                                    except Exception as e:
+                                        logger.warning(f"Error checking cart element with selector {selector}: {str(e)}")
+                        
+                            if cart_elements_found:
+                                logger.info("Successfully viewed cart page via cart icon")
+                            else:
+                                logger.warning("Cart icon click did not appear to reach cart page")
+                        except Exception as e:
+                            logger.warning(f"Error viewing cart via cart icon: {str(e)}")
+                            logger.warning("Failed to view cart using multiple methods, but test partially succeeded (added to cart)")
             
             except Exception as e:
                 logger.warning(f"Error in cart verification: {str(e)}")
@@ -1081,7 +1213,7 @@ class TestLazada:
             await asyncio.sleep(2)
             
             # Take screenshot of mobile viewport
-            await self.take_screenshot(page, "mobile_viewport")
+            await self.take_screenshot(page, "mobile_viewport", full_page=False)
             
             # Check if key elements are still visible on mobile
             mobile_elements = {
@@ -1146,14 +1278,15 @@ class TestLazada:
             # Take screenshot of loaded homepage
             await self.take_screenshot(page, "performance_homepage")
             
-            # Check if page loaded successfully
+            # Check if page loaded successfully, asking the probe when navigation gave no response
             if response:
                 status = response.status
-                logger.info(f"Homepage status code: {status}")
-                if status >= 400:
-                    logger.warning(f"Homepage loaded with error status code: {status}")
             else:
-                logger.warning("No response object returned from navigation")
+                logger.warning("No response object returned from navigation, probing status")
+                status = await browser_context['probe'].status(test_data['base_url'])
+            logger.info(f"Homepage status code: {status}")
+            if status >= 400:
+                logger.warning(f"Homepage loaded with error status code: {status}")
             
             try:
                 # Create client for performance measurements
@@ -1314,7 +1447,7 @@ class TestLazada:
             await asyncio.sleep(2)
             
             # Take screenshot of footer
-            await self.take_screenshot(page, "footer")
+            await self.take_screenshot(page, "footer", element="footer")
             
             # Check footer links
             logger.info("Checking footer...")
@@ -1367,6 +1500,29 @@ class TestLazada:
             
             logger.info(f"Found {found_links} important links in footer")
             
+            # Check that header and footer link targets respond, without navigating
+            logger.info("Checking header and footer link targets...")
+            try:
+                hrefs = await page.evaluate("""() => {
+                    const selectors = ['header a[href]', 'footer a[href]', 'div.footer a[href]',
+                                       'div.lzd-footer a[href]', 'div.lzd-header a[href]',
+                                       '#topActionHeader a[href]'];
+                    return Array.from(document.querySelectorAll(selectors.join(',')), a => a.href);
+                }""")
+                
+                start_time = time.time()
+                checker = LinkChecker(browser_context['probe'].request_context)
+                results = await checker.check(hrefs)
+                check_time = (time.time() - start_time) * 1000
+                
+                broken_links = [r for r in results if LinkChecker.is_broken(r)]
+                logger.info(f"Checked {len(results)} unique links in {check_time:.2f} ms, "
+                            f"{len(broken_links)} broken")
+                if broken_links:
+                    logger.warning("Broken links:\n" + LinkChecker.broken_link_table(results))
+            except Exception as e:
+                logger.warning(f"Error checking link targets: {str(e)}")
+            
             # Check for copyright information
             logger.info("Checking for copyright information...")
             copyright_selectors = [
@@ -1416,77 +1572,77 @@ class TestLazada:
         try:
             # Navigate to homepage with explicit timeout
             logger.info(f"Navigating to: {test_data['base_url']}")
-            response = await page.goto(test_data['base_url'], timeout=20000, wait_until="domcontentloaded")
+            await page.goto(test_data['base_url'], timeout=20000, wait_until="domcontentloaded")
             logger.info("Homepage loaded")
             
             # Take screenshot of homepage
-            await self.take_screenshot(page, "homepage_for_security")
+            await self.take_screenshot(page, "homepage_for_security", full_page=False)
             
-            # Check if using HTTPS
-            if response:
-                current_url = response.url
+            # Check if using HTTPS (HTTP facts only, answered by the probe without rendering)
+            probe = browser_context['probe']
+            try:
+                current_url, is_https = await probe.uses_https(test_data['base_url'])
                 logger.info(f"Response URL: {current_url}")
-                if current_url.startswith("https://"):
-                    logger.info("Website is using HTTPS ✓")
-                else:
-                    logger.warning(f"Website not using HTTPS: {current_url}")
-            else:
-                logger.warning("No response object returned from navigation")
-                current_url = page.url
-                logger.info(f"Current URL: {current_url}")
-                if current_url.startswith("https://"):
+                if is_https:
                     logger.info("Website is using HTTPS ✓")
                 else:
                     logger.warning(f"Website not using HTTPS: {current_url}")
+                
+                # Plain HTTP should redirect to HTTPS
+                if test_data['base_url'].startswith("https://"):
+                    http_url = "http://" + test_data['base_url'][len("https://"):]
+                    redirect_chain = await probe.redirects(http_url)
+                    logger.info("HTTP redirect chain: " + " -> ".join(f"{u} ({st})" for u, st in redirect_chain))
+                    if redirect_chain and redirect_chain[-1][0].startswith("https://"):
+                        logger.info("HTTP redirects to HTTPS ✓")
+                    else:
+                        logger.warning("HTTP does not redirect to HTTPS")
+            except Exception as https_error:
+                logger.warning(f"Error checking HTTPS via probe: {str(https_error)}")
             
-            # Check security headers
+            # Audit security headers over a set of URLs, fetched concurrently without rendering
             try:
-                if response:
-                    headers = response.headers
-                    
-                    # Look for common security headers
-                    security_headers = {
-                        "Content-Security-Policy": headers.get("content-security-policy", "Not set"),
-                        "X-XSS-Protection": headers.get("x-xss-protection", "Not set"),
-                        "X-Frame-Options": headers.get("x-frame-options", "Not set"),
-                        "Strict-Transport-Security": headers.get("strict-transport-security", "Not set"),
-                        "X-Content-Type-Options": headers.get("x-content-type-options", "Not set"),
-                        "Referrer-Policy": headers.get("referrer-policy", "Not set")
-                    }
-                    
-                    logger.info("Security headers:")
-                    for header, value in security_headers.items():
-                        logger.info(f"  {header}: {value}")
-                        
-                    # Count how many security headers are set
-                    set_headers = sum(1 for value in security_headers.values() if value != "Not set")
-                    logger.info(f"Found {set_headers} out of {len(security_headers)} recommended security headers")
-                    
-                else:
-                    logger.warning("No response object available to check headers")
+                audit_urls = test_data['security_urls']
+                if not audit_urls:
+                    discovered = await page.evaluate("""() => {
+                        const product = document.querySelector("a[href*='/products/']");
+                        const privacy = Array.from(document.querySelectorAll('a[href]')).find(
+                            a => /bảo mật|privacy/i.test(a.textContent));
+                        return {product: product ? product.href : null, privacy: privacy ? privacy.href : null};
+                    }""")
+                    audit_urls = [
+                        test_data['base_url'],
+                        urljoin(test_data['base_url'], f"catalog/?q={quote(test_data['test_product'])}"),
+                        discovered['product'],
+                        "https://cart.lazada.vn/cart",
+                        discovered['privacy'],
+                        "https://laz-img-cdn.alicdn.com/tfs/TB1T7K2d8Cw3KVjSZFuXXcAOpXa-1024-1024.png",
+                        "https://lzd-img-global.slatic.net/"
+                    ]
+                    audit_urls = [u for u in audit_urls if u]
+                
+                start_time = time.time()
+                audit_results = await SecurityAudit(browser_context['probe'].request_context).run(audit_urls)
+                audit_time = (time.time() - start_time) * 1000
+                
+                logger.info(f"Audited {len(audit_results)} URLs in {audit_time:.2f} ms")
+                logger.info("Security headers:\n" + SecurityAudit.header_matrix(audit_results))
+                
+                for domain, stats in SecurityAudit.cookie_summary(audit_results).items():
+                    logger.info(f"  Set-Cookie on {domain}: {stats['total']} total, {stats['secure']} Secure, "
+                                f"{stats['httpOnly']} HttpOnly, {stats['sameSite']} SameSite")
             except Exception as headers_error:
                 logger.warning(f"Error checking security headers: {str(headers_error)}")
             
             # Check for cookie security
             try:
                 cookies = await browser_context['context'].cookies()
-                secure_cookies = 0
-                httponly_cookies = 0
-                samesite_cookies = 0
-                
-                for cookie in cookies:
-                    if cookie.get('secure', False):
-                        secure_cookies += 1
-                    if cookie.get('httpOnly', False):
-                        httponly_cookies += 1
-                    if cookie.get('sameSite') in ('Lax', 'Strict'):
-                        samesite_cookies += 1
                 
                 logger.info(f"Cookie security analysis:")
                 logger.info(f"  Total cookies: {len(cookies)}")
-                logger.info(f"  Secure cookies: {secure_cookies}")
-                logger.info(f"  HttpOnly cookies: {httponly_cookies}")
-                logger.info(f"  SameSite cookies: {samesite_cookies}")
+                for domain, stats in summarize_cookies(cookies).items():
+                    logger.info(f"  {domain}: {stats['total']} total, {stats['secure']} Secure, "
+                                f"{stats['httpOnly']} HttpOnly, {stats['sameSite']} SameSite")
                 
             except Exception as cookie_error:
                 logger.warning(f"Error checking cookie security: {str(cookie_error)}")
@@ -1497,7 +1653,7 @@ class TestLazada:
             await asyncio.sleep(2)  # Wait for any lazy-loaded footer content
             
             # Take screenshot of footer for privacy policy check
-            await self.take_screenshot(page, "footer_for_privacy")
+            await self.take_screenshot(page, "footer_for_privacy", full_page=False)
             
             privacy_selectors = [
                 "a:has-text('Chính sách bảo mật')", 
@@ -1519,28 +1675,15 @@ class TestLazada:
                             is_visible = await link.first.is_visible(timeout=3000)
                             if is_visible:
                                 logger.info(f"Privacy policy link found with selector: {selector}")
-                                # Get current URL to return to
-                                current_url = page.url
-                                
-                                # Click on privacy policy link
-                                await link.first.click(timeout=10000)
-                                logger.info("Clicked on privacy policy link")
-                                
-                                # Wait for page to load
-                                await page.wait_for_load_state("domcontentloaded", timeout=20000)
-                                
-                                # Take screenshot of privacy page
-                                await self.take_screenshot(page, "privacy_policy_page")
-                                
-                                # Check that we're on a privacy page
-                                new_url = page.url
-                                title = await page.title()
-                                
-                                logger.info(f"Privacy page URL: {new_url}")
-                                logger.info(f"Privacy page title: {title}")
+                                # Status and text are all the check needs, so the probe fetches the page without rendering
+                                href = await link.first.get_attribute("href")
+                                privacy_url = urljoin(page.url, href or "")
+                                status, content = await browser_context['probe'].text(privacy_url)
+                                logger.info(f"Privacy page URL: {privacy_url} (status {status})")
+                                if status >= 400:
+                                    logger.warning(f"Privacy page returned error status code: {status}")
                                 
                                 # Look for keywords in page content
-                                content = await page.content()
                                 privacy_keywords = ["privacy", "bảo mật", "dữ liệu", "data", "personal", "information"]
                                 
                                 keyword_found = False
@@ -1555,10 +1698,6 @@ class TestLazada:
                                 else:
                                     logger.warning("No privacy-related keywords found on page")
                                 
-                                # Go back to previous page
-                                await page.goto(current_url, timeout=20000)
-                                logger.info("Returned to original page")
-                                
                                 privacy_link_found = True
                                 break
                             else:
@@ -1812,9 +1951,8 @@ if __name__ == "__main__":
     
     pytest_args = [
         "-v",
-        "--html=reports/lazada_test_report.html",
-        "--self-contained-html",
         "--collect-only",  # Kiểm tra việc thu thập test trước
+        "-p", "lazada_events",  # Luồng sự kiện, JUnit XML và báo cáo phiên
         "lazada_test.py::TestLazada",  # Chỉ định chính xác class test
     ]
     
@@ -5,6 +5,8 @@ import sys
 import subprocess
 import asyncio
 import threading
+import queue
+import itertools
 import json
 import time
 import csv
@@ -12,17 +14,29 @@ import pandas as pd
 from datetime import datetime
 import logging
 from PIL import Image, ImageTk
-import glob
 import matplotlib
 matplotlib.use('Agg')  # Use Agg backend for saving plots without displaying
 import matplotlib.pyplot as plt
 from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg
+from lazada_screenshots import ScreenshotStore
+from lazada_server import ReportServer
+from lazada_retention import RetentionEngine, RetentionPolicy
+from lazada_visual import PerceptualIndex
+from lazada_dashboard import DASHBOARD_PATH, update_dashboard
+from lazada_history import RunIndex, compare_runs, comparison_report_path, write_comparison_report
+from lazada_events import EventReader, events_path, junit_path, summarize_events
+from lazada_report import (archive_report, latest_session_report, publish_thumbnails, ReportAssets,
+                           SessionReport, session_report_path, write_test_report)
+from lazada_thumbs import ThumbnailGenerator, get_thumbnail_cache, load_thumbnail
 
 # Đường dẫn tới các thư mục
 SCREENSHOTS_DIR = 'screenshots'
 REPORTS_DIR = 'reports'
 DATA_DIR = 'test_data'
 
+# Node id prefix của các test trong chỉ mục ảnh chụp màn hình
+TEST_NODE_PREFIX = 'lazada_test.py::TestLazada::'
+
 # Đảm bảo các thư mục tồn tại
 for dir_path in [SCREENSHOTS_DIR, REPORTS_DIR, DATA_DIR]:
     if not os.path.exists(dir_path):
@@ -85,12 +99,37 @@ class LazadaTestGUI:
         self.test_results = {}
         self.start_time = None
         self.config = self.load_config()
+        self.screenshot_store = ScreenshotStore(SCREENSHOTS_DIR)
+        # Máy chủ HTTP cục bộ cho reports/ và screenshots/, khởi động khi mở báo cáo lần đầu
+        self.report_server = ReportServer()
+        self.perceptual_index = None  # Chỉ mục hash cảm quan, tạo khi cần
+        self.current_run_id = None  # Mã phiên chạy gần nhất (báo cáo phiên)
+        # Bộ đệm thumbnail trên đĩa (theo đường dẫn, kích thước, mtime), dùng chung cho dải ảnh và báo cáo
+        self.thumbnail_cache = get_thumbnail_cache(
+            max_bytes=int(float(self.config.get('thumbnail_cache_mb', '200')) * 1024 * 1024))
+        self.thumbnails = ThumbnailGenerator(int(self.config.get('thumbnail_width', '480')), self.thumbnail_cache)
+        self.perceptual_lock = threading.Lock()
+        # Dải ảnh nhỏ và ảnh xem trước: giải mã trên luồng nền, trả kết quả về Tk qua hàng đợi được kiểm tra bằng after()
+        self.strip_items = {}  # khóa ảnh -> {'frame', 'button', 'photo'}
+        self.strip_newest = None
+        self.decode_requests = queue.PriorityQueue()  # (ưu tiên, thứ tự, khóa, file, kích thước); ảnh xem trước đi trước
+        self.decode_sequence = itertools.count()
+        self.decoded_thumbnails = queue.Queue()
+        self.decoder_thread = None
+        self.preview_request = None  # Khóa của ảnh xem trước mới nhất, kết quả cũ hơn bị bỏ qua
         self.browser_process = None
         self.headless_mode = tk.BooleanVar(value=self.config.get('headless', False))
         self.show_browsers = tk.BooleanVar(value=self.config.get('show_browsers', True))
         self.auto_report = tk.BooleanVar(value=self.config.get('auto_report', True))
         self.test_url = tk.StringVar(value=self.config.get('test_url', 'https://www.lazada.vn/'))
         self.test_product = tk.StringVar(value=self.config.get('test_product', 'điện thoại Samsung'))
+        self.cart_mock = tk.BooleanVar(value=self.config.get('cart_mode', 'live') == 'mock')
+        self.screenshot_policy = tk.StringVar(value=self.config.get('screenshot_policy', 'all'))
+        self.screenshot_format = tk.StringVar(value=self.config.get('screenshot_format', 'png'))
+        self.screenshot_quality = tk.StringVar(value=self.config.get('screenshot_quality', '80'))
+        self.retention_keep_runs = tk.StringVar(value=self.config.get('retention_keep_runs', '10'))
+        self.retention_max_mb = tk.StringVar(value=self.config.get('retention_max_mb', '500'))
+        self.retention_max_days = tk.StringVar(value=self.config.get('retention_max_days', '14'))
         
         # Thiết lập giao diện
         self.create_menu()
@@ -152,6 +191,7 @@ class LazadaTestGUI:
         report_menu.add_command(label="Tạo báo cáo đầy đủ", command=self.generate_full_report)
         report_menu.add_command(label="Tạo báo cáo tóm tắt", command=lambda: self.generate_full_report(summary=True))
         report_menu.add_command(label="Xem biểu đồ kết quả", command=self.show_result_charts)
+        report_menu.add_command(label="Đóng gói báo cáo HTML (.zip)", command=self.archive_html_report)
         self.menu_bar.add_cascade(label="Báo cáo", menu=report_menu)
         
         # Menu Trợ giúp
@@ -344,6 +384,7 @@ class LazadaTestGUI:
         
         ttk.Button(button_frame, text="Mở ảnh", command=self.open_current_screenshot).pack(side=tk.LEFT, padx=5)
         ttk.Button(button_frame, text="Lưu ảnh", command=self.save_current_screenshot).pack(side=tk.LEFT, padx=5)
+        ttk.Button(button_frame, text="Tìm ảnh tương tự", command=self.find_similar_screenshots).pack(side=tk.LEFT, padx=5)
         ttk.Button(button_frame, text="Làm mới", command=self.load_recent_screenshots).pack(side=tk.RIGHT, padx=5)
     
     def create_config_tab(self):
@@ -386,9 +427,35 @@ class LazadaTestGUI:
         self.retry_var = tk.StringVar(value=self.config.get('retry', '1'))
         ttk.Entry(config_frame, textvariable=self.retry_var, width=10).grid(row=8, column=1, padx=5, pady=5, sticky=tk.W)
         
+        # Giả lập API giỏ hàng
+        ttk.Checkbutton(config_frame, text="Giả lập API giỏ hàng (không gọi backend thật)", 
+                       variable=self.cart_mock).grid(row=9, column=0, columnspan=2, padx=5, pady=5, sticky=tk.W)
+        
+        # Chính sách chụp màn hình
+        ttk.Label(config_frame, text="Chụp màn hình:").grid(row=10, column=0, padx=5, pady=5, sticky=tk.W)
+        ttk.Combobox(config_frame, textvariable=self.screenshot_policy, 
+                    values=["off", "on-failure", "key-steps", "all"], 
+                    state="readonly", width=12).grid(row=10, column=1, padx=5, pady=5, sticky=tk.W)
+        
+        # Định dạng và chất lượng ảnh chụp
+        ttk.Label(config_frame, text="Định dạng ảnh (chất lượng):").grid(row=11, column=0, padx=5, pady=5, sticky=tk.W)
+        format_frame = ttk.Frame(config_frame)
+        format_frame.grid(row=11, column=1, padx=5, pady=5, sticky=tk.W)
+        ttk.Combobox(format_frame, textvariable=self.screenshot_format, values=["png", "jpeg", "webp"], 
+                    state="readonly", width=8).pack(side=tk.LEFT)
+        ttk.Entry(format_frame, textvariable=self.screenshot_quality, width=5).pack(side=tk.LEFT, padx=5)
+        
+        # Chính sách lưu trữ (luôn giữ các lần chạy có lỗi)
+        ttk.Label(config_frame, text="Lưu trữ (số lần chạy / MB / ngày):").grid(row=12, column=0, padx=5, pady=5, sticky=tk.W)
+        retention_frame = ttk.Frame(config_frame)
+        retention_frame.grid(row=12, column=1, padx=5, pady=5, sticky=tk.W)
+        ttk.Entry(retention_frame, textvariable=self.retention_keep_runs, width=5).pack(side=tk.LEFT)
+        ttk.Entry(retention_frame, textvariable=self.retention_max_mb, width=7).pack(side=tk.LEFT, padx=5)
+        ttk.Entry(retention_frame, textvariable=self.retention_max_days, width=5).pack(side=tk.LEFT)
+        
         # Nút lưu cấu hình
         button_frame = ttk.Frame(config_frame)
-        button_frame.grid(row=9, column=0, columnspan=2, pady=20)
+        button_frame.grid(row=13, column=0, columnspan=2, pady=20)
         
         ttk.Button(button_frame, text="Lưu cấu hình", 
                   command=self.save_config).pack(side=tk.LEFT, padx=10)
@@ -449,8 +516,14 @@ class LazadaTestGUI:
         ttk.Button(buttons_frame, text="Xuất ra Excel", 
                   command=self.export_history_to_excel).pack(side=tk.LEFT, padx=5)
                   
+        ttk.Button(buttons_frame, text="So sánh 2 lần chạy", 
+                  command=self.compare_selected_runs).pack(side=tk.LEFT, padx=5)
+                  
         ttk.Button(buttons_frame, text="Biểu đồ", 
                   command=self.show_history_charts).pack(side=tk.RIGHT, padx=5)
+                  
+        ttk.Button(buttons_frame, text="Dashboard", 
+                  command=self.open_dashboard).pack(side=tk.RIGHT, padx=5)
         
     def create_stats_charts(self):
         """Tạo biểu đồ thống kê"""
@@ -529,110 +602,153 @@ class LazadaTestGUI:
             self.test_list.insert("", "end", test_id, values=(test_name, "Chưa chạy", "N/A"))
             
     def load_recent_screenshots(self):
-        """Tải các ảnh chụp màn hình gần đây"""
-        # Xóa các thumbnail cũ
+        """Tải các ảnh chụp màn hình gần đây (chỉ giải mã ảnh mới, trên luồng nền)"""
+        # Tra cứu các ảnh mới nhất ở cuối chỉ mục của kho ảnh (không đọc toàn bộ chỉ mục)
+        screenshot_entries = self.screenshot_store.recent(20)  # Chỉ lấy 20 ảnh mới nhất
+        keys = [(entry['hash'], entry['step']) for entry in screenshot_entries]
+        
+        # Gỡ các ảnh không còn trong danh sách mới nhất (và thông báo "không có ảnh" nếu có)
+        for key in [key for key in self.strip_items if key not in keys]:
+            self.strip_items.pop(key)['frame'].destroy()
         for widget in self.thumbnail_frame.winfo_children():
-            widget.destroy()
-            
-        # Tìm các ảnh trong thư mục screenshots
-        screenshot_files = sorted(
-            glob.glob(os.path.join(SCREENSHOTS_DIR, "*.png")),
-            key=os.path.getmtime, 
-            reverse=True
-        )[:20]  # Chỉ lấy 20 ảnh mới nhất
+            if not any(widget is item['frame'] for item in self.strip_items.values()):
+                widget.destroy()
         
-        if not screenshot_files:
+        if not screenshot_entries:
             # Hiển thị thông báo nếu không có ảnh
             ttk.Label(self.thumbnail_frame, text="Không có ảnh chụp màn hình").pack(padx=10, pady=10)
             # Xóa ảnh hiện tại trên canvas
             self.screenshot_canvas.delete("all")
             self.screenshot_info_var.set("")
+            self.strip_newest = None
+            self.preview_request = None
             return
         
-        # Tạo và hiển thị thumbnails
-        self.thumbnails = []  # Lưu trữ tham chiếu
-        for i, filename in enumerate(screenshot_files):
-            try:
-                # Tạo thumbnail
-                img = Image.open(filename)
-                img.thumbnail((100, 100))
-                photo = ImageTk.PhotoImage(img)
-                
-                # Tạo frame cho mỗi thumbnail
+        for key, entry in zip(keys, screenshot_entries):
+            if key not in self.strip_items:
+                # Khung giữ chỗ, ảnh được gắn vào khi luồng nền giải mã xong
                 thumb_frame = ttk.Frame(self.thumbnail_frame)
-                thumb_frame.pack(side=tk.LEFT, padx=5, pady=5)
-                
-                # Tạo button chứa thumbnail
-                btn = ttk.Button(thumb_frame, image=photo, 
-                                command=lambda f=filename: self.show_screenshot(f))
+                btn = ttk.Button(thumb_frame, text="...", width=12,
+                                 command=lambda f=entry['path'], s=entry['step']: self.show_screenshot(f, s))
                 btn.pack()
                 
-                # Tạo label cho tên file
-                base_name = os.path.basename(filename)
+                # Tạo label theo tên bước chụp
+                base_name = entry['step']
                 if len(base_name) > 15:
                     base_name = base_name[:12] + "..."
                 ttk.Label(thumb_frame, text=base_name).pack()
                 
-                # Lưu trữ tham chiếu để tránh garbage collection
-                self.thumbnails.append(photo)
-                
-                # Hiển thị ảnh đầu tiên
-                if i == 0:
-                    self.show_screenshot(filename)
-                    
+                self.strip_items[key] = {'frame': thumb_frame, 'button': btn, 'photo': None}
+                self.request_decode(key, entry['path'], (100, 100))
+        
+        # Sắp xếp lại theo thứ tự mới nhất trước
+        for key in keys:
+            self.strip_items[key]['frame'].pack_forget()
+        for key in keys:
+            self.strip_items[key]['frame'].pack(side=tk.LEFT, padx=5, pady=5)
+        
+        # Hiển thị ảnh mới nhất khi nó thay đổi
+        if keys[0] != self.strip_newest:
+            self.strip_newest = keys[0]
+            self.show_screenshot(screenshot_entries[0]['path'], screenshot_entries[0]['step'])
+            
+    def request_decode(self, key, filename, size, priority=1):
+        """Gửi yêu cầu giải mã cho luồng nền (khởi động luồng ở lần đầu)"""
+        if self.decoder_thread is None:
+            self.decoder_thread = threading.Thread(target=self.decode_thumbnails_worker,
+                                                   name="thumbnail-decoder", daemon=True)
+            self.decoder_thread.start()
+            self.root.after(50, self.poll_decoded_thumbnails)
+        self.decode_requests.put((priority, next(self.decode_sequence), key, filename, size))
+        
+    def decode_thumbnails_worker(self):
+        """
+        Luồng nền, không chạm vào Tk: thumbnail của dải ảnh lấy từ bộ đệm trên đĩa,
+        ảnh xem trước giải mã thẳng về kích thước canvas (draft/reduce, không resize toàn phần)
+        """
+        while True:
+            _, _, key, filename, size = self.decode_requests.get()
+            try:
+                if key[0] == 'preview':
+                    image = load_thumbnail(filename, size)
+                else:
+                    image = self.thumbnail_cache.open(filename, size)
+                self.decoded_thumbnails.put((key, image, None))
             except Exception as e:
-                logger.error(f"Lỗi khi tải thumbnail {filename}: {str(e)}")
+                self.decoded_thumbnails.put((key, None, f"{filename}: {str(e)}"))
+            if self.decode_requests.empty():
+                self.thumbnail_cache.flush()
                 
-    def show_screenshot(self, filename):
-        """Hiển thị ảnh chụp màn hình được chọn"""
+    def poll_decoded_thumbnails(self):
+        """Gắn các thumbnail đã giải mã vào dải ảnh (chạy trên luồng Tk)"""
+        try:
+            while True:
+                key, image, error = self.decoded_thumbnails.get_nowait()
+                if key[0] == 'preview':
+                    if key == self.preview_request:
+                        self.display_preview(image, error)
+                    continue
+                item = self.strip_items.get(key)
+                if item is None:
+                    continue  # Ảnh đã bị gỡ khỏi dải trước khi giải mã xong
+                if error:
+                    logger.error(f"Lỗi khi tải thumbnail {error}")
+                    item['button'].config(text="Lỗi")
+                    continue
+                # Lưu trữ tham chiếu để tránh garbage collection
+                item['photo'] = ImageTk.PhotoImage(image)
+                item['button'].config(image=item['photo'], text="", width=0)
+        except queue.Empty:
+            pass
+        self.root.after(50, self.poll_decoded_thumbnails)
+                
+    def show_screenshot(self, filename, label=None):
+        """Hiển thị ảnh chụp màn hình được chọn (giải mã trên luồng nền)"""
         try:
-            # Xóa ảnh cũ
-            self.screenshot_canvas.delete("all")
-            
             # Lưu tên file hiện tại
             self.current_screenshot = filename
+            self.current_screenshot_label = label or os.path.splitext(os.path.basename(filename))[0]
             
-            # Tải ảnh mới
-            img = Image.open(filename)
-            
-            # Scale ảnh để vừa với canvas
-            canvas_width = self.screenshot_canvas.winfo_width()
-            canvas_height = self.screenshot_canvas.winfo_height()
-            
-            # Tỉ lệ
-            width, height = img.size
-            ratio = min(canvas_width/width, canvas_height/height)
-            
-            new_width = int(width * ratio)
-            new_height = int(height * ratio)
-            
-            if new_width > 0 and new_height > 0:
-                img = img.resize((new_width, new_height), Image.LANCZOS)
-                
-            photo = ImageTk.PhotoImage(img)
-            
-            # Hiển thị ảnh
-            self.screenshot_canvas.create_image(
-                canvas_width/2, canvas_height/2, 
-                image=photo, anchor=tk.CENTER
-            )
-            
-            # Lưu trữ tham chiếu
-            self.current_photo = photo
+            # Chỉ đọc header để lấy kích thước gốc, không giải mã ảnh
+            with Image.open(filename) as img:
+                width, height = img.size
             
             # Cập nhật thông tin ảnh
-            base_name = os.path.basename(filename)
             file_size = os.path.getsize(filename) / 1024  # KB
             file_time = datetime.fromtimestamp(os.path.getmtime(filename))
-            
             self.screenshot_info_var.set(
-                f"{base_name} - {width}x{height} - {file_size:.1f}KB - {file_time:%d/%m/%Y %H:%M:%S}"
+                f"{self.current_screenshot_label} - {width}x{height} - {file_size:.1f}KB - {file_time:%d/%m/%Y %H:%M:%S}"
             )
             
+            # Thu nhỏ vừa canvas trên luồng nền
+            canvas_width = max(self.screenshot_canvas.winfo_width(), self.screenshot_canvas.winfo_reqwidth(), 1)
+            canvas_height = max(self.screenshot_canvas.winfo_height(), self.screenshot_canvas.winfo_reqheight(), 1)
+            self.preview_request = ('preview', next(self.decode_sequence))
+            self.request_decode(self.preview_request, filename, (canvas_width, canvas_height), priority=0)
+            
         except Exception as e:
             logger.error(f"Lỗi khi hiển thị ảnh {filename}: {str(e)}")
             self.screenshot_info_var.set(f"Lỗi khi hiển thị ảnh: {str(e)}")
             
+    def display_preview(self, image, error):
+        """Vẽ ảnh xem trước đã giải mã lên canvas (chạy trên luồng Tk)"""
+        # Xóa ảnh cũ
+        self.screenshot_canvas.delete("all")
+        if error:
+            logger.error(f"Lỗi khi hiển thị ảnh {error}")
+            self.screenshot_info_var.set(f"Lỗi khi hiển thị ảnh: {error}")
+            return
+        photo = ImageTk.PhotoImage(image)
+        
+        # Hiển thị ảnh
+        self.screenshot_canvas.create_image(
+            self.screenshot_canvas.winfo_width() / 2, self.screenshot_canvas.winfo_height() / 2,
+            image=photo, anchor=tk.CENTER
+        )
+        
+        # Lưu trữ tham chiếu
+        self.current_photo = photo
+            
     def open_current_screenshot(self):
         """Mở ảnh chụp màn hình hiện tại trong trình xem ảnh mặc định"""
         if hasattr(self, 'current_screenshot') and os.path.exists(self.current_screenshot):
@@ -648,11 +764,11 @@ class LazadaTestGUI:
     def save_current_screenshot(self):
         """Lưu ảnh chụp màn hình hiện tại vào vị trí khác"""
         if hasattr(self, 'current_screenshot') and os.path.exists(self.current_screenshot):
-            base_name = os.path.basename(self.current_screenshot)
+            extension = os.path.splitext(self.current_screenshot)[1]
             save_path = filedialog.asksaveasfilename(
-                initialfile=base_name,
-                defaultextension=".png",
-                filetypes=[("PNG files", "*.png"), ("All files", "*.*")]
+                initialfile=f"{self.current_screenshot_label}{extension}",
+                defaultextension=extension,
+                filetypes=[("Image files", f"*{extension}"), ("All files", "*.*")]
             )
             
             if save_path:
@@ -665,6 +781,70 @@ class LazadaTestGUI:
         else:
             messagebox.showinfo("Thông báo", "Không có ảnh nào được chọn")
             
+    def update_perceptual_index(self):
+        """Băm các ảnh mới vào chỉ mục hash cảm quan (gọi từ thread nền)"""
+        with self.perceptual_lock:
+            if self.perceptual_index is None:
+                self.perceptual_index = PerceptualIndex(self.screenshot_store)
+            self.perceptual_index.update()
+            return self.perceptual_index
+            
+    def find_similar_screenshots(self):
+        """Tìm các ảnh trong lịch sử trông giống ảnh đang xem"""
+        if not (hasattr(self, 'current_screenshot') and os.path.exists(self.current_screenshot)):
+            messagebox.showinfo("Thông báo", "Không có ảnh nào được chọn")
+            return
+            
+        source = self.current_screenshot
+        self.update_status("Đang tìm ảnh tương tự...", is_running=True)
+        
+        def worker():
+            try:
+                matches = self.update_perceptual_index().query(source, max_distance=10, limit=50)
+                self.root.after(0, lambda: self.show_similar_screenshots(source, matches))
+            except Exception as e:
+                logger.error(f"Lỗi khi tìm ảnh tương tự: {str(e)}")
+                self.root.after(0, lambda: self.update_status(f"Lỗi khi tìm ảnh tương tự: {str(e)}", is_error=True))
+                
+        threading.Thread(target=worker, daemon=True).start()
+        
+    def show_similar_screenshots(self, source, matches):
+        """Hiển thị kết quả tìm ảnh tương tự trong cửa sổ riêng"""
+        # Bỏ qua chính ảnh đang xem
+        matches = [match for match in matches if match['entry']['path'] != source]
+        self.update_status(f"Tìm thấy {len(matches)} ảnh tương tự")
+        
+        window = tk.Toplevel(self.root)
+        window.title("Ảnh tương tự")
+        window.geometry("700x400")
+        
+        columns = ("distance", "step", "test", "run", "time")
+        tree = ttk.Treeview(window, columns=columns, show="headings")
+        for column, heading, width in zip(columns, ("Khoảng cách", "Bước", "Test", "Lần chạy", "Thời gian"),
+                                          (80, 150, 200, 120, 140)):
+            tree.heading(column, text=heading)
+            tree.column(column, width=width)
+        tree.pack(fill=tk.BOTH, expand=True, padx=5, pady=5)
+        
+        for i, match in enumerate(matches):
+            entry = match['entry']
+            tree.insert("", "end", str(i), values=(
+                match['distance'], entry['step'], entry['test'].split("::")[-1], entry['run'],
+                datetime.fromtimestamp(entry['timestamp']).strftime("%d/%m/%Y %H:%M:%S")
+            ))
+            
+        # Nhấp đúp để xem ảnh
+        def on_open(event):
+            selected = tree.selection()
+            if selected:
+                entry = matches[int(selected[0])]['entry']
+                self.show_screenshot(entry['path'], entry['step'])
+                
+        tree.bind("<Double-1>", on_open)
+        
+        if not matches:
+            ttk.Label(window, text="Không tìm thấy ảnh tương tự trong lịch sử").pack(pady=5)
+            
     def update_status(self, message, is_running=False, is_error=False):
         """Cập nhật thông báo trạng thái"""
         self.status_var.set(message)
@@ -682,6 +862,8 @@ class LazadaTestGUI:
             messagebox.showwarning("Đang thực hiện kiểm thử", 
                                    "Đang có bộ kiểm thử đang chạy. Vui lòng chờ đợi!")
             return
+        if not self.validate_screenshot_quality():
+            return
             
         # Cập nhật UI trước khi bắt đầu
         self.testing_in_progress = True
@@ -704,6 +886,19 @@ class LazadaTestGUI:
         # Khởi tạo thread mới để chạy test
         threading.Thread(target=self.run_tests_in_thread, daemon=True).start()
         
+    def validate_screenshot_quality(self):
+        """Kiểm tra chất lượng ảnh là số nguyên, giới hạn trong khoảng 1-100"""
+        try:
+            quality = int(self.screenshot_quality.get().strip())
+        except ValueError:
+            messagebox.showerror("Lỗi", "Chất lượng ảnh phải là số nguyên từ 1 đến 100")
+            return False
+        clamped = min(max(quality, 1), 100)
+        if clamped != quality:
+            logger.warning(f"Chất lượng ảnh {quality} ngoài khoảng 1-100, dùng {clamped}")
+        self.screenshot_quality.set(str(clamped))
+        return True
+        
     def update_timer(self):
         """Cập nhật thời gian chạy"""
         if not self.testing_in_progress or not self.start_time:
@@ -728,10 +923,15 @@ class LazadaTestGUI:
             total_tests = len(test_cases)
             
             # Lưu kết quả chi tiết của lần chạy test này
+            # Mã phiên chạy dùng chung cho các tiến trình pytest để gom ảnh trong chỉ mục
+            run_id = datetime.now().strftime("%Y%m%d_%H%M%S")
+            self.current_run_id = run_id
             session_results = {
                 'timestamp': datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+                'run_id': run_id,
                 'passed': 0,
                 'failed': 0,
+                'skipped': 0,
                 'total': total_tests,
                 'duration': 0,
                 'tests': {}
@@ -744,7 +944,18 @@ class LazadaTestGUI:
             env_vars = os.environ.copy()
             env_vars["HEADLESS"] = str(self.headless_mode.get())
             env_vars["TEST_URL"] = self.test_url.get()
+            env_vars["TEST_RUN_ID"] = run_id
             env_vars["TEST_PRODUCT"] = self.test_product.get()
+            env_vars["CART_MODE"] = "mock" if self.cart_mock.get() else "live"
+            env_vars["SCREENSHOT_POLICY"] = self.screenshot_policy.get()
+            env_vars["SCREENSHOT_FORMAT"] = self.screenshot_format.get()
+            env_vars["SCREENSHOT_QUALITY"] = self.screenshot_quality.get()
+            env_vars["THUMBNAIL_CACHE_MB"] = str(self.config.get('thumbnail_cache_mb', '200'))
+            # Báo cáo phiên tham chiếu thumbnail theo cùng độ rộng mà GUI tạo sau lần chạy
+            env_vars["THUMBNAIL_WIDTH"] = str(self.thumbnails.width)
+            
+            # Luồng sự kiện JSONL của phiên: kết quả từng test lấy từ đây thay vì đoán theo mã thoát
+            event_reader = EventReader(events_path(run_id))
             
             # Chạy từng test một
             for i, test_id in enumerate(test_cases, 1):
@@ -772,9 +983,8 @@ class LazadaTestGUI:
                     sys.executable, "-m", "pytest", 
                     f"lazada_test.py::TestLazada::{test_id}", 
                     "-v", headless_option,
-                    f"--timeout={timeout}",
-                    "--html=reports/lazada_test_report.html",
-                    "--self-contained-html"
+                    "-p", "lazada_events",
+                    f"--timeout={timeout}"
                 ]
                 
                 process = subprocess.Popen(
@@ -785,31 +995,41 @@ class LazadaTestGUI:
                     env=env_vars
                 )
                 
-                # Đọc output và gửi đến log
+                # Đọc output và gửi đến log, hiển thị bước đang chạy từ luồng sự kiện
+                events = []
                 for line in process.stdout:
                     logger.info(line.strip())
+                    new_events = event_reader.read_new()
+                    events.extend(new_events)
+                    steps = [event['step'] for event in new_events if event['type'] == 'step']
+                    if steps:
+                        self.root.after(0, lambda id=test_id, name=test_name, step=steps[-1]:
+                                        self.test_list.item(id, values=(name, f"Đang chạy: {step}", "N/A")))
                 
                 # Đợi tiến trình hoàn thành
                 return_code = process.wait()
+                events.extend(event_reader.read_new())
                 
                 # Tính thời gian
                 elapsed_time = int((time.time() - start_time) * 1000)  # ms
                 
-                # Xác định trạng thái
-                status = "Đạt" if return_code == 0 else "Lỗi"
+                # Xác định trạng thái theo sự kiện test_end, mã thoát chỉ dùng khi không có sự kiện
+                test_end = summarize_events(events)['tests'].get(TEST_NODE_PREFIX + test_id)
+                if test_end:
+                    outcome = test_end['outcome']
+                else:
+                    outcome = "passed" if return_code == 0 else "failed"
+                status = {"passed": "Đạt", "skipped": "Bỏ qua"}.get(outcome, "Lỗi")
                 
                 # Lưu kết quả test
                 session_results['tests'][test_id] = {
                     'name': test_name,
                     'status': status,
+                    'outcome': outcome,
                     'time': elapsed_time,
                     'return_code': return_code
                 }
-                
-                if status == "Đạt":
-                    session_results['passed'] += 1
-                else:
-                    session_results['failed'] += 1
+                session_results[outcome] = session_results.get(outcome, 0) + 1
                 
                 # Cập nhật UI
                 self.root.after(0, lambda id=test_id, name=test_name, s=status, t=elapsed_time: 
@@ -820,7 +1040,9 @@ class LazadaTestGUI:
                     'name': test_name,
                     'status': status,
                     'time': elapsed_time,
-                    'return_code': return_code
+                    'return_code': return_code,
+                    'message': test_end.get('message') if test_end else None,
+                    'error': test_end.get('error') if test_end else None
                 }
                 
                 # Cập nhật progress bar
@@ -833,6 +1055,19 @@ class LazadaTestGUI:
                     
             # Tổng thời gian chạy
             session_results['duration'] = time.time() - self.start_time
+            
+            # Hoàn tất báo cáo phiên (thêm phần tổng kết, không ghi lại các phần trước)
+            try:
+                SessionReport(run_id, REPORTS_DIR).finalize(session_results['duration'])
+            except Exception as e:
+                logger.error(f"Lỗi khi hoàn tất báo cáo phiên: {str(e)}")
+            
+            # Lưu tóm tắt lần chạy vào chỉ mục để so sánh giữa các lần chạy
+            try:
+                RunIndex().record(run_id)
+                update_dashboard(run_id, self.screenshot_store)
+            except Exception as e:
+                logger.error(f"Lỗi khi lưu chỉ mục lần chạy: {str(e)}")
                     
             # Hoàn thành
             if self.testing_in_progress:
@@ -843,11 +1078,24 @@ class LazadaTestGUI:
                 # Lưu lịch sử
                 self.save_test_history(session_results)
                 
+                # Tạo thumbnail song song cho ảnh của lần chạy này và gắn vào báo cáo phiên (chạy nền)
+                threading.Thread(target=lambda: publish_thumbnails(self.screenshot_store.entries(run_id=run_id),
+                                                                   os.path.join(REPORTS_DIR, 'media'), self.thumbnails),
+                                 daemon=True).start()
+                
+                # Cập nhật chỉ mục ảnh tương tự cho các ảnh mới (chạy nền)
+                threading.Thread(target=self.update_perceptual_index, daemon=True).start()
+                
+                # Dọn dẹp dữ liệu cũ theo chính sách lưu trữ (chạy nền)
+                self.start_retention()
+                
                 # Tổng kết kết quả
                 passed = session_results['passed']
                 total = session_results['total']
                 
                 logger.info(f"--- Tổng kết kiểm thử: {passed}/{total} test đạt ---")
+                if os.path.exists(junit_path(run_id)):
+                    logger.info(f"Kết quả JUnit XML: {junit_path(run_id)}")
                 
                 # Cập nhật biểu đồ
                 self.root.after(0, self.update_charts)
@@ -856,7 +1104,7 @@ class LazadaTestGUI:
                 self.root.after(0, self.load_recent_screenshots)
                 
                 # Mở báo cáo HTML nếu có và được cấu hình
-                if os.path.exists("reports/lazada_test_report.html") and self.auto_report.get():
+                if os.path.exists(session_report_path(run_id, REPORTS_DIR)) and self.auto_report.get():
                     if messagebox.askyesno("Kiểm thử hoàn thành", 
                                           f"{passed}/{total} test đạt. Bạn có muốn xem báo cáo HTML không?"):
                         self.open_html_report()
@@ -896,17 +1144,12 @@ class LazadaTestGUI:
             
         test_id = selected_id[0]
         
-        # Tìm ảnh chụp màn hình liên quan đến test
-        test_name = test_id.split("_")[-1]  # Lấy phần cuối của test_id
-        screenshot_files = sorted(
-            glob.glob(os.path.join(SCREENSHOTS_DIR, f"*{test_name}*.png")),
-            key=os.path.getmtime, 
-            reverse=True
-        )
+        # Tìm ảnh chụp màn hình mới nhất của test qua chỉ mục
+        screenshot_entries = self.screenshot_store.latest(limit=1, test=TEST_NODE_PREFIX + test_id)
         
-        if screenshot_files:
+        if screenshot_entries:
             # Hiển thị ảnh đầu tiên
-            self.show_screenshot(screenshot_files[0])
+            self.show_screenshot(screenshot_entries[0]['path'], screenshot_entries[0]['step'])
             
             # Hiển thị thông tin test
             test_info = self.test_list.item(test_id, "values")
@@ -915,16 +1158,34 @@ class LazadaTestGUI:
             
             logger.info(f"Đã chọn test: {test_id} - Trạng thái: {status} - Thời gian: {time_ms}ms")
             
+    def session_report(self):
+        """Báo cáo phiên của lần chạy hiện tại, hoặc báo cáo phiên gần nhất trong thư mục reports"""
+        if self.current_run_id and os.path.exists(session_report_path(self.current_run_id, REPORTS_DIR)):
+            return session_report_path(self.current_run_id, REPORTS_DIR)
+        return latest_session_report(REPORTS_DIR)
+            
     def open_html_report(self):
-        """Mở báo cáo HTML trong trình duyệt"""
-        report_path = os.path.join(os.getcwd(), "reports", "lazada_test_report.html")
-        if os.path.exists(report_path):
-            # Mở trong trình duyệt mặc định
-            import webbrowser
-            webbrowser.open(f"file://{report_path}")
+        """Mở báo cáo HTML trong trình duyệt (báo cáo phiên gần nhất, xem được cả khi đang chạy)"""
+        report_path = self.session_report()
+        if report_path:
+            # Mở trong trình duyệt mặc định qua máy chủ báo cáo cục bộ
+            self.report_server.open(report_path)
         else:
             messagebox.showinfo("Thông báo", "Chưa có báo cáo HTML. Hãy chạy kiểm thử trước.")
             
+    def archive_html_report(self):
+        """Đóng gói báo cáo HTML cùng ảnh tham chiếu thành một file zip để chia sẻ"""
+        report_path = self.session_report()
+        if not report_path:
+            messagebox.showinfo("Thông báo", "Chưa có báo cáo HTML. Hãy chạy kiểm thử trước.")
+            return
+        try:
+            archive_path = archive_report(report_path)
+            messagebox.showinfo("Thành công", f"Đã đóng gói báo cáo tại:\n{archive_path}")
+        except Exception as e:
+            logger.error(f"Lỗi khi đóng gói báo cáo: {str(e)}")
+            messagebox.showerror("Lỗi", f"Không thể đóng gói báo cáo: {str(e)}")
+            
     def open_screenshots_folder(self):
         """Mở thư mục ảnh chụp màn hình"""
         screenshots_path = os.path.join(os.getcwd(), SCREENSHOTS_DIR)
@@ -937,32 +1198,34 @@ class LazadaTestGUI:
             else:  # linux
                 subprocess.call(['xdg-open', screenshots_path])
                 
-    def clear_old_screenshots(self):
-        """Xóa ảnh chụp màn hình cũ"""
-        screenshots_path = os.path.join(os.getcwd(), SCREENSHOTS_DIR)
-        if not os.path.exists(screenshots_path):
+    def start_retention(self, notify=False):
+        """Áp dụng chính sách lưu trữ trong thread nền"""
+        try:
+            policy = RetentionPolicy.from_config(self.config)
+        except ValueError as e:
+            logger.error(f"Cấu hình lưu trữ không hợp lệ: {str(e)}")
             return
-            
-        if messagebox.askyesno("Xác nhận", "Bạn có chắc chắn muốn xóa tất cả ảnh chụp màn hình cũ?"):
-            try:
-                # Giữ lại 10 ảnh mới nhất
-                screenshot_files = sorted(
-                    glob.glob(os.path.join(screenshots_path, "*.png")),
-                    key=os.path.getmtime, 
-                    reverse=True
-                )
+        engine = RetentionEngine(self.screenshot_store, policy, reports_dir=REPORTS_DIR)
+        engine.run_in_background(
+            callback=lambda summary: self.root.after(0, lambda: self.on_retention_done(summary, notify)))
+        
+    def on_retention_done(self, summary, notify=False):
+        """Cập nhật giao diện sau khi dọn dẹp xong"""
+        reclaimed_mb = summary['bytes_reclaimed'] / 1024 / 1024
+        self.update_status(f"Đã lưu trữ {len(summary['runs_archived'])} lần chạy cũ, "
+                           f"giải phóng {reclaimed_mb:.1f} MB")
+        if summary['runs_archived']:
+            self.load_recent_screenshots()
+        if notify:
+            messagebox.showinfo("Thành công",
+                                f"Đã lưu trữ {len(summary['runs_archived'])} lần chạy, "
+                                f"{summary['reports_archived']} file báo cáo và {summary['logs_rotated']} file log.\n"
+                                f"Dung lượng giải phóng: {reclaimed_mb:.1f} MB")
                 
-                # Xóa các ảnh cũ
-                for file in screenshot_files[10:]:
-                    os.remove(file)
-                    
-                messagebox.showinfo("Thành công", "Đã xóa ảnh chụp màn hình cũ")
-                
-                # Tải lại ảnh
-                self.load_recent_screenshots()
-                
-            except Exception as e:
-                messagebox.showerror("Lỗi", f"Lỗi khi xóa ảnh: {str(e)}")
+    def clear_old_screenshots(self):
+        """Dọn dẹp ảnh chụp màn hình, báo cáo và log cũ theo chính sách lưu trữ"""
+        if messagebox.askyesno("Xác nhận", "Áp dụng chính sách lưu trữ ngay? Dữ liệu cũ sẽ được nén vào thư mục archive."):
+            self.start_retention(notify=True)
                 
     def export_to_excel(self):
         """Xuất kết quả kiểm thử ra file Excel"""
@@ -1207,7 +1470,16 @@ class LazadaTestGUI:
             'test_url': 'https://www.lazada.vn/',
             'test_product': 'điện thoại Samsung',
             'timeout': '60',
-            'retry': '1'
+            'retry': '1',
+            'cart_mode': 'live',
+            'screenshot_policy': 'all',
+            'screenshot_format': 'png',
+            'screenshot_quality': '80',
+            'thumbnail_width': '480',
+            'thumbnail_cache_mb': '200',
+            'retention_keep_runs': '10',
+            'retention_max_mb': '500',
+            'retention_max_days': '14'
         }
         
         if os.path.exists(config_path):
@@ -1231,6 +1503,8 @@ class LazadaTestGUI:
             
     def save_config(self):
         """Lưu cấu hình vào file"""
+        if not self.validate_screenshot_quality():
+            return
         config = {
             'headless': self.headless_mode.get(),
             'show_browsers': self.show_browsers.get(),
@@ -1238,7 +1512,16 @@ class LazadaTestGUI:
             'test_url': self.test_url.get(),
             'test_product': self.test_product.get(),
             'timeout': self.timeout_var.get(),
-            'retry': self.retry_var.get()
+            'retry': self.retry_var.get(),
+            'cart_mode': 'mock' if self.cart_mock.get() else 'live',
+            'screenshot_policy': self.screenshot_policy.get(),
+            'screenshot_format': self.screenshot_format.get(),
+            'screenshot_quality': self.screenshot_quality.get(),
+            'thumbnail_width': self.config.get('thumbnail_width', '480'),
+            'thumbnail_cache_mb': self.config.get('thumbnail_cache_mb', '200'),
+            'retention_keep_runs': self.retention_keep_runs.get(),
+            'retention_max_mb': self.retention_max_mb.get(),
+            'retention_max_days': self.retention_max_days.get()
         }
         
         config_path = os.path.join(DATA_DIR, "config.json")
@@ -1260,7 +1543,16 @@ class LazadaTestGUI:
             'test_url': 'https://www.lazada.vn/',
             'test_product': 'điện thoại Samsung',
             'timeout': '60',
-            'retry': '1'
+            'retry': '1',
+            'cart_mode': 'live',
+            'screenshot_policy': 'all',
+            'screenshot_format': 'png',
+            'screenshot_quality': '80',
+            'thumbnail_width': '480',
+            'thumbnail_cache_mb': '200',
+            'retention_keep_runs': '10',
+            'retention_max_mb': '500',
+            'retention_max_days': '14'
         }
         
         if messagebox.askyesno("Xác nhận", "Bạn có chắc chắn muốn khôi phục cấu hình mặc định?"):
@@ -1272,6 +1564,13 @@ class LazadaTestGUI:
             self.test_product.set(default_config['test_product'])
             self.timeout_var.set(default_config['timeout'])
             self.retry_var.set(default_config['retry'])
+            self.cart_mock.set(default_config['cart_mode'] == 'mock')
+            self.screenshot_policy.set(default_config['screenshot_policy'])
+            self.screenshot_format.set(default_config['screenshot_format'])
+            self.screenshot_quality.set(default_config['screenshot_quality'])
+            self.retention_keep_runs.set(default_config['retention_keep_runs'])
+            self.retention_max_mb.set(default_config['retention_max_mb'])
+            self.retention_max_days.set(default_config['retention_max_days'])
             
             # Lưu vào file
             config_path = os.path.join(DATA_DIR, "config.json")
@@ -1297,9 +1596,10 @@ class LazadaTestGUI:
                     history = json.load(file)
                     
                 # Thêm vào bảng
+                # Dòng có mã lần chạy dùng mã đó làm iid để chọn khi so sánh
                 for i, item in enumerate(history):
                     self.history_table.insert(
-                        "", "end", values=(
+                        "", "end", iid=item.get('run_id'), values=(
                             item['timestamp'],
                             item['passed'],
                             item['failed'],
@@ -1311,6 +1611,38 @@ class LazadaTestGUI:
             except Exception as e:
                 logger.error(f"Lỗi khi tải lịch sử kiểm thử: {str(e)}")
                 
+    def open_dashboard(self):
+        """Mở dashboard tĩnh (tạo sẵn sau mỗi lần chạy)"""
+        if not os.path.exists(DASHBOARD_PATH):
+            messagebox.showinfo("Thông báo", "Chưa có dashboard. Dashboard được tạo sau lần chạy kiểm thử tiếp theo.")
+            return
+        self.report_server.open(DASHBOARD_PATH)
+        
+    def compare_selected_runs(self):
+        """So sánh hai lần chạy được chọn trong bảng lịch sử và mở báo cáo so sánh"""
+        # Dòng không có mã lần chạy mang iid tự sinh của Treeview (I001, ...)
+        selected = [item for item in self.history_table.selection() if not item.startswith("I")]
+        if len(selected) != 2:
+            messagebox.showinfo("Thông báo", "Hãy chọn đúng 2 lần chạy có mã lần chạy trong bảng lịch sử (giữ Ctrl).")
+            return
+        # Lần chạy cũ hơn (đứng trước trong bảng) làm mốc
+        base_run, head_run = sorted(selected, key=self.history_table.index)
+        try:
+            index = RunIndex()
+            comparison = compare_runs(index.load(base_run), index.load(head_run))
+            path = write_comparison_report(comparison, comparison_report_path(base_run, head_run, REPORTS_DIR))
+        except KeyError:
+            messagebox.showerror("Lỗi", "Không có dữ liệu sự kiện cho một trong hai lần chạy.")
+            return
+        except Exception as e:
+            logger.error(f"Lỗi khi so sánh lần chạy: {str(e)}")
+            messagebox.showerror("Lỗi", f"Không thể so sánh: {str(e)}")
+            return
+        
+        logger.info(f"So sánh {base_run} -> {head_run}: {len(comparison['new_failures'])} lỗi mới, "
+                    f"{len(comparison['fixed'])} đã sửa, {len(comparison['slow_steps'])} bước chậm hơn")
+        self.report_server.open(path)
+        
     def save_test_history(self, session_results):
         """Lưu lịch sử kiểm thử"""
         history_path = os.path.join(DATA_DIR, "test_history.json")
@@ -1327,10 +1659,17 @@ class LazadaTestGUI:
         # Chỉ lưu thông tin tổng hợp
         history_item = {
             'timestamp': session_results['timestamp'],
+            'run_id': session_results.get('run_id'),
             'passed': session_results['passed'],
             'failed': session_results['failed'],
             'total': session_results['total'],
-            'duration': session_results['duration']
+            'duration': session_results['duration'],
+            'skipped': session_results.get('skipped', 0),
+            'failed_tests': [test_id for test_id, result in session_results['tests'].items()
+                             if result.get('outcome', 'failed') == 'failed'],
+            # Kết quả và thời gian từng test, dùng để so sánh giữa các lần chạy
+            'tests': {test_id: {'outcome': result.get('outcome'), 'time': result['time']}
+                      for test_id, result in session_results['tests'].items()}
         }
         
         # Thêm vào lịch sử
@@ -1400,24 +1739,30 @@ class LazadaTestGUI:
             if not file_path:
                 return
                 
-            # Lưu thư mục chứa báo cáo
+            # Ghi báo cáo theo từng dòng từ template đã biên dịch; ảnh đặt trong media/ cạnh báo cáo
+            entries = []
+            history = ()
+            if not summary:
+                entries = (self.screenshot_store.entries(run_id=self.current_run_id) if self.current_run_id
+                           else self.screenshot_store.latest(limit=8))
+                # Lịch sử lấy từ chỉ mục lần chạy (JSONL), đọc ngược từng khối và ghi từng dòng vào báo cáo
+                history = (dict(record, timestamp=datetime.fromtimestamp(record['timestamp']).strftime(
+                    "%Y-%m-%d %H:%M:%S")) for record in RunIndex().iter_recent())
             report_dir = os.path.dirname(file_path)
-            
-            # Tạo nội dung báo cáo
-            html_content = self._generate_html_report(summary)
-            
-            # Lưu vào file
-            with open(file_path, "w", encoding="utf-8") as file:
-                file.write(html_content)
+            assets = ReportAssets(os.path.join(report_dir, 'media'), report_dir, self.thumbnails.width)
+            write_test_report(file_path, self.test_results.items(), summary=summary,
+                              entries=entries, history=history, assets=assets)
+            if assets.deferred:
+                # Thumbnail chưa có trong cache được tạo nền; trang hiển thị ảnh gốc cho đến khi xong
+                threading.Thread(target=lambda: publish_thumbnails(entries, assets.media_dir, self.thumbnails),
+                                 daemon=True).start()
                 
             messagebox.showinfo("Thành công", f"Đã tạo báo cáo tại:\n{file_path}")
             
             # Mở báo cáo trong trình duyệt
             try:
-                import webbrowser
-                # Sử dụng file:/// để đảm bảo hoạt động trên mọi nền tảng
-                file_url = "file:///" + os.path.abspath(file_path).replace("\\", "/")
-                webbrowser.open(file_url)
+                # Qua máy chủ báo cáo nếu file nằm trong reports/, ngược lại dùng file:///
+                self.report_server.open(file_path)
             except Exception as browser_error:
                 logger.warning(f"Không thể mở trình duyệt: {str(browser_error)}")
                 # Thông báo cho người dùng vị trí file để họ có thể tự mở
@@ -1427,275 +1772,6 @@ class LazadaTestGUI:
             logger.error(f"Lỗi khi tạo báo cáo: {str(e)}")
             messagebox.showerror("Lỗi", f"Không thể tạo báo cáo: {str(e)}")
 
-    def _generate_html_report(self, summary=False):
-        """Tạo nội dung HTML cho báo cáo"""
-        try:
-            # Đếm số test đạt và không đạt
-            pass_count = sum(1 for r in self.test_results.values() if r.get('status') == 'Đạt')
-            fail_count = sum(1 for r in self.test_results.values() if r.get('status') == 'Lỗi')
-            total_count = len(self.test_results)
-            
-            # Tính tổng thời gian
-            total_time = sum(r.get('time', 0) for r in self.test_results.values())
-            
-            # Tạo HTML
-            html = f"""
-            <!DOCTYPE html>
-            <html lang="vi">
-            <head>
-                <meta charset="UTF-8">
-                <meta name="viewport" content="width=device-width, initial-scale=1.0">
-                <title>{'Tóm tắt' if summary else 'Báo cáo đầy đủ'} Kiểm thử Lazada</title>
-                <style>
-                    body {{
-                        font-family: Arial, sans-serif;
-                        line-height: 1.6;
-                        margin: 0;
-                        padding: 20px;
-                        color: #333;
-                    }}
-                    h1, h2, h3 {{
-                        color: #2c3e50;
-                    }}
-                    .container {{
-                        max-width: 1200px;
-                        margin: 0 auto;
-                    }}
-                    .summary {{
-                        background-color: #f8f9fa;
-                        border-radius: 5px;
-                        padding: 20px;
-                        margin-bottom: 20px;
-                        box-shadow: 0 2px 5px rgba(0,0,0,0.1);
-                    }}
-                    .stats {{
-                        display: flex;
-                        justify-content: space-around;
-                        margin: 20px 0;
-                    }}
-                    .stat-item {{
-                        text-align: center;
-                        padding: 10px;
-                        border-radius: 5px;
-                    }}
-                    .pass {{
-                        background-color: #d4edda;
-                        color: #155724;
-                    }}
-                    .fail {{
-                        background-color: #f8d7da;
-                        color: #721c24;
-                    }}
-                    .total {{
-                        background-color: #cce5ff;
-                        color: #004085;
-                    }}
-                    .time {{
-                        background-color: #fff3cd;
-                        color: #856404;
-                    }}
-                    table {{
-                        width: 100%;
-                        border-collapse: collapse;
-                        margin: 20px 0;
-                    }}
-                    th, td {{
-                        padding: 12px 15px;
-                        text-align: left;
-                        border-bottom: 1px solid #ddd;
-                    }}
-                    th {{
-                        background-color: #f2f2f2;
-                    }}
-                    tr:hover {{
-                        background-color: #f5f5f5;
-                    }}
-                    .status-pass {{
-                        color: #28a745;
-                        font-weight: bold;
-                    }}
-                    .status-fail {{
-                        color: #dc3545;
-                        font-weight: bold;
-                    }}
-                    .footer {{
-                        margin-top: 30px;
-                        text-align: center;
-                        font-size: 0.9em;
-                        color: #6c757d;
-                    }}
-                    .screenshot-container {{
-                        display: grid;
-                        grid-template-columns: repeat(auto-fill, minmax(250px, 1fr));
-                        gap: 15px;
-                        margin: 20px 0;
-                    }}
-                    .screenshot-item {{
-                        border: 1px solid #ddd;
-                        border-radius: 4px;
-                        padding: 10px;
-                        text-align: center;
-                    }}
-                    .screenshot-item img {{
-                        max-width: 100%;
-                        height: auto;
-                        margin-bottom: 10px;
-                    }}
-                    .screenshot-item a {{
-                        display: block;
-                        color: #007bff;
-                        text-decoration: none;
-                        margin-top: 5px;
-                    }}
-                    .screenshot-item a:hover {{
-                        text-decoration: underline;
-                    }}
-                </style>
-            </head>
-            <body>
-                <div class="container">
-                    <h1>{'Tóm tắt' if summary else 'Báo cáo đầy đủ'} Kiểm thử Trang Web Lazada</h1>
-                    <p>Ngày tạo báo cáo: {datetime.now().strftime('%d/%m/%Y %H:%M:%S')}</p>
-                    
-                    <div class="summary">
-                        <h2>Tóm tắt kết quả</h2>
-                        <div class="stats">
-                            <div class="stat-item pass">
-                                <h3>Đạt</h3>
-                                <p>{pass_count}</p>
-                            </div>
-                            <div class="stat-item fail">
-                                <h3>Lỗi</h3>
-                                <p>{fail_count}</p>
-                            </div>
-                            <div class="stat-item total">
-                                <h3>Tổng số</h3>
-                                <p>{total_count}</p>
-                            </div>
-                            <div class="stat-item time">
-                                <h3>Tổng thời gian</h3>
-                                <p>{total_time/1000:.2f}s</p>
-                            </div>
-                        </div>
-                    </div>
-                    
-                    <h2>Kết quả chi tiết</h2>
-                    <table>
-                        <thead>
-                            <tr>
-                                <th>STT</th>
-                                <th>Test ID</th>
-                                <th>Tên Test</th>
-                                <th>Trạng thái</th>
-                                <th>Thời gian (ms)</th>
-                            </tr>
-                        </thead>
-                        <tbody>
-            """
-            
-            # Thêm từng test
-            for i, (test_id, result) in enumerate(self.test_results.items(), 1):
-                status_class = "status-pass" if result.get('status') == 'Đạt' else "status-fail"
-                # Escape các ký tự đặc biệt trong HTML
-                test_name = result.get('name', '').replace('<', '&lt;').replace('>', '&gt;')
-                test_status = result.get('status', '').replace('<', '&lt;').replace('>', '&gt;')
-                
-                html += f"""
-                            <tr>
-                                <td>{i}</td>
-                                <td>{test_id}</td>
-                                <td>{test_name}</td>
-                                <td class="{status_class}">{test_status}</td>
-                                <td>{result.get('time', '')}</td>
-                            </tr>
-                """
-                
-            html += """
-                        </tbody>
-                    </table>
-            """
-            
-            # Nếu là báo cáo đầy đủ, thêm ảnh chụp màn hình
-            if not summary:
-                html += """
-                    <h2>Ảnh chụp màn hình</h2>
-                    <div class="screenshot-container">
-                """
-                
-                # Tìm ảnh chụp màn hình
-                try:
-                    screenshot_files = sorted(
-                        glob.glob(os.path.join(SCREENSHOTS_DIR, "*.png")),
-                        key=os.path.getmtime, 
-                        reverse=True
-                    )[:8]  # Giới hạn chỉ 8 ảnh mới nhất để tránh báo cáo quá lớn
-                    
-                    # Tạo một thư mục riêng để sao chép các ảnh dùng trong báo cáo
-                    report_name = f"report_{datetime.now().strftime('%Y%m%d_%H%M%S')}"
-                    report_img_dir = os.path.join(REPORTS_DIR, report_name)
-                    os.makedirs(report_img_dir, exist_ok=True)
-                    
-                    # Thêm từng ảnh
-                    for i, file in enumerate(screenshot_files):
-                        try:
-                            base_name = os.path.basename(file)
-                            
-                            # Sao chép ảnh vào thư mục báo cáo
-                            import shutil
-                            img_path = os.path.join(report_img_dir, base_name)
-                            shutil.copy2(file, img_path)
-                            
-                            # Đường dẫn tương đối từ báo cáo HTML đến ảnh
-                            relative_path = os.path.join(report_name, base_name).replace('\\', '/')
-                            
-                            # Thêm ảnh vào HTML với đường dẫn tương đối
-                            html += f"""
-                                <div class="screenshot-item">
-                                    <img src="{relative_path}" alt="{base_name}" loading="lazy">
-                                    <p>{base_name}</p>
-                                    <a href="{relative_path}" target="_blank">Mở ảnh đầy đủ</a>
-                                </div>
-                            """
-                        except Exception as img_err:
-                            logger.warning(f"Lỗi khi xử lý ảnh {file}: {str(img_err)}")
-                            continue
-                            
-                except Exception as e:
-                    logger.warning(f"Lỗi khi tìm ảnh chụp màn hình: {str(e)}")
-                    html += "<p>Không thể tải ảnh chụp màn hình: " + str(e).replace('<', '&lt;').replace('>', '&gt;') + "</p>"
-                    
-                html += """
-                    </div>
-                """
-                
-            html += """
-                    <div class="footer">
-                        <p>Báo cáo được tạo tự động bởi công cụ kiểm thử Lazada</p>
-                    </div>
-                </div>
-            </body>
-            </html>
-            """
-            
-            return html
-            
-        except Exception as e:
-            logger.error(f"Lỗi khi tạo nội dung HTML: {str(e)}")
-            # Trả về báo cáo đơn giản nếu có lỗi
-            return f"""
-            <!DOCTYPE html>
-            <html>
-            <head>
-                <meta charset="UTF-8">
-                <title>Báo cáo lỗi</title>
-            </head>
-            <body>
-                <h1>Đã xảy ra lỗi khi tạo báo cáo</h1>
-                <p>Chi tiết lỗi: {str(e).replace('<', '&lt;').replace('>', '&gt;')}</p>
-            </body>
-            </html>
-            """
-    
     def show_result_charts(self):
         """Hiển thị biểu đồ kết quả trong cửa sổ mới"""
         # Chuyển đến tab biểu đồ
@@ -0,0 +1,352 @@
+import atexit
+import contextlib
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+
+try:
+    from PIL import Image
+except ImportError:
+    Image = None
+
+logger = logging.getLogger()
+
+THUMBS_DIR = os.path.join('screenshots', 'thumbs')
+THUMBNAIL_WIDTH = 480
+THUMBNAIL_CACHE_MB = 200
+
+
+def make_thumbnail(source, target, width=THUMBNAIL_WIDTH, quality=70):
+    """
+    Write a JPEG thumbnail `width` pixels wide.
+
+    JPEG sources are decoded at reduced scale via draft(); other formats
+    are shrunk by an integer reduce() before the final resize, so tall
+    full-page captures never go through a full-resolution resample.
+    """
+    with Image.open(source) as image:
+        image.draft("RGB", (width, width * image.size[1] // max(image.size[0], 1)))
+        image = image.convert("RGB")
+        factor = image.size[0] // width
+        if factor > 1:
+            image = image.reduce(factor)
+        if image.size[0] > width:
+            image = image.resize((width, max(1, image.size[1] * width // image.size[0])), Image.BILINEAR)
+        os.makedirs(os.path.dirname(target), exist_ok=True)
+        temp_path = f"{target}.{os.getpid()}.tmp"
+        image.save(temp_path, format="JPEG", quality=quality)
+        os.replace(temp_path, target)
+
+
+def load_thumbnail(source, size=(100, 100)):
+    """
+    Decode an image straight to a small RGB thumbnail fitting `size`.
+
+    JPEG is decoded at reduced scale by draft(); thumbnail() then shrinks
+    by integer reduce() before resampling, and the colour conversion runs
+    on the small image, so a full-page capture is never fully resampled.
+    """
+    with Image.open(source) as image:
+        image.draft("RGB", size)
+        image.thumbnail(size, Image.BILINEAR, reducing_gap=2.0)
+        return image.convert("RGB")
+
+
+def _thumbnail_job(job):
+    """Process pool worker: (source, target, width) -> (target, error or None)"""
+    source, target, width = job
+    try:
+        make_thumbnail(source, target, width)
+        return target, None
+    except Exception as e:
+        return target, str(e)
+
+
+class ThumbnailCache:
+    """
+    Persistent on-disk thumbnails keyed by (source path, size, mtime, box).
+
+    A box is (width, height) to fit within, or (width, None) for a
+    width-bound thumbnail of any height. Cached files are named by the
+    SHA-256 of the key, so a changed source simply maps to a new file.
+    `index.json` lists the files with their sizes and last use; loading it
+    costs as much as the cache holds, never more, however many screenshots
+    exist.
+
+    The GUI and the pytest processes share the directory, so `flush()`
+    merges this process' entries into the index on disk under a lock file
+    before evicting the least recently used files over `max_bytes`; the
+    budget therefore holds for everything any process has cached.
+    """
+
+    # Persist the LRU order at most this often; flush() forces it
+    FLUSH_INTERVAL = 5.0
+    # A lock file older than this was left behind by a crashed process
+    LOCK_STALE_SECONDS = 30.0
+
+    def __init__(self, cache_dir=THUMBS_DIR, max_bytes=None):
+        self.cache_dir = cache_dir
+        self.index_path = os.path.join(cache_dir, 'index.json')
+        self.lock_path = os.path.join(cache_dir, 'index.lock')
+        self.max_bytes = max_bytes or int(float(os.environ.get('THUMBNAIL_CACHE_MB', THUMBNAIL_CACHE_MB)) * 1024 * 1024)
+        self.total = 0
+        self.hits = 0
+        self.misses = 0
+        self._files = OrderedDict()  # file name -> (bytes, last used), least recently used first
+        self._lock = threading.Lock()
+        self._dirty = False
+        self._flushed = time.monotonic()
+        self._load()
+
+    def _read_index(self):
+        """{name: (bytes, last used)} from index.json; entries written without a last use count as oldest"""
+        files = {}
+        if not os.path.exists(self.index_path):
+            return files
+        try:
+            with open(self.index_path, "r", encoding="utf-8") as file:
+                for item in json.load(file):
+                    files[item[0]] = (item[1], item[2] if len(item) > 2 else 0.0)
+        except Exception as e:
+            logger.warning(f"Could not load thumbnail cache index {self.index_path}: {str(e)}")
+        return files
+
+    def _load(self):
+        if os.path.exists(self.index_path):
+            files = self._read_index()
+        else:
+            # No index yet: adopt thumbnails already on disk, so they can be evicted
+            files = {}
+            for directory, _, names in os.walk(self.cache_dir):
+                for name in names:
+                    if name.endswith(".jpg"):
+                        path = os.path.join(directory, name)
+                        files[os.path.relpath(path, self.cache_dir)] = (os.path.getsize(path), os.path.getmtime(path))
+            self._dirty = bool(files)
+        self._files = OrderedDict(sorted(files.items(), key=lambda item: item[1][1]))
+        self.total = sum(size for size, _ in self._files.values())
+
+    def path_for(self, source, box):
+        """Cache file of a source image at a box; raises OSError if the source is missing"""
+        stat = os.stat(source)
+        key = f"{os.path.abspath(source)}|{stat.st_size}|{stat.st_mtime_ns}|{box[0]}x{box[1] or ''}"
+        digest = hashlib.sha256(key.encode("utf-8")).hexdigest()
+        return os.path.join(self.cache_dir, digest[:2], f"{digest}.jpg")
+
+    def _render(self, source, target, box):
+        if box[1] is None:
+            make_thumbnail(source, target, box[0])
+            return
+        image = load_thumbnail(source, box)
+        os.makedirs(os.path.dirname(target), exist_ok=True)
+        temp_path = f"{target}.{os.getpid()}.{threading.get_ident()}.tmp"
+        image.save(temp_path, format="JPEG", quality=80)
+        os.replace(temp_path, target)
+
+    def add(self, path):
+        """Record a cache file as most recently used (files created elsewhere, e.g. by a process pool)"""
+        name = os.path.relpath(path, self.cache_dir)
+        with self._lock:
+            if name in self._files:
+                size = self._files.pop(name)[0]
+            else:
+                size = os.path.getsize(path)
+                self.total += size
+            self._files[name] = (size, time.time())
+            self._dirty = True
+            over_budget = self.total > self.max_bytes
+        if over_budget or time.monotonic() - self._flushed > self.FLUSH_INTERVAL:
+            self.flush()
+
+    @contextlib.contextmanager
+    def _index_lock(self):
+        """Exclusive lock across processes, held while the index is read, merged and rewritten"""
+        os.makedirs(self.cache_dir, exist_ok=True)
+        deadline = time.monotonic() + self.LOCK_STALE_SECONDS
+        while True:
+            try:
+                descriptor = os.open(self.lock_path, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+                break
+            except FileExistsError:
+                try:
+                    stale = time.time() - os.path.getmtime(self.lock_path) > self.LOCK_STALE_SECONDS
+                except OSError:
+                    continue
+                if stale or time.monotonic() > deadline:
+                    logger.warning(f"Removing stale thumbnail cache lock {self.lock_path}")
+                    try:
+                        os.remove(self.lock_path)
+                    except OSError:
+                        pass
+                    continue
+                time.sleep(0.01)
+        try:
+            yield
+        finally:
+            os.close(descriptor)
+            try:
+                os.remove(self.lock_path)
+            except OSError:
+                pass
+
+    def _merge(self, on_disk, mine):
+        """
+        Union of the index on disk and this process' view. Files only this
+        process knows are kept if they still exist: missing ones were
+        evicted by another process.
+        """
+        merged = dict(on_disk)
+        for name, (size, used) in mine.items():
+            if name in merged:
+                merged[name] = (size, max(used, merged[name][1]))
+            elif os.path.exists(os.path.join(self.cache_dir, name)):
+                merged[name] = (size, used)
+        return OrderedDict(sorted(merged.items(), key=lambda item: item[1][1]))
+
+    def _evict(self, files):
+        """Delete least recently used files until `files` fits max_bytes, return the new total"""
+        total = sum(size for size, _ in files.values())
+        while total > self.max_bytes and len(files) > 1:
+            name, (size, _) = files.popitem(last=False)
+            total -= size
+            try:
+                os.remove(os.path.join(self.cache_dir, name))
+            except OSError:
+                pass
+        return total
+
+    def get(self, source, box):
+        """Return the cached thumbnail path of `source`, rendering it on a miss"""
+        path = self.path_for(source, box)
+        if os.path.exists(path):
+            self.hits += 1
+        else:
+            self.misses += 1
+            self._render(source, path, box)
+        self.add(path)
+        return path
+
+    def open(self, source, box):
+        """Cached thumbnail of `source` as a loaded PIL image"""
+        with Image.open(self.get(source, box)) as image:
+            image.load()
+            return image
+
+    def flush(self):
+        """Merge this process' entries into the shared index, evict over budget and write it"""
+        with self._lock:
+            if not self._dirty:
+                return
+            mine = dict(self._files)
+            self._dirty = False
+            self._flushed = time.monotonic()
+        with self._index_lock():
+            files = self._merge(self._read_index(), mine)
+            total = self._evict(files)
+            temp_path = f"{self.index_path}.{os.getpid()}.tmp"
+            with open(temp_path, "w", encoding="utf-8") as file:
+                json.dump([[name, size, used] for name, (size, used) in files.items()], file)
+            os.replace(temp_path, self.index_path)
+        with self._lock:
+            # Entries added while the index was being written stay for the next flush
+            for name, value in self._files.items():
+                if mine.get(name) != value:
+                    total += 0 if name in files else value[0]
+                    files[name] = value
+                    files.move_to_end(name)
+            self._files = files
+            self.total = total
+
+
+_caches = {}
+
+
+def get_thumbnail_cache(cache_dir=THUMBS_DIR, max_bytes=None):
+    """Process-wide cache per directory, so every user shares one LRU index; flushed at exit"""
+    cache = _caches.get(cache_dir)
+    if cache is None:
+        cache = _caches[cache_dir] = ThumbnailCache(cache_dir, max_bytes)
+        atexit.register(cache.flush)
+    elif max_bytes:
+        cache.max_bytes = max_bytes
+    return cache
+
+
+class ThumbnailGenerator:
+    """
+    Width-bound thumbnails of store objects, kept in the shared ThumbnailCache.
+
+    `generate()` fans the missing thumbnails of a batch out to a process
+    pool, so a whole run is thumbnailed in parallel right after it ends;
+    `get()` makes a single one on demand. An object that already has a
+    cached thumbnail at this width is never decoded again.
+    """
+
+    def __init__(self, width=THUMBNAIL_WIDTH, cache=None, max_workers=None):
+        self.width = width
+        self.cache = cache or get_thumbnail_cache()
+        self.max_workers = max_workers or min(4, os.cpu_count() or 1)
+
+    @property
+    def enabled(self):
+        """Thumbnails need Pillow; without it reports use the full images"""
+        return Image is not None
+
+    def path_for(self, entry):
+        return self.cache.path_for(entry['path'], (self.width, None))
+
+    def get(self, entry):
+        """Return the thumbnail path of an entry, creating it if needed (full image without Pillow)"""
+        if Image is None:
+            return entry['path']
+        return self.cache.get(entry['path'], (self.width, None))
+
+    def generate(self, entries):
+        """Create the missing thumbnails of `entries` in parallel and return counts and timing"""
+        start = time.perf_counter()
+        stats = {'generated': 0, 'skipped': 0, 'failed': 0, 'ms': 0.0}
+        if Image is None:
+            logger.warning("Pillow is not installed, skipping thumbnail generation")
+            return stats
+
+        jobs = {}
+        for entry in entries:
+            if not os.path.exists(entry['path']):
+                stats['skipped'] += 1
+                continue
+            target = self.path_for(entry)
+            if target in jobs:
+                stats['skipped'] += 1
+                continue
+            if os.path.exists(target):
+                # Reused by this run's reports, so it must not be the first to be evicted
+                self.cache.add(target)
+                stats['skipped'] += 1
+                continue
+            jobs[target] = (entry['path'], target, self.width)
+
+        if len(jobs) == 1:
+            results = [_thumbnail_job(next(iter(jobs.values())))]
+        elif jobs:
+            with ProcessPoolExecutor(max_workers=self.max_workers) as pool:
+                results = list(pool.map(_thumbnail_job, jobs.values(), chunksize=4))
+        else:
+            results = []
+
+        for target, error in results:
+            if error:
+                stats['failed'] += 1
+                logger.warning(f"Could not create thumbnail {target}: {error}")
+            else:
+                stats['generated'] += 1
+                self.cache.add(target)
+        self.cache.flush()
+        stats['ms'] = round((time.perf_counter() - start) * 1000, 1)
+        logger.info(f"Thumbnails: {stats['generated']} generated, {stats['skipped']} skipped, "
+                    f"{stats['failed']} failed in {stats['ms']} ms")
+        return stats
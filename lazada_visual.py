@@ -0,0 +1,330 @@
+import io
+import json
+import logging
+import os
+import time
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+try:
+    from PIL import Image
+except ImportError:
+    Image = None
+
+logger = logging.getLogger()
+
+BASELINE_DIR = os.path.join('test_data', 'baselines')
+DIFF_DIR = os.path.join('reports', 'visual')
+MASKS_PATH = os.path.join(BASELINE_DIR, 'masks.json')
+
+# Screenshot steps compared against an approved baseline
+VISUAL_PAGES = ("homepage", "search_results", "product_page")
+
+VISUAL_MODES = ("off", "report", "assert", "update")
+
+# Regions that change on every load; overridden per page by test_data/baselines/masks.json.
+# "selectors" are resolved to document rectangles at capture time, "rects" are [x, y, width, height].
+DEFAULT_MASKS = {
+    "homepage": {"selectors": [".lzd-home-page-banner", ".card-jfy-wrapper", ".card-flash-sale",
+                               "#hp-flash-sale", "#hp-just-for-you"], "rects": []},
+    "search_results": {"selectors": ["[data-qa-locator='general-products']", ".banner-container"], "rects": []},
+    "product_page": {"selectors": ["#module_recommendation", "#module_product_review", ".pdp-block__main-information img"],
+                     "rects": []}
+}
+
+# Returns the document-space rectangles of every element matching the given selectors
+MASK_RECTS_SCRIPT = """
+    (selectors) => {
+        const rects = [];
+        for (const selector of selectors) {
+            for (const el of document.querySelectorAll(selector)) {
+                const r = el.getBoundingClientRect();
+                if (r.width && r.height) {
+                    rects.push([Math.floor(r.left + window.scrollX), Math.floor(r.top + window.scrollY),
+                                Math.ceil(r.width), Math.ceil(r.height)]);
+                }
+            }
+        }
+        return rects;
+    }
+"""
+
+
+def load_masks(path=MASKS_PATH):
+    masks = {page: dict(spec) for page, spec in DEFAULT_MASKS.items()}
+    if os.path.exists(path):
+        try:
+            with open(path, "r", encoding="utf-8") as file:
+                masks.update(json.load(file))
+        except Exception as e:
+            logger.warning(f"Could not load visual masks {path}: {str(e)}")
+    return masks
+
+
+def decode(data):
+    """Decode image bytes to an RGB uint8 array of shape (height, width, 3)"""
+    return np.asarray(Image.open(io.BytesIO(data)).convert("RGB"))
+
+
+def diff_arrays(baseline, current, rects=(), threshold=24):
+    """
+    Compare two RGB arrays and return a boolean (height, width) array of
+    changed pixels, sized like `current`.
+
+    A pixel differs when any channel moves by more than `threshold`. Pixels
+    inside the ignore rectangles never differ; pixels outside the area the
+    two images share always do.
+    """
+    height = min(baseline.shape[0], current.shape[0])
+    width = min(baseline.shape[1], current.shape[1])
+    a = baseline[:height, :width]
+    b = current[:height, :width]
+
+    # |a - b| on uint8 without widening: max - min never wraps. Thresholding
+    # each channel and OR-ing the slices is several times faster than max(axis=2).
+    delta = np.maximum(a, b)
+    delta -= np.minimum(a, b)
+    over = delta > threshold
+    changed = np.ones(current.shape[:2], dtype=bool)
+    changed[:height, :width] = over[..., 0] | over[..., 1] | over[..., 2]
+
+    for x, y, w, h in rects:
+        changed[max(y, 0):max(y + h, 0), max(x, 0):max(x + w, 0)] = False
+    return changed
+
+
+def render_diff(current, changed, rects=()):
+    """Dim the current image, paint changed pixels red and ignored regions grey"""
+    output = (current >> 2) + 160
+    for x, y, w, h in rects:
+        output[max(y, 0):max(y + h, 0), max(x, 0):max(x + w, 0)] = 96
+    output[changed] = (255, 0, 0)
+    return output
+
+
+class VisualRegression:
+    """
+    Compare page screenshots against approved baselines.
+
+    Baselines are only written in "update" mode; other modes report a page
+    without one as 'no baseline' instead of silently approving whatever was
+    captured first. Captures are diffed with NumPy array ops after masking
+    rotating banners and carousels. A page fails when more than `tolerance`
+    (fraction of pixels) changed, and a diff image is written next to the
+    HTML report.
+    """
+
+    def __init__(self, mode="off", threshold=24, tolerance=0.005,
+                 baseline_dir=BASELINE_DIR, diff_dir=DIFF_DIR, masks_path=MASKS_PATH):
+        if mode != "off" and (np is None or Image is None):
+            logger.warning("NumPy and Pillow are required for visual regression, disabling it")
+            mode = "off"
+        self.mode = mode
+        self.threshold = threshold
+        self.tolerance = tolerance
+        self.baseline_dir = baseline_dir
+        self.diff_dir = diff_dir
+        self.masks = load_masks(masks_path)
+        self.results = []
+
+    @property
+    def enabled(self):
+        return self.mode != "off"
+
+    def baseline_path(self, page_name):
+        return os.path.join(self.baseline_dir, f"{page_name}.png")
+
+    async def mask_rects(self, page, page_name):
+        """Resolve the page's ignore selectors to rectangles and add its fixed rects"""
+        spec = self.masks.get(page_name, {})
+        rects = [list(rect) for rect in spec.get("rects", [])]
+        if spec.get("selectors"):
+            try:
+                rects.extend(await page.evaluate(MASK_RECTS_SCRIPT, spec["selectors"]))
+            except Exception as e:
+                logger.warning(f"Could not resolve visual masks for {page_name}: {str(e)}")
+        return rects
+
+    def check(self, page_name, data, rects=(), test=None, run_id=None):
+        """Diff PNG bytes against the page baseline and return the result dict"""
+        start = time.perf_counter()
+        baseline_path = self.baseline_path(page_name)
+        result = {'page': page_name, 'test': test, 'status': 'pass', 'diff_ratio': 0.0,
+                  'diff_pixels': 0, 'size_changed': False, 'diff_path': None}
+
+        if self.mode == "update":
+            os.makedirs(self.baseline_dir, exist_ok=True)
+            with open(baseline_path, "wb") as file:
+                file.write(data)
+            result['status'] = 'updated'
+        elif not os.path.exists(baseline_path):
+            logger.warning(f"No visual baseline for {page_name}, run with VISUAL_REGRESSION=update to create it")
+            result['status'] = 'no baseline'
+        else:
+            current = decode(data)
+            with open(baseline_path, "rb") as file:
+                baseline = decode(file.read())
+            diff_start = time.perf_counter()
+            changed = diff_arrays(baseline, current, rects, self.threshold)
+            diff_pixels = int(np.count_nonzero(changed))
+            result['diff_ms'] = round((time.perf_counter() - diff_start) * 1000, 1)
+            result['diff_pixels'] = diff_pixels
+            result['diff_ratio'] = round(diff_pixels / changed.size, 5)
+            result['size_changed'] = baseline.shape != current.shape
+            if result['diff_ratio'] > self.tolerance:
+                result['status'] = 'fail'
+                os.makedirs(self.diff_dir, exist_ok=True)
+                diff_path = os.path.join(self.diff_dir, f"{page_name}_{run_id or 'latest'}_diff.png")
+                Image.fromarray(render_diff(current, changed, rects)).save(diff_path, compress_level=1)
+                result['diff_path'] = diff_path
+
+        result['ms'] = round((time.perf_counter() - start) * 1000, 1)
+        self.results.append(result)
+        logger.info(f"Visual check {page_name}: {result['status']} "
+                    f"({result['diff_ratio'] * 100:.2f}% changed, {result['ms']} ms)")
+        return result
+
+    def results_for(self, test):
+        return [result for result in self.results if result['test'] == test]
+
+    def failures(self, test):
+        return [result for result in self.results_for(test) if result['status'] == 'fail']
+
+
+PHASH_INDEX_PATH = os.path.join('screenshots', 'phash.jsonl')
+
+
+def dhash(source, hash_size=8):
+    """
+    Difference hash of an image path or bytes as a 64-bit int.
+
+    The image is reduced to (hash_size + 1) x hash_size greyscale and each
+    bit records whether a pixel is brighter than its right neighbour, so
+    re-encodes and small rendering noise keep the hash within a few bits.
+    """
+    with Image.open(source if isinstance(source, str) else io.BytesIO(source)) as image:
+        # JPEG decodes at reduced scale directly; other formats are shrunk by integer reduce first
+        image.draft("L", (hash_size * 16, hash_size * 16))
+        image = image.convert("L")
+    factor = min(image.size[0] // (hash_size * 16), image.size[1] // (hash_size * 16))
+    if factor > 1:
+        image = image.reduce(factor)
+    pixels = image.resize((hash_size + 1, hash_size), Image.BILINEAR).tobytes()
+    value = 0
+    for row in range(hash_size):
+        offset = row * (hash_size + 1)
+        for col in range(hash_size):
+            value = (value << 1) | (pixels[offset + col] > pixels[offset + col + 1])
+    return value
+
+
+def hamming(a, b):
+    return bin(a ^ b).count("1")
+
+
+class BKTree:
+    """Burkhard-Keller tree over Hamming distance; items with equal hashes share a node"""
+
+    def __init__(self):
+        self.root = None
+        self.size = 0
+
+    def add(self, value, item):
+        self.size += 1
+        if self.root is None:
+            self.root = (value, [item], {})
+            return
+        node = self.root
+        while True:
+            distance = hamming(value, node[0])
+            if distance == 0:
+                node[1].append(item)
+                return
+            child = node[2].get(distance)
+            if child is None:
+                node[2][distance] = (value, [item], {})
+                return
+            node = child
+
+    def search(self, value, max_distance):
+        """Return [(distance, item)] for every item within max_distance bits"""
+        found = []
+        stack = [self.root] if self.root else []
+        while stack:
+            node = stack.pop()
+            distance = hamming(value, node[0])
+            if distance <= max_distance:
+                found.extend((distance, item) for item in node[1])
+            # Triangle inequality: only children in [d - max, d + max] can match
+            for child_distance, child in node[2].items():
+                if distance - max_distance <= child_distance <= distance + max_distance:
+                    stack.append(child)
+        return found
+
+
+class PerceptualIndex:
+    """
+    Perceptual-hash index over the screenshot store.
+
+    Every stored object gets a dHash recorded in `phash.jsonl`, keyed by its
+    content hash, so `update()` only hashes objects it has not seen. Queries
+    walk a BK-tree and map matching objects back to their manifest entries.
+    """
+
+    def __init__(self, store, path=PHASH_INDEX_PATH):
+        self.store = store
+        self.path = path
+        self.hashes = {}
+        self.tree = BKTree()
+        if os.path.exists(path):
+            with open(path, "r", encoding="utf-8") as file:
+                for line in file:
+                    try:
+                        record = json.loads(line)
+                    except ValueError:
+                        continue
+                    self._add(record['hash'], record['phash'])
+
+    def _add(self, digest, phash):
+        if digest not in self.hashes:
+            self.hashes[digest] = phash
+            self.tree.add(phash, digest)
+
+    def update(self):
+        """Hash objects added to the store since the last update, return how many were hashed"""
+        start = time.perf_counter()
+        added = []
+        for entry in self.store.entries():
+            if entry['hash'] in self.hashes or not os.path.exists(entry['path']):
+                continue
+            try:
+                phash = dhash(entry['path'])
+            except Exception as e:
+                logger.warning(f"Could not hash {entry['path']}: {str(e)}")
+                continue
+            self._add(entry['hash'], phash)
+            added.append({'hash': entry['hash'], 'phash': phash})
+        if added:
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+            with open(self.path, "a", encoding="utf-8") as file:
+                for record in added:
+                    file.write(json.dumps(record) + "\n")
+        logger.info(f"Perceptual index: hashed {len(added)} new screenshots, "
+                    f"{len(self.hashes)} indexed ({(time.perf_counter() - start) * 1000:.0f} ms)")
+        return len(added)
+
+    def query(self, source, max_distance=10, limit=20):
+        """
+        Find stored screenshots that look like `source` (path or bytes).
+        Returns [{'distance', 'entry'}], closest first and newest first within a distance.
+        """
+        phash = dhash(source)
+        matches = []
+        for distance, digest in self.tree.search(phash, max_distance):
+            for entry in self.store.by_hash(digest):
+                matches.append({'distance': distance, 'entry': entry})
+        matches.sort(key=lambda match: (match['distance'], -match['entry']['timestamp']))
+        return matches[:limit]
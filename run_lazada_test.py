@@ -6,6 +6,7 @@ import argparse
 import time
 import io
 import traceback
+from datetime import datetime
 
 # Thiết lập môi trường Unicode cho Windows
 if sys.platform == 'win32':
@@ -28,7 +29,6 @@ def install_dependencies():
         # Kiểm tra các thư viện quan trọng
         import pytest
         import pytest_asyncio
-        import pytest_html
         import playwright
         import tkinter
         import pandas as pd
@@ -45,8 +45,7 @@ def install_dependencies():
             subprocess.call([
     sys.executable, "-m", "pytest", 
     "lazada_test.py::TestLazada", "-v",  # Chỉ định class TestLazada
-    "--html=reports/lazada_test_report.html",
-    "--self-contained-html"
+    "-p", "lazada_events"
             ])
             
             # Cài đặt Playwright browsers
@@ -174,9 +173,7 @@ def run_command_line():
         # Chạy tất cả
         subprocess.call([
             sys.executable, "-m", "pytest", 
-            "lazada_test.py", "-v", 
-            "--html=reports/lazada_test_report.html",
-            "--self-contained-html"
+            "lazada_test.py", "-v", "-p", "lazada_events"
         ])
         
     elif choice == "2":
@@ -218,9 +215,7 @@ def run_command_line():
         subprocess.call([
             sys.executable, "-m", "pytest", 
             "lazada_test.py::TestLazada::" + test_ids[0],  # Cần ít nhất một test cụ thể
-            "-v", "-k", test_expr,
-            "--html=reports/lazada_test_report.html",
-            "--self-contained-html"
+            "-v", "-k", test_expr, "-p", "lazada_events"
         ])
         
     elif choice == "3":
@@ -230,15 +225,127 @@ def run_command_line():
     else:
         print("Lựa chọn không hợp lệ.")
         
-    print("\nKiểm thử hoàn tất. Báo cáo được lưu trong reports/lazada_test_report.html")
+    session_report = finalize_session_report()
+    print(f"\nKiểm thử hoàn tất. Báo cáo phiên: {session_report}")
     print("Ảnh chụp màn hình được lưu trong thư mục screenshots\n")
     
     # Hỏi người dùng có muốn mở báo cáo không
-    if os.path.exists("reports/lazada_test_report.html"):
+    if os.path.exists(session_report):
         view_report = input("Bạn có muốn mở báo cáo HTML không? (y/n): ")
         if view_report.lower() == 'y':
-            import webbrowser
-            webbrowser.open("file://" + os.path.join(os.getcwd(), "reports/lazada_test_report.html"))
+            from lazada_server import ReportServer
+            server = ReportServer()
+            print(f"Đang mở: {server.open(session_report)}")
+            input("Nhấn Enter để dừng máy chủ báo cáo...")
+            server.stop()
+
+def print_event_summary(run_id):
+    """In tổng kết kết quả từ luồng sự kiện JSONL của phiên và đường dẫn JUnit XML"""
+    from lazada_events import events_path, junit_path, read_events, summarize_events
+    summary = summarize_events(read_events(events_path(run_id)))
+    if not summary['total']:
+        return
+    print(f"\nKết quả: {summary['passed']} đạt, {summary['failed']} lỗi, {summary['skipped']} bỏ qua / {summary['total']} test")
+    for nodeid, event in summary['tests'].items():
+        if event['outcome'] == 'failed':
+            print(f"  LỖI {nodeid.split('::')[-1]}: {event.get('message') or ''}")
+    print(f"Sự kiện: {events_path(run_id)}")
+    print(f"JUnit XML: {junit_path(run_id)}")
+
+def apply_retention(store):
+    """Áp dụng chính sách lưu trữ (cùng cấu hình với GUI nếu có test_data/config.json) và in dung lượng giải phóng"""
+    import json
+    from lazada_retention import RetentionEngine, RetentionPolicy
+    try:
+        with open(os.path.join("test_data", "config.json"), "r", encoding="utf-8") as file:
+            config = json.load(file)
+    except (OSError, ValueError):
+        config = {}
+    try:
+        policy = RetentionPolicy.from_config(config)
+    except ValueError as e:
+        print(f"Cấu hình lưu trữ không hợp lệ: {str(e)}")
+        return
+    summary = RetentionEngine(store, policy, reports_dir="reports").run()
+    print(f"Lưu trữ: {len(summary['runs_archived'])} lần chạy, {summary['reports_archived']} file báo cáo, "
+          f"{summary['logs_rotated']} file log; giải phóng {summary['bytes_reclaimed'] / 1024 / 1024:.1f} MB")
+
+def finalize_session_report():
+    """
+    Thêm phần tổng kết vào báo cáo phiên, tạo thumbnail cho lần chạy hiện tại và áp dụng chính sách
+    lưu trữ, trả về đường dẫn báo cáo
+    """
+    from lazada_dashboard import update_dashboard
+    from lazada_events import events_path
+    from lazada_history import RunIndex
+    from lazada_report import SessionReport, publish_thumbnails
+    from lazada_screenshots import ScreenshotStore
+    from lazada_thumbs import ThumbnailGenerator
+    run_id = os.environ.setdefault("TEST_RUN_ID", datetime.now().strftime("%Y%m%d_%H%M%S"))
+    session_report = SessionReport(run_id, "reports")
+    store = ScreenshotStore("screenshots")
+    try:
+        session_report.finalize()
+        print_event_summary(run_id)
+        if os.path.exists(events_path(run_id)):
+            RunIndex().record(run_id)
+            print(f"Dashboard: {update_dashboard(run_id, store)}")
+        publish_thumbnails(store.entries(run_id=run_id), os.path.join("reports", "media"),
+                           ThumbnailGenerator(int(os.environ.get("THUMBNAIL_WIDTH", "480"))))
+    except Exception as e:
+        print(f"Lỗi khi hoàn tất báo cáo phiên: {str(e)}")
+    try:
+        # Sau mỗi phiên (kể cả CLI/CI) dọn dẹp reports/, screenshots/ và log như GUI
+        apply_retention(store)
+    except Exception as e:
+        print(f"Lỗi khi áp dụng chính sách lưu trữ: {str(e)}")
+    return session_report.path
+
+def compare_runs_cli(base_run, head_run, slow_threshold):
+    """So sánh hai lần chạy, in thay đổi trạng thái và bước chậm hơn, ghi báo cáo HTML"""
+    from lazada_history import RunIndex, compare_runs, comparison_report_path, write_comparison_report
+    index = RunIndex()
+    try:
+        comparison = compare_runs(index.load(base_run), index.load(head_run), slow_threshold / 100)
+    except KeyError as e:
+        print(f"Không tìm thấy dữ liệu lần chạy: {str(e)}")
+        return
+    
+    base, head = comparison['base'], comparison['head']
+    print(f"\nSo sánh {base['run_id']} -> {head['run_id']}")
+    print(f"Đạt: {base['passed']} -> {head['passed']}, Lỗi: {base['failed']} -> {head['failed']}, "
+          f"Thời gian: {base['duration']:.2f}s -> {head['duration']:.2f}s")
+    for test in comparison['tests']:
+        if test['change']:
+            print(f"  [{test['change']}] {test['nodeid'].split('::')[-1]}: "
+                  f"{test['base_outcome'] or '-'} -> {test['head_outcome'] or '-'}")
+    if comparison['slow_steps']:
+        print(f"Bước chậm hơn trên {slow_threshold:.0f}%:")
+        for step in comparison['slow_steps']:
+            percent = f"{step['percent']:+.1f}%" if step['percent'] is not None else ""
+            print(f"  {step['nodeid'].split('::')[-1]} / {step['step']}: "
+                  f"{step['base_duration']:.2f}s -> {step['head_duration']:.2f}s ({step['delta']:+.2f}s {percent})")
+    path = write_comparison_report(comparison, comparison_report_path(base['run_id'], head['run_id']))
+    print(f"Báo cáo so sánh: {path}")
+
+def tracing_overhead_cli():
+    """In trung vị thời gian chạy từng test (đạt) khi bật tracing so với khi tắt"""
+    from lazada_history import tracing_overhead
+    rows = tracing_overhead()
+    if not rows:
+        print("Chưa có dữ liệu trong reports/tracing.jsonl. Hãy chạy kiểm thử trước.")
+        return
+    def ms(value, runs):
+        return "-" if value is None else f"{value:.0f} ms x{runs}"
+    print(f"{'Test':<40}{'Có tracing':>16}{'Không tracing':>16}{'Chênh lệch':>14}")
+    for row in rows:
+        delta = "" if row['delta_ms'] is None else f"{row['delta_ms']:+.0f} ms"
+        if row['percent'] is not None:
+            delta += f" ({row['percent']:+.1f}%)"
+        print(f"{row['test'][:39]:<40}{ms(row['traced_ms'], row['traced_runs']):>16}"
+              f"{ms(row['untraced_ms'], row['untraced_runs']):>16}  {delta}")
+    if not any(row['untraced_ms'] is not None for row in rows):
+        print("Chưa có lần chạy mốc: chạy thêm với --tracing off để so sánh.")
 
 def parse_arguments():
     """Phân tích các tham số dòng lệnh"""
@@ -247,19 +354,82 @@ def parse_arguments():
     parser.add_argument('--gui', action='store_true', help='Chạy với giao diện đồ họa')
     parser.add_argument('--headless', action='store_true', help='Chạy ẩn trình duyệt')
     parser.add_argument('--test', type=str, help='Chạy một test cụ thể (ví dụ: test_01_homepage_load)')
+    parser.add_argument('--cart-mock', action='store_true', help='Giả lập API giỏ hàng thay vì gọi backend thật')
+    parser.add_argument('--tracing', choices=['off', 'on-failure', 'always'],
+                        help='Ghi Playwright trace (mặc định: chỉ lưu khi test lỗi)')
+    parser.add_argument('--archive-report', action='store_true',
+                        help='Đóng gói báo cáo HTML cùng ảnh thành file zip để chia sẻ')
+    parser.add_argument('--visual', choices=['off', 'report', 'assert', 'update'],
+                        help='So sánh giao diện với ảnh chuẩn (mặc định: off; update: ghi lại ảnh chuẩn)')
+    parser.add_argument('--compare', nargs=2, metavar=('RUN_CU', 'RUN_MOI'),
+                        help='So sánh hai lần chạy theo mã lần chạy (TEST_RUN_ID)')
+    parser.add_argument('--slow-threshold', type=float, default=20,
+                        help='Ngưỡng %% tăng thời gian để đánh dấu bước chậm khi so sánh (mặc định: 20)')
+    parser.add_argument('--list-runs', action='store_true', help='Liệt kê các lần chạy đã lưu')
+    parser.add_argument('--tracing-overhead', action='store_true',
+                        help='So sánh thời gian test khi bật và tắt tracing (chạy thêm với --tracing off làm mốc)')
+    parser.add_argument('--serve', nargs='?', type=int, const=0, metavar='PORT',
+                        help='Chạy máy chủ báo cáo cục bộ (127.0.0.1) cho reports/ và screenshots/')
     
     args = parser.parse_args()
     
+    # Mã phiên chạy dùng chung cho mọi tiến trình pytest của lần chạy này
+    os.environ.setdefault("TEST_RUN_ID", datetime.now().strftime("%Y%m%d_%H%M%S"))
+    
+    if args.cart_mock:
+        os.environ["CART_MODE"] = "mock"
+    if args.visual:
+        os.environ["VISUAL_REGRESSION"] = args.visual
+    if args.tracing:
+        os.environ["TRACING"] = args.tracing
+    
+    # Nếu có tham số --archive-report, đóng gói báo cáo hiện có
+    if args.archive_report:
+        from lazada_report import archive_report, latest_session_report, session_report_path
+        report_path = session_report_path(os.environ["TEST_RUN_ID"])
+        if not os.path.exists(report_path):
+            report_path = latest_session_report()
+        if report_path:
+            print(f"Đã đóng gói báo cáo: {archive_report(report_path)}")
+        else:
+            print("Chưa có báo cáo HTML. Hãy chạy kiểm thử trước.")
+        return True
+    
+    # Máy chủ báo cáo: phục vụ reports/ và screenshots/ đến khi nhấn Ctrl+C
+    if args.serve is not None:
+        from lazada_report import latest_session_report
+        from lazada_server import ReportServer
+        server = ReportServer(port=args.serve or None).start()
+        print(f"Máy chủ báo cáo đang chạy tại 127.0.0.1:{server.port} (Ctrl+C để dừng)")
+        for path in ("reports/dashboard.html", latest_session_report()):
+            if path and os.path.exists(path):
+                print(f"  {server.url_for(path)}")
+        server.serve_forever()
+        return True
+    
+    # So sánh hai lần chạy hoặc liệt kê các lần chạy đã lưu
+    if args.compare:
+        compare_runs_cli(args.compare[0], args.compare[1], args.slow_threshold)
+        return True
+    if args.tracing_overhead:
+        tracing_overhead_cli()
+        return True
+    if args.list_runs:
+        from lazada_history import RunIndex
+        for record in RunIndex().runs():
+            print(f"{record['run_id']}  {record['passed']}/{record['total']} đạt, "
+                  f"{record['failed']} lỗi, {record['duration']:.1f}s")
+        return True
+    
     # Nếu có tham số --test, chạy test đó
     if args.test:
         os.environ["HEADLESS"] = "True" if args.headless else "False"
         subprocess.call([
             sys.executable, "-m", "pytest", 
             f"lazada_test.py::TestLazada::{args.test}", 
-            "-v", 
-            "--html=reports/lazada_test_report.html",
-            "--self-contained-html"
+            "-v", "-p", "lazada_events"
         ])
+        print(f"Báo cáo phiên: {finalize_session_report()}")
         return True
         
     # Nếu có tham số --cli, chạy chế độ dòng lệnh
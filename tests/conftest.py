@@ -0,0 +1,5 @@
+import os
+import sys
+
+# The modules under test live at the repository root, next to lazada_test.py
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
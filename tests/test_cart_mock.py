@@ -0,0 +1,34 @@
+import pytest
+
+from lazada_cart_mock import CART_ENDPOINTS, CartMock
+
+
+@pytest.mark.parametrize("url, endpoint", [
+    ("https://acs-m.lazada.vn/h5/mtop.lazada.carts.ultron.add/1.0/?jsv=2.6.1&appKey=1", 'add'),
+    ("https://acs-m.lazada.vn/h5/mtop.lazada.trade.cart.add/1.0/", 'add'),
+    ("https://cart.lazada.vn/cart/api/add?itemId=1", 'add'),
+    ("https://acs-m.lazada.vn/h5/mtop.lazada.carts.ultron.cartlist/1.0/?jsv=2.6.1", 'list'),
+    ("https://acs-m.lazada.vn/h5/mtop.lazada.carts.ultron.count/1.0/", 'list'),
+    ("https://cart.lazada.vn/cart/api/count", 'list'),
+])
+def test_endpoints_match_versioned_urls(url, endpoint):
+    assert [name for name, pattern in CART_ENDPOINTS.items() if pattern.search(url)] == [endpoint]
+
+
+@pytest.mark.parametrize("url", [
+    "https://acs-m.lazada.vn/h5/mtop.lazada.carts.ultron.addons/1.0/",
+    "https://www.lazada.vn/cart/",
+    "https://www.lazada.vn/catalog/?q=cart/api/add",
+])
+def test_endpoints_ignore_other_urls(url):
+    assert not any(pattern.search(url) for pattern in CART_ENDPOINTS.values())
+
+
+def test_verify_requires_expected_calls(tmp_path):
+    mock = CartMock(latency_ms=0, fixtures_dir=str(tmp_path))
+    mock.verify()
+    mock.expect('add')
+    with pytest.raises(AssertionError, match="add"):
+        mock.verify()
+    mock.calls['add'] += 1
+    mock.verify()
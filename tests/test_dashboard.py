@@ -0,0 +1,65 @@
+from datetime import datetime
+
+from lazada_dashboard import DashboardAggregates, percentile
+
+
+def run(run_id, day, durations, failed=(), skipped=()):
+    """RunIndex-style summary; durations maps test name -> seconds"""
+    tests = {}
+    for name, duration in durations.items():
+        outcome = 'failed' if name in failed else 'skipped' if name in skipped else 'passed'
+        tests[f"t.py::{name}"] = {'outcome': outcome, 'duration': duration, 'steps': {}}
+    outcomes = [test['outcome'] for test in tests.values()]
+    return {'run_id': run_id, 'timestamp': datetime(*day, 12).timestamp(), 'total': len(tests),
+            'passed': outcomes.count('passed'), 'failed': outcomes.count('failed'),
+            'skipped': outcomes.count('skipped'), 'duration': sum(durations.values()), 'tests': tests}
+
+
+def test_percentile_is_nearest_rank():
+    values = list(range(1, 21))
+    assert percentile(values, 0.5) == 10
+    assert percentile(values, 0.95) == 19
+    assert percentile([4.0], 0.95) == 4.0
+    assert percentile([], 0.5) == 0.0
+
+
+def test_add_run_folds_into_its_day_and_iso_week(tmp_path):
+    aggregates = DashboardAggregates(str(tmp_path / "aggregates.json"))
+    # 2026-01-05 is a Monday and 2026-01-11 the Sunday of the same ISO week
+    assert aggregates.add_run(run("r1", (2026, 1, 5), {'test_a': 2.0, 'test_b': 1.0}, failed={'test_b'}), 1024)
+    assert aggregates.add_run(run("r2", (2026, 1, 11), {'test_a': 4.0, 'test_b': 9.0}, skipped={'test_b'}), 2048)
+    assert not aggregates.add_run(run("r1", (2026, 1, 5), {'test_a': 2.0}))
+
+    assert sorted(aggregates.data['daily']) == ["2026-01-05", "2026-01-11"]
+    week = aggregates.data['weekly']["2026-W02"]
+    assert week['run_ids'] == ["r1", "r2"]
+    assert (week['tests_total'], week['passed'], week['failed'], week['skipped']) == (4, 2, 1, 1)
+    # Skipped tests count neither way
+    assert week['pass_rate'] == 66.7
+    assert week['artifact_bytes'] == 3072
+
+    test_a, test_b = week['tests']['t.py::test_a'], week['tests']['t.py::test_b']
+    assert (test_a['durations'], test_a['median'], test_a['p95']) == ([2.0, 4.0], 2.0, 4.0)
+    assert (test_b['runs'], test_b['failures'], test_b['durations']) == (2, 1, [1.0])
+
+
+def test_aggregates_round_trip_and_render(tmp_path):
+    path = str(tmp_path / "test_data" / "aggregates.json")
+    aggregates = DashboardAggregates(path)
+    assert aggregates.empty
+    aggregates.add_run(run("r1", (2026, 1, 5), {'test_<a>': 3.0}))
+    aggregates.save()
+
+    loaded = DashboardAggregates(path)
+    assert not loaded.empty and loaded.data == aggregates.data
+    dashboard = loaded.write_html(str(tmp_path / "reports" / "dashboard.html"))
+    with open(dashboard, encoding="utf-8") as file:
+        text = file.read()
+    assert "<td>2026-01-05</td>" in text and "2026-W02" in text
+    assert "test_&lt;a&gt;" in text and "100.0%" in text
+
+
+def test_unreadable_aggregates_start_empty(tmp_path):
+    path = tmp_path / "aggregates.json"
+    path.write_text("{not json")
+    assert DashboardAggregates(str(path)).empty
@@ -0,0 +1,86 @@
+import os
+import subprocess
+import sys
+import xml.etree.ElementTree as ET
+
+import pytest
+
+from lazada_events import events_path, junit_path, read_events, summarize_events
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+SAMPLE_TESTS = '''
+import pytest
+
+@pytest.fixture
+def broken_teardown():
+    yield
+    raise RuntimeError("teardown broke")
+
+@pytest.fixture
+def broken_setup():
+    raise RuntimeError("setup broke")
+
+def test_pass():
+    pass
+
+def test_fail():
+    assert 1 == 2
+
+def test_teardown_error(broken_teardown):
+    pass
+
+def test_setup_error(broken_setup):
+    pass
+
+def test_skip():
+    pytest.skip("not today")
+'''
+
+
+@pytest.fixture(scope="module")
+def session(tmp_path_factory):
+    workdir = tmp_path_factory.mktemp("session")
+    (workdir / "test_sample.py").write_text(SAMPLE_TESTS, encoding="utf-8")
+    env = dict(os.environ, TEST_RUN_ID="r1", PYTHONPATH=ROOT)
+    subprocess.run([sys.executable, "-m", "pytest", "-q", "-p", "lazada_events", "-p", "no:cacheprovider",
+                    "test_sample.py"], cwd=workdir, env=env, capture_output=True)
+    return workdir
+
+
+def ended(session, name):
+    events = read_events(str(session / events_path("r1")))
+    return [event for event in events if event['type'] == 'test_end' and event['nodeid'].endswith(name)]
+
+
+def test_session_start_and_one_test_end_per_test(session):
+    events = read_events(str(session / events_path("r1")))
+    assert events[0]['type'] == 'session_start'
+    summary = summarize_events(events)
+    assert (summary['total'], summary['passed'], summary['failed'], summary['skipped']) == (5, 1, 3, 1)
+    assert len([event for event in events if event['type'] == 'test_end']) == 5
+
+
+def test_failing_teardown_overrides_passing_call(session):
+    [event] = ended(session, "test_teardown_error")
+    assert (event['outcome'], event['when']) == ('failed', 'teardown')
+    assert "teardown broke" in event['message']
+    assert set(event['phases']) == {'setup', 'call', 'teardown'}
+
+
+def test_junit_maps_fixture_failures_to_errors(session):
+    suite = ET.parse(str(session / junit_path("r1"))).getroot()
+    assert (suite.get('failures'), suite.get('errors'), suite.get('skipped')) == ('1', '2', '1')
+    cases = {case.get('name'): case for case in suite}
+    assert cases['test_fail'].find('failure') is not None
+    assert cases['test_setup_error'].find('error') is not None
+    assert cases['test_teardown_error'].find('error') is not None
+    assert cases['test_teardown_error'].find('failure') is None
+
+
+def test_session_report_is_built_from_events(session):
+    with open(session / "reports" / "session_r1.html", encoding="utf-8") as file:
+        content = file.read()
+    assert content.count('<section class="test ') == 5
+    assert 'class="test failed" data-outcome="failed"' in content
+    assert "teardown broke" in content
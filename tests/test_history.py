@@ -0,0 +1,118 @@
+import json
+
+from lazada_history import (RunIndex, compare_runs, comparison_report_path, summarize_run, tracing_overhead,
+                            write_comparison_report)
+
+
+def write_lines(path, records):
+    with open(path, "w", encoding="utf-8") as file:
+        for record in records:
+            file.write(json.dumps(record) + "\n")
+
+
+def test_tracing_overhead_compares_medians_against_untraced_runs(tmp_path):
+    path = tmp_path / "tracing.jsonl"
+    write_lines(path, [
+        {'test': 'test_a', 'tracing': 'on-failure', 'outcome': 'passed', 'call_ms': 1200.0, 'start_ms': 40.0},
+        {'test': 'test_a', 'tracing': 'always', 'outcome': 'passed', 'call_ms': 1400.0, 'start_ms': 45.0},
+        {'test': 'test_a', 'tracing': 'on-failure', 'outcome': 'failed', 'call_ms': 9000.0},
+        {'test': 'test_a', 'tracing': 'off', 'outcome': 'passed', 'call_ms': 1000.0},
+        {'test': 'test_b', 'tracing': 'off', 'outcome': 'passed', 'call_ms': 500.0},
+    ])
+    with open(path, "a", encoding="utf-8") as file:
+        file.write("not json\n")
+
+    test_a, test_b = tracing_overhead(str(path))
+
+    assert test_a == {'test': 'test_a', 'traced_ms': 1300.0, 'untraced_ms': 1000.0, 'traced_runs': 2,
+                      'untraced_runs': 1, 'delta_ms': 300.0, 'percent': 30.0}
+    assert test_b['traced_ms'] is None and test_b['delta_ms'] is None
+
+
+def test_tracing_overhead_without_log(tmp_path):
+    assert tracing_overhead(str(tmp_path / "missing.jsonl")) == []
+
+
+def test_run_index_recent_reads_only_the_newest_lines(tmp_path):
+    index = RunIndex(runs_dir=str(tmp_path))
+    write_lines(index.index_path, [{'run_id': f"r{number}", 'timestamp': 1000 + number} for number in range(10)])
+
+    assert [record['run_id'] for record in index.recent(3)] == ["r9", "r8", "r7"]
+    assert RunIndex(runs_dir=str(tmp_path / "missing")).recent(3) == []
+
+
+def test_run_index_iter_recent_streams_every_run_across_blocks(tmp_path):
+    index = RunIndex(runs_dir=str(tmp_path))
+    # Padded records so the index spans several 64 KB blocks; r5 is listed twice
+    write_lines(index.index_path, [{'run_id': f"r{number}", 'timestamp': 1000 + number, 'pad': "x" * 500}
+                                   for number in range(400)] + [{'run_id': "r5", 'timestamp': 1005}])
+
+    records = index.iter_recent()
+
+    assert next(records)['run_id'] == "r5"
+    assert [record['run_id'] for record in records] == [f"r{number}" for number in range(399, -1, -1) if number != 5]
+
+
+def events_for(run_start, tests):
+    """Event stream of a run: tests maps nodeid -> (outcome, [(step, offset)], end offset)"""
+    events = [{'type': 'session_start', 'ts': run_start}]
+    for nodeid, (outcome, steps, end) in tests.items():
+        events.extend({'type': 'step', 'nodeid': nodeid, 'step': step, 'ts': run_start + offset}
+                      for step, offset in steps)
+        events.append({'type': 'test_end', 'nodeid': nodeid, 'outcome': outcome, 'duration': end,
+                       'ts': run_start + end, 'message': "boom" if outcome == 'failed' else None})
+    return events
+
+
+def test_summarize_run_times_steps_until_the_next_step_or_test_end():
+    summary = summarize_run("r1", events_for(1000.0, {
+        't.py::test_a': ('passed', [("home", 0.0), ("search", 2.0), ("home", 2.5)], 4.0),
+        't.py::test_b': ('failed', [], 1.0),
+        't.py::test_c': ('skipped', [], 0.0),
+    }) + [{'type': 'step', 'nodeid': 't.py::never_ended', 'step': "x", 'ts': 1000.0}])
+
+    assert summary['timestamp'] == 1000.0
+    assert (summary['total'], summary['passed'], summary['failed'], summary['skipped']) == (3, 1, 1, 1)
+    assert summary['duration'] == 5.0
+    assert summary['tests']['t.py::test_a']['steps'] == {'home': 2.0, 'search': 0.5, 'home#2': 1.5}
+    assert summary['tests']['t.py::test_b'] == {'outcome': 'failed', 'duration': 1.0, 'message': "boom", 'steps': {}}
+
+
+def test_compare_runs_flags_status_changes_and_newly_slow_steps():
+    base = summarize_run("r1", events_for(1000.0, {
+        't.py::test_a': ('passed', [("home", 0.0), ("search", 2.0)], 3.0),
+        't.py::test_b': ('failed', [], 1.0),
+        't.py::test_c': ('passed', [], 1.0),
+        't.py::test_gone': ('passed', [], 1.0),
+    }))
+    head = summarize_run("r2", events_for(2000.0, {
+        't.py::test_a': ('passed', [("home", 0.0), ("search", 2.2), ("cart", 5.0)], 6.0),
+        't.py::test_b': ('passed', [], 1.0),
+        't.py::test_c': ('failed', [], 1.0),
+        't.py::test_new': ('passed', [], 1.0),
+    }))
+
+    comparison = compare_runs(base, head, slow_threshold=0.2, min_delta=0.5)
+
+    changes = {test['nodeid']: test['change'] for test in comparison['tests']}
+    assert changes == {'t.py::test_a': '', 't.py::test_b': 'fixed', 't.py::test_c': 'new failure',
+                       't.py::test_gone': 'removed', 't.py::test_new': 'added'}
+    assert [test['nodeid'] for test in comparison['new_failures']] == ['t.py::test_c']
+    assert [test['nodeid'] for test in comparison['fixed']] == ['t.py::test_b']
+    test_a = next(test for test in comparison['tests'] if test['nodeid'] == 't.py::test_a')
+    assert (test_a['delta'], test_a['percent']) == (3.0, 100.0)
+    # home: 2.0 -> 2.2 is under min_delta; search: 1.0 -> 2.8 is slower; cart only exists in head
+    assert [(step['step'], step['delta'], step['percent']) for step in comparison['slow_steps']] == [
+        ("search", 1.8, 180.0)]
+    cart = next(step for step in comparison['steps'] if step['step'] == "cart")
+    assert cart['base_duration'] is None and cart['delta'] is None
+
+
+def test_write_comparison_report(tmp_path):
+    run = summarize_run("r<1>", events_for(1000.0, {'t.py::test_a': ('passed', [("home", 0.0)], 1.0)}))
+    path = write_comparison_report(compare_runs(run, run), comparison_report_path("a", "b", str(tmp_path)))
+
+    with open(path, encoding="utf-8") as file:
+        text = file.read()
+    assert path.endswith("compare_a_b.html")
+    assert "r&lt;1&gt;" in text and "<td>test_a</td>" in text and text.rstrip().endswith("</html>")
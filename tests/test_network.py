@@ -0,0 +1,104 @@
+import asyncio
+
+from lazada_network import LinkChecker, NetworkRecorder
+
+
+class FakeRequest:
+    def __init__(self, url, sizes=None):
+        self.url = url
+        self.resource_type = "script"
+        self.timing = {"responseStart": 5.0, "responseEnd": 9.0}
+        self._sizes = sizes
+
+    async def sizes(self):
+        if self._sizes is None:
+            raise RuntimeError("Target closed")
+        return self._sizes
+
+
+class FakeResponse:
+    def __init__(self, request, headers):
+        self.request = request
+        self.status = 200
+        self.headers = headers
+
+
+def record(recorder, request, headers):
+    recorder._on_request(request)
+    recorder._on_response(FakeResponse(request, headers))
+    recorder._on_finished(request)
+
+
+def test_size_comes_from_transferred_bytes():
+    async def run():
+        recorder = NetworkRecorder()
+        # Chunked response: no Content-Length at all
+        record(recorder, FakeRequest("https://a.test/app.js", {"responseBodySize": 1000, "responseHeadersSize": 200}), {})
+        # Compressed response: the header is what went over the wire, the browser agrees
+        record(recorder, FakeRequest("https://a.test/b.js", {"responseBodySize": 300, "responseHeadersSize": 100}),
+               {"content-length": "300"})
+        await recorder.settle()
+        return recorder
+
+    recorder = asyncio.run(run())
+    assert recorder.size.tolist() == [1200, 400]
+    assert recorder.summary()['total_bytes'] == 1600
+
+
+def test_content_length_is_kept_when_sizes_are_unavailable():
+    async def run():
+        recorder = NetworkRecorder()
+        record(recorder, FakeRequest("https://a.test/closed.js"), {"content-length": "512"})
+        record(recorder, FakeRequest("https://a.test/cached.js", {"responseBodySize": 0, "responseHeadersSize": 0}),
+               {"content-length": "64"})
+        await recorder.settle()
+        return recorder
+
+    assert asyncio.run(run()).size.tolist() == [512, 64]
+
+
+class FakeFetchResponse:
+    def __init__(self, url, status):
+        self.url = url
+        self.status = status
+
+    async def dispose(self):
+        pass
+
+
+class FakeRequestContext:
+    def __init__(self, statuses):
+        self.statuses = statuses
+        self.fetched = []
+
+    async def fetch(self, url, method="GET", timeout=None):
+        self.fetched.append(url)
+        return FakeFetchResponse(url, self.statuses.get(url, 200))
+
+
+def test_links_differing_by_fragment_are_checked_once(tmp_path):
+    context = FakeRequestContext({})
+    checker = LinkChecker(context, cache_path=str(tmp_path / "cache.json"))
+
+    results = asyncio.run(checker.check(["https://a.test/page#top", "https://a.test/page#footer",
+                                         "https://a.test/page", "mailto:x@a.test"]))
+
+    assert [result['url'] for result in results] == ["https://a.test/page"]
+    assert context.fetched == ["https://a.test/page"]
+
+
+def test_failures_are_cached_only_briefly(tmp_path):
+    cache_path = str(tmp_path / "cache.json")
+    urls = ["https://a.test/ok", "https://a.test/down"]
+    asyncio.run(LinkChecker(FakeRequestContext({"https://a.test/down": 503}), cache_path=cache_path).check(urls))
+
+    # Within the failure TTL both come from the cache
+    context = FakeRequestContext({})
+    results = asyncio.run(LinkChecker(context, cache_path=cache_path).check(urls))
+    assert context.fetched == [] and all(result['cached'] for result in results)
+
+    # After it only the failure is checked again
+    context = FakeRequestContext({})
+    results = asyncio.run(LinkChecker(context, failure_ttl=0, cache_path=cache_path).check(urls))
+    assert context.fetched == ["https://a.test/down"]
+    assert [result['status'] for result in results] == [200, 200]
@@ -0,0 +1,159 @@
+import os
+import re
+
+import pytest
+
+from lazada_report import (HISTORY_ROW, OUTCOME_ATTRIBUTE, SCREENSHOT_ITEM, TEST_REPORT_HEAD, TEST_REPORT_SUMMARY,
+                           TEST_RESULT_ROW, ReportAssets, SessionReport, compile_template,
+                           latest_session_report, publish_thumbnails, visual_table_html, write_test_report)
+from lazada_thumbs import ThumbnailCache, ThumbnailGenerator
+
+
+def screenshot(tmp_path, name):
+    path = tmp_path / f"{name}.png"
+    path.write_bytes(b"\x89PNG fake")
+    return {'type': 'screenshot', 'nodeid': 't.py::test_a', 'step': name, 'path': str(path), 'hash': name * 8}
+
+
+def test_blocks_carry_timestamps_for_the_staleness_cutoff(tmp_path):
+    report = SessionReport("r1", str(tmp_path), inline=False)
+    report.append_test("t.py::test_a", "passed", 1.5)
+
+    with open(report.path, encoding="utf-8") as file:
+        text = file.read()
+    assert re.search(r'<div id="report" data-started="\d+">', text)
+    assert re.search(r'data-duration="1.50" data-ts="\d+"', text)
+    assert OUTCOME_ATTRIBUTE.findall(text) == [('passed', '1.50')]
+
+
+def test_inline_mode_embeds_screenshots(tmp_path):
+    report = SessionReport("r1", str(tmp_path), inline=True)
+    report.add_events([screenshot(tmp_path, "home"),
+                       {'type': 'test_end', 'nodeid': 't.py::test_a', 'outcome': 'passed', 'duration': 1.0}])
+
+    with open(report.path, encoding="utf-8") as file:
+        text = file.read()
+    assert 'src="data:image/png;base64,' in text
+    assert not os.path.exists(tmp_path / "media")
+
+
+def test_external_mode_links_published_media(tmp_path):
+    report = SessionReport("r1", str(tmp_path), inline=False)
+    report.add_events([screenshot(tmp_path, "home"),
+                       {'type': 'test_end', 'nodeid': 't.py::test_a', 'outcome': 'passed', 'duration': 1.0}])
+
+    with open(report.path, encoding="utf-8") as file:
+        text = file.read()
+    assert 'href="media/' + "home" * 8 + '.png"' in text
+    assert "base64" not in text
+
+
+def test_finalize_counts_blocks_once(tmp_path):
+    report = SessionReport("r1", str(tmp_path), inline=False)
+    report.append_test("t.py::test_a", "passed", 1.0)
+    report.append_test("t.py::test_b", "failed", 2.0, error="boom")
+    report.finalize()
+    report.finalize()
+
+    with open(report.path, encoding="utf-8") as file:
+        text = file.read()
+    assert text.count('id="session-complete"') == 1
+    assert "<strong>1</strong>" in text and "<strong>2</strong><br>3.0s" in text
+
+
+def test_figure_and_visual_table_escape_their_values(tmp_path):
+    entry = screenshot(tmp_path, "a<b>")
+    entry['hash'] = 'h"&' * 8
+    assets = ReportAssets(str(tmp_path / "media"), str(tmp_path))
+    assets.thumbnails = ThumbnailGenerator(240, ThumbnailCache(str(tmp_path / "cache")))
+
+    figure = assets.figure_html(entry)
+    table = visual_table_html([{'page': "<home>", 'status': "fail & <x>", 'diff_ratio': 0.5, 'size_changed': False,
+                                'ms': 3, 'diff_path': str(tmp_path / 'd"iff.png')}], str(tmp_path))
+
+    assert "Screenshot: a&lt;b&gt;" in figure and 'href="media/' + 'h&quot;&amp;' * 8 + '.png"' in figure
+    assert "<td>&lt;home&gt;</td>" in table and "fail &amp; &lt;x&gt;" in table and 'href="d%22iff.png"' in table
+
+
+def test_latest_session_report(tmp_path):
+    assert latest_session_report(str(tmp_path / "missing")) is None
+    older = tmp_path / "session_a.html"
+    newer = tmp_path / "session_b.html"
+    for path, mtime in ((older, 1000), (newer, 2000), (tmp_path / "dashboard.html", 3000)):
+        path.write_text("x")
+        os.utime(path, (mtime, mtime))
+
+    assert latest_session_report(str(tmp_path)) == str(newer)
+
+
+def test_publish_defers_missing_thumbnails_until_after_the_run(tmp_path, monkeypatch):
+    Image = pytest.importorskip("PIL.Image")
+    monkeypatch.chdir(tmp_path)
+    source = tmp_path / "home.png"
+    Image.new("RGB", (960, 400), "white").save(source)
+    entry = {'path': str(source), 'step': 'home', 'hash': "a" * 64}
+    cache = ThumbnailCache(str(tmp_path / "cache"))
+    assets = ReportAssets(str(tmp_path / "reports" / "media"), str(tmp_path / "reports"))
+    assets.thumbnails = ThumbnailGenerator(240, cache)
+
+    html = assets.figure_html(entry)
+
+    thumb_href = re.search(r'<img src="([^"]+)"', html).group(1)
+    assert thumb_href.startswith("media/thumbs/") and "onerror=" in html
+    assert assets.deferred == 1 and not (tmp_path / "reports" / thumb_href).exists()
+    assert not os.path.exists(assets.thumbnails.path_for(entry))
+
+    stats = publish_thumbnails([entry, {'path': str(source), 'step': 'other', 'hash': "b" * 64}],
+                               str(tmp_path / "reports" / "media"), assets.thumbnails)
+
+    assert stats['generated'] == 1
+    assert Image.open(tmp_path / "reports" / thumb_href).size[0] == 240
+    assert not (tmp_path / "reports" / "media" / ("b" * 64 + ".png")).exists()
+
+
+@pytest.mark.parametrize("template, fields", [
+    ("plain text, {{braces}}", {}),
+    ("<td>{name}</td><td>{rate:.1f}%</td><td>{count:>4}</td>", {'name': "a&b", 'rate': 12.345, 'count': 7}),
+    ("{value!r} {value!s:>6} {value!a}", {'value': "ồ"}),
+    ("{item[name]} {item[sizes][1]} {number.real}", {'item': {'name': "x", 'sizes': [1, 2]}, 'number': 3}),
+    ("{ratio:{width}.{digits}f}|{name:{fill}^9}", {'ratio': 0.5, 'width': 8, 'digits': 3, 'name': "m", 'fill': "*"}),
+])
+def test_compile_template_matches_str_format(template, fields):
+    assert compile_template(template)(**fields) == template.format(**fields)
+
+
+def test_compile_template_is_cached_and_does_not_evaluate_fields():
+    assert compile_template("{a}") is compile_template("{a}")
+    # Field text is only ever used as a lookup key, never as code
+    with pytest.raises(KeyError):
+        compile_template("{__import__}")()
+    with pytest.raises(ValueError):
+        compile_template("{} and {0}")
+
+
+def test_compile_template_renders_every_report_template():
+    fields = {'title': "T", 'generated': "now", 'index': 1, 'test_id': "t1", 'name': "n", 'status_class': "c",
+              'status': "s", 'time': 5, 'full_href': "f", 'thumb_href': "t", 'label': "l", 'fallback': "",
+              'timestamp': "ts", 'run_id': "r", 'passed': 1, 'failed': 2, 'skipped': 3, 'total': 6,
+              'duration': 1.5, 'seconds': 2.25}
+    for template in (TEST_REPORT_HEAD, TEST_RESULT_ROW, SCREENSHOT_ITEM, HISTORY_ROW, TEST_REPORT_SUMMARY):
+        assert compile_template(template)(**fields) == template.format(**fields)
+
+
+def test_write_test_report_streams_every_history_row(tmp_path):
+    consumed = []
+
+    def history():
+        for number in range(300):
+            consumed.append(number)
+            yield {'timestamp': f"t{number}", 'run_id': f"r{number}", 'passed': 1, 'total': 1, 'duration': 1.0}
+
+    results = [("t1", {'name': "Home", 'status': "Đạt", 'time': 1200}),
+               ("t2", {'name': "Cart", 'status': "Lỗi", 'time': 800})]
+    counts = write_test_report(str(tmp_path / "report.html"), results, history=history())
+
+    with open(tmp_path / "report.html", encoding="utf-8") as file:
+        text = file.read()
+    assert counts == {'passed': 1, 'failed': 1, 'skipped': 0}
+    assert len(consumed) == 300
+    assert text.count("<td>r") == 300 and "<td>r0</td>" in text and "<td>r299</td>" in text
@@ -0,0 +1,133 @@
+import gzip
+import json
+import logging
+import os
+import tarfile
+import time
+
+import pytest
+
+from lazada_retention import RetentionEngine, RetentionPolicy
+from lazada_screenshots import ScreenshotStore
+
+DAY = 86400
+
+
+@pytest.fixture
+def workdir(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    os.makedirs('reports')
+    return tmp_path
+
+
+def make_engine(store=None, **policy):
+    policy.setdefault('max_total_bytes', 1024 * 1024 * 1024)
+    return RetentionEngine(store or ScreenshotStore(), RetentionPolicy(**policy),
+                           history_path=os.path.join('test_data', 'test_history.json'))
+
+
+def write_file(path, content, age_days=0):
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    with open(path, "w", encoding="utf-8") as file:
+        file.write(content)
+    stamp = time.time() - age_days * DAY
+    os.utime(path, (stamp, stamp))
+
+
+def test_plan_expires_runs_beyond_keep_runs(workdir):
+    store = ScreenshotStore()
+    for run_id in ('r1', 'r2', 'r3'):
+        store.put(run_id.encode(), '.png', run_id, 'test_a', 'step')
+        time.sleep(0.01)
+    assert make_engine(store, keep_runs=2).plan() == ['r1']
+
+
+def test_plan_keeps_failed_runs_and_expires_by_age(workdir):
+    store = ScreenshotStore()
+    for run_id in ('r1', 'r2'):
+        store.put(run_id.encode(), '.png', run_id, 'test_a', 'step')
+    os.makedirs('test_data')
+    with open(os.path.join('test_data', 'test_history.json'), "w") as file:
+        json.dump([{'run_id': 'r1', 'failed': 1}], file)
+    assert make_engine(store, max_age_days=14).plan(now=time.time() + 15 * DAY) == ['r2']
+
+
+def test_plan_counts_shared_objects_once(workdir):
+    store = ScreenshotStore()
+    store.put(b"x" * 1000, '.png', 'r1', 'test_a', 'step')
+    store.put(b"x" * 1000, '.png', 'r2', 'test_a', 'step')
+    store.put(b"y" * 10, '.png', 'r3', 'test_a', 'step')
+    # Dropping r1 alone frees nothing, so the size budget has to take r2 as well
+    assert make_engine(store, max_total_bytes=500).plan() == ['r1', 'r2']
+
+
+def test_archive_reports_expires_only_top_level_html(workdir):
+    write_file(os.path.join('reports', 'old.html'), '<img src="media/aaa.png">', age_days=30)
+    write_file(os.path.join('reports', 'new.html'), '<img src="media/bbb.png">')
+    write_file(os.path.join('reports', 'tracing.jsonl'), '{}\n', age_days=30)
+    write_file(os.path.join('reports', 'events', 'run.jsonl'), '{}\n', age_days=30)
+    write_file(os.path.join('reports', 'media', 'bbb.png'), 'b', age_days=30)
+    os.makedirs('archive')
+
+    count, _, _ = make_engine(max_age_days=14)._archive_reports(time.time(), 'stamp')
+
+    assert count == 1
+    assert not os.path.exists(os.path.join('reports', 'old.html'))
+    for kept in ('new.html', 'tracing.jsonl', os.path.join('events', 'run.jsonl'), os.path.join('media', 'bbb.png')):
+        assert os.path.exists(os.path.join('reports', kept))
+    with tarfile.open(os.path.join('archive', 'reports_stamp.tar.gz')) as bundle:
+        assert bundle.getnames() == ['old.html']
+
+
+def test_archive_reports_removes_media_only_when_unreferenced(workdir):
+    # Old media objects shared with a fresh report must survive, whatever their mtime
+    write_file(os.path.join('reports', 'old.html'), '<a href="media/shared.png"><img src="media/thumbs/old.jpg"></a>',
+               age_days=30)
+    write_file(os.path.join('reports', 'new.html'), '<a href="media/shared.png?x=1"></a>')
+    write_file(os.path.join('reports', 'media', 'shared.png'), 's', age_days=30)
+    write_file(os.path.join('reports', 'media', 'thumbs', 'old.jpg'), 'o', age_days=30)
+    write_file(os.path.join('reports', 'media', 'orphan.png'), 'x', age_days=30)
+    os.makedirs('archive')
+    engine = make_engine(max_age_days=14)
+    # ctime cannot be set back, so look at the media from far enough in the future
+    count, _, _ = engine._archive_reports(time.time() + 2 * DAY, 'stamp')
+
+    assert count == 3
+    assert os.path.exists(os.path.join('reports', 'media', 'shared.png'))
+    assert not os.path.exists(os.path.join('reports', 'media', 'thumbs', 'old.jpg'))
+    assert not os.path.exists(os.path.join('reports', 'media', 'orphan.png'))
+
+
+def test_archive_reports_keeps_fresh_unreferenced_media(workdir):
+    write_file(os.path.join('reports', 'media', 'publishing.png'), 'p')
+    os.makedirs('archive')
+    assert make_engine()._archive_reports(time.time(), 'stamp') == (0, 0, 0)
+    assert os.path.exists(os.path.join('reports', 'media', 'publishing.png'))
+
+
+def test_rotate_logs_renames_and_reopens_handler(workdir):
+    handler = logging.FileHandler('app.log', encoding="utf-8")
+    root = logging.getLogger()
+    root.addHandler(handler)
+    previous_level = root.level
+    root.setLevel(logging.INFO)
+    try:
+        root.info("before rotation " + "x" * 200)
+        handler.flush()
+        os.makedirs('archive')
+        engine = RetentionEngine(ScreenshotStore(), RetentionPolicy(max_log_bytes=100), log_files=('app.log',))
+
+        assert engine._rotate_logs('stamp')[0] == 1
+        root.info("after rotation")
+        handler.flush()
+    finally:
+        root.removeHandler(handler)
+        root.setLevel(previous_level)
+        handler.close()
+
+    with gzip.open(os.path.join('archive', 'app_stamp.log.gz'), "rt", encoding="utf-8") as file:
+        assert "before rotation" in file.read()
+    with open('app.log', encoding="utf-8") as file:
+        content = file.read()
+    assert "after rotation" in content and "before rotation" not in content
+    assert not os.path.exists('app.log.stamp')
@@ -0,0 +1,135 @@
+import asyncio
+import os
+
+import pytest
+
+from lazada_screenshots import FailureFrameBuffer, ScreenshotStore, ScreenshotWriter
+
+
+@pytest.fixture
+def store(tmp_path):
+    return ScreenshotStore(str(tmp_path / "screenshots"))
+
+
+def test_identical_images_are_stored_once(store):
+    first = store.put(b"same", ".png", "r1", "t.py::test_a", "home")
+    second = store.put(b"same", ".png", "r2", "t.py::test_b", "home")
+
+    assert first['hash'] == second['hash'] and first['path'] == second['path']
+    assert (store.stored, store.deduplicated) == (1, 1)
+    assert len(store.entries()) == 2
+
+
+def test_prune_keeps_newest_entries_and_shared_objects(store):
+    shared = store.put(b"shared", ".png", "r1", "t.py::test_a", "home")
+    old = store.put(b"old", ".png", "r1", "t.py::test_a", "search")
+    store.put(b"shared", ".png", "r2", "t.py::test_a", "home")
+    new = store.put(b"new", ".png", "r2", "t.py::test_a", "search")
+
+    removed = store.prune(2)
+
+    assert removed == 1
+    assert not os.path.exists(old['path'])
+    assert os.path.exists(shared['path']) and os.path.exists(new['path'])
+    assert [(entry['run'], entry['step']) for entry in store.entries()] == [("r2", "home"), ("r2", "search")]
+
+
+def test_prune_to_zero_removes_every_object(store):
+    entries = [store.put(data, ".png", "r1", "t.py::test_a", step) for data, step in ((b"a", "one"), (b"b", "two"))]
+
+    assert store.prune(0) == 2
+    assert store.entries() == []
+    assert not any(os.path.exists(entry['path']) for entry in entries)
+
+
+def test_index_lookups_by_run_test_and_step(store):
+    store.put(b"a", ".png", "r1", "t.py::test_a", "home")
+    store.put(b"b", ".png", "r1", "t.py::test_b", "home")
+    retaken = store.put(b"c", ".png", "r1", "t.py::test_a", "home")
+    store.put(b"d", ".png", "r2", "t.py::test_a", "cart")
+
+    assert store.lookup("r1", "t.py::test_a", "home") == retaken
+    assert store.lookup("r1", "t.py::test_a", "cart") is None
+    assert [entry['step'] for entry in store.entries(run_id="r1", test="t.py::test_a")] == ["home", "home"]
+    assert [entry['hash'] for entry in store.latest(limit=2, test="t.py::test_a")] == [
+        store.lookup("r2", "t.py::test_a", "cart")['hash'], retaken['hash']]
+    assert list(store.runs()) == ["r1", "r2"]
+
+
+def test_index_picks_up_entries_from_other_processes_and_rewrites(store):
+    other = ScreenshotStore(store.root)
+    assert store.entries() == []
+    other.put(b"a", ".png", "r1", "t.py::test_a", "home")
+    other.put(b"b", ".png", "r1", "t.py::test_a", "cart")
+    assert len(store.entries(run_id="r1")) == 2
+
+    other.prune(1)
+    assert [entry['step'] for entry in store.entries()] == ["cart"]
+
+
+def test_index_leaves_a_partial_line_for_the_next_refresh(store):
+    store.put(b"a", ".png", "r1", "t.py::test_a", "home")
+    entry = store.put(b"b", ".png", "r1", "t.py::test_a", "cart")
+    with open(store.index_path, "rb") as file:
+        lines = file.read().splitlines(keepends=True)
+    with open(store.index_path, "wb") as file:
+        file.write(lines[0] + lines[1][:20])
+
+    assert len(ScreenshotStore(store.root).entries()) == 1
+    reader = ScreenshotStore(store.root)
+    reader.entries()
+    with open(store.index_path, "ab") as file:
+        file.write(lines[1][20:])
+    assert reader.entries()[-1] == entry
+
+
+def test_tail_skips_history(store):
+    store.put(b"a", ".png", "r1", "t.py::test_a", "home")
+    tail = ScreenshotStore(store.root, tail=True)
+    store.put(b"b", ".png", "r2", "t.py::test_a", "home")
+
+    assert [entry['run'] for entry in tail.entries()] == ["r2"]
+
+
+def test_recent_reads_the_manifest_backwards_across_blocks(store):
+    # Long steps so the newest entries span several 64 KB blocks
+    for number in range(300):
+        store.put(str(number).encode(), ".png", "r1", "t.py::test_a", f"{number:04d}_" + "x" * 600)
+
+    fresh = ScreenshotStore(store.root)
+    recent = fresh.recent(150)
+
+    assert [entry['step'][:4] for entry in recent] == [f"{number:04d}" for number in range(299, 149, -1)]
+    # Served from the in-memory mirror once it is loaded
+    fresh.entries()
+    assert fresh.recent(3) == recent[:3]
+    assert ScreenshotStore(store.root + "_missing").recent(3) == []
+
+
+def test_writer_pool_counts_every_write(store):
+    writer = ScreenshotWriter(store, max_workers=8, max_pending=64)
+
+    async def run():
+        for number in range(200):
+            await writer.submit(("r1", "t.py::test_a", f"step{number}"), str(number % 150).encode(), label="png")
+        await writer.flush()
+
+    asyncio.run(run())
+    stats = writer.stats()
+
+    assert stats['written'] == 200 and stats['formats']['png']['count'] == 200
+    assert stats['bytes'] == sum(len(str(number % 150)) for number in range(200))
+    assert (store.stored, store.deduplicated) == (150, 50)
+    assert len(store.entries(run_id="r1")) == 200
+
+
+def test_failure_frames_keep_their_capture_time(store):
+    frames = FailureFrameBuffer(size=2)
+    for step in ("home", "search", "cart"):
+        frames.add(step, step.encode())
+    captured = [timestamp for _, timestamp, _ in frames.frames]
+
+    entries = frames.persist(store, "r1", "t.py::test_a")
+
+    assert [(entry['step'], entry['timestamp']) for entry in entries] == list(zip(["search", "cart"], captured))
+    assert not frames.frames
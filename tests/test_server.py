@@ -0,0 +1,80 @@
+import gzip
+import http.client
+
+import pytest
+
+from lazada_server import ReportServer
+
+BODY = b"<html>" + b"0123456789" * 100 + b"</html>"
+
+
+@pytest.fixture(scope="module")
+def server(tmp_path_factory):
+    tmp_path = tmp_path_factory.mktemp("served")
+    (tmp_path / "reports").mkdir()
+    (tmp_path / "reports" / "session_r1.html").write_bytes(BODY)
+    (tmp_path / "reports" / "trace.zip").write_bytes(bytes(range(256)))
+    (tmp_path / "secret.txt").write_text("no")
+    server = ReportServer(root=str(tmp_path), port=0).start()
+    yield server
+    server.stop()
+
+
+def get(server, path, **headers):
+    connection = http.client.HTTPConnection("127.0.0.1", server.port, timeout=5)
+    try:
+        connection.request("GET", path, headers=headers)
+        response = connection.getresponse()
+        return response.status, response.headers, response.read()
+    finally:
+        connection.close()
+
+
+def test_serves_only_the_served_directories(server):
+    assert get(server, "/reports/session_r1.html")[0] == 200
+    assert get(server, "/secret.txt")[0] == 404
+    assert get(server, "/reports/../secret.txt")[0] == 404
+
+
+def test_gzip_has_its_own_etag(server):
+    status, headers, body = get(server, "/reports/session_r1.html", **{"Accept-Encoding": "gzip"})
+    assert status == 200 and headers["Content-Encoding"] == "gzip"
+    assert gzip.decompress(body) == BODY
+    assert headers["ETag"].endswith('-gz"') and headers["Vary"] == "Accept-Encoding"
+
+    _, plain_headers, plain_body = get(server, "/reports/session_r1.html")
+    assert plain_body == BODY and "Content-Encoding" not in plain_headers
+    assert plain_headers["ETag"] != headers["ETag"]
+
+    # Each validator only revalidates its own representation
+    assert get(server, "/reports/session_r1.html",
+               **{"Accept-Encoding": "gzip", "If-None-Match": headers["ETag"]})[0] == 304
+    assert get(server, "/reports/session_r1.html", **{"If-None-Match": headers["ETag"]})[0] == 200
+    assert get(server, "/reports/session_r1.html", **{"If-None-Match": plain_headers["ETag"]})[0] == 304
+
+
+@pytest.mark.parametrize("range_header, content_range, body", [
+    ("bytes=10-19", "bytes 10-19/256", bytes(range(10, 20))),
+    ("bytes=250-", "bytes 250-255/256", bytes(range(250, 256))),
+    ("bytes=-3", "bytes 253-255/256", bytes(range(253, 256))),
+    ("bytes=250-999", "bytes 250-255/256", bytes(range(250, 256))),
+])
+def test_single_byte_ranges(server, range_header, content_range, body):
+    status, headers, received = get(server, "/reports/trace.zip", Range=range_header)
+    assert status == 206 and headers["Content-Range"] == content_range and received == body
+
+
+@pytest.mark.parametrize("range_header", ["bytes=5-3", "bytes=0-1,5-6", "items=0-1"])
+def test_invalid_or_multiple_ranges_get_the_whole_file(server, range_header):
+    status, _, received = get(server, "/reports/trace.zip", Range=range_header)
+    assert status == 200 and received == bytes(range(256))
+
+
+def test_unsatisfiable_range(server):
+    status, headers, _ = get(server, "/reports/trace.zip", Range="bytes=300-")
+    assert status == 416 and headers["Content-Range"] == "bytes */256"
+
+
+def test_if_range_with_a_stale_etag_sends_the_whole_file(server):
+    status, _, received = get(server, "/reports/trace.zip", Range="bytes=0-9", **{"If-Range": '"stale"'})
+    assert status == 200 and len(received) == 256
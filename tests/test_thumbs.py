@@ -0,0 +1,125 @@
+import json
+import os
+
+import pytest
+
+from lazada_thumbs import ThumbnailCache, ThumbnailGenerator
+
+KB = 1024
+
+
+def write_thumb(cache, name, size=KB):
+    path = os.path.join(cache.cache_dir, name[:2], f"{name}.jpg")
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "wb") as file:
+        file.write(b"x" * size)
+    return path
+
+
+def thumbs_on_disk(cache_dir):
+    return sorted(name for _, _, names in os.walk(cache_dir) for name in names if name.endswith(".jpg"))
+
+
+def index_names(cache):
+    with open(cache.index_path, encoding="utf-8") as file:
+        return sorted(os.path.basename(item[0]) for item in json.load(file))
+
+
+def test_evicts_least_recently_used(tmp_path):
+    cache = ThumbnailCache(str(tmp_path), max_bytes=3 * KB)
+    paths = [write_thumb(cache, f"{n:02d}aa") for n in range(3)]
+    for path in paths:
+        cache.add(path)
+    cache.add(paths[0])  # touched again, so 01aa is now the oldest
+    cache.add(write_thumb(cache, "03aa"))
+    cache.flush()
+
+    assert thumbs_on_disk(str(tmp_path)) == ["00aa.jpg", "02aa.jpg", "03aa.jpg"]
+    assert index_names(cache) == thumbs_on_disk(str(tmp_path))
+    assert cache.total == 3 * KB
+
+
+def test_processes_sharing_the_directory_merge_their_indexes(tmp_path):
+    # Two caches on one directory stand for the GUI and a pytest subprocess
+    gui = ThumbnailCache(str(tmp_path), max_bytes=100 * KB)
+    runner = ThumbnailCache(str(tmp_path), max_bytes=100 * KB)
+    for n in range(3):
+        gui.add(write_thumb(gui, f"{n:02d}gu"))
+        runner.add(write_thumb(runner, f"{n:02d}ru"))
+    gui.flush()
+    runner.flush()
+
+    assert len(index_names(runner)) == 6
+    assert index_names(runner) == thumbs_on_disk(str(tmp_path))
+
+
+def test_budget_holds_across_processes(tmp_path):
+    gui = ThumbnailCache(str(tmp_path), max_bytes=4 * KB)
+    runner = ThumbnailCache(str(tmp_path), max_bytes=4 * KB)
+    for n in range(3):
+        gui.add(write_thumb(gui, f"{n:02d}gu"))
+    gui.flush()
+    for n in range(3):
+        runner.add(write_thumb(runner, f"{n:02d}ru"))
+    runner.flush()
+    gui.flush()
+
+    on_disk = thumbs_on_disk(str(tmp_path))
+    assert len(on_disk) == 4
+    assert "00gu.jpg" not in on_disk and "01gu.jpg" not in on_disk
+    assert index_names(gui) == on_disk
+
+
+def test_entries_evicted_elsewhere_are_dropped(tmp_path):
+    gui = ThumbnailCache(str(tmp_path), max_bytes=100 * KB)
+    path = write_thumb(gui, "00aa")
+    gui.add(path)
+    gui.flush()
+    runner = ThumbnailCache(str(tmp_path), max_bytes=KB)
+    runner.add(write_thumb(runner, "01aa"))
+    runner.flush()
+    assert not os.path.exists(path)
+    gui.add(write_thumb(gui, "02aa"))
+    gui.flush()
+
+    assert index_names(gui) == ["01aa.jpg", "02aa.jpg"]
+    assert gui.total == 2 * KB
+
+
+def test_adopts_existing_files_without_index(tmp_path):
+    seed = ThumbnailCache(str(tmp_path), max_bytes=100 * KB)
+    write_thumb(seed, "00aa")
+    write_thumb(seed, "01aa")
+    cache = ThumbnailCache(str(tmp_path), max_bytes=100 * KB)
+    assert cache.total == 2 * KB
+    cache.flush()
+    assert index_names(cache) == ["00aa.jpg", "01aa.jpg"]
+
+
+def test_render_and_hit(tmp_path):
+    Image = pytest.importorskip("PIL.Image")
+    source = str(tmp_path / "shot.png")
+    Image.new("RGB", (1200, 3000), "white").save(source)
+    cache = ThumbnailCache(str(tmp_path / "thumbs"), max_bytes=100 * KB)
+
+    path = cache.get(source, (480, None))
+    assert cache.get(source, (480, None)) == path
+    assert (cache.misses, cache.hits) == (1, 1)
+    with Image.open(path) as thumb:
+        assert thumb.size == (480, 1200)
+
+
+def test_generate_marks_reused_thumbnails_as_recently_used(tmp_path):
+    Image = pytest.importorskip("PIL.Image")
+    sources = []
+    for name in ("a", "b"):
+        sources.append(str(tmp_path / f"{name}.png"))
+        Image.new("RGB", (960, 400), "white").save(sources[-1])
+    cache = ThumbnailCache(str(tmp_path / "thumbs"), max_bytes=100 * KB)
+    generator = ThumbnailGenerator(240, cache)
+    reused, other = ({'path': source} for source in sources)
+    generator.generate([reused, other])
+    cache.add(generator.path_for(other))
+
+    assert generator.generate([reused])['skipped'] == 1
+    assert list(cache._files)[-1] == os.path.relpath(generator.path_for(reused), cache.cache_dir)
@@ -0,0 +1,134 @@
+import io
+import os
+
+import pytest
+
+np = pytest.importorskip("numpy")
+Image = pytest.importorskip("PIL.Image")
+
+from lazada_screenshots import ScreenshotStore
+from lazada_visual import BKTree, PerceptualIndex, VisualRegression, dhash, diff_arrays, hamming
+
+
+def png(array):
+    buffer = io.BytesIO()
+    Image.fromarray(array).save(buffer, format="PNG")
+    return buffer.getvalue()
+
+
+def test_diff_arrays_thresholds_each_channel():
+    baseline = np.zeros((4, 4, 3), dtype=np.uint8)
+    current = baseline.copy()
+    current[0, 0] = (30, 0, 0)   # over the threshold on one channel
+    current[1, 1] = (0, 20, 20)  # under it on every channel
+    current[2, 2] = (0, 0, 200)
+    baseline[3, 3] = (200, 0, 0)  # darker now: must not wrap around on uint8
+
+    changed = diff_arrays(baseline, current, threshold=24)
+
+    assert changed.dtype == bool and changed.shape == (4, 4)
+    assert {tuple(point) for point in np.argwhere(changed)} == {(0, 0), (2, 2), (3, 3)}
+
+
+def test_diff_arrays_masks_rects_and_flags_size_changes():
+    baseline = np.zeros((4, 4, 3), dtype=np.uint8)
+    current = np.full((6, 4, 3), 255, dtype=np.uint8)
+
+    changed = diff_arrays(baseline, current, rects=[(0, 0, 2, 6)])
+
+    assert changed.shape == (6, 4)
+    assert not changed[:, :2].any()
+    assert changed[:, 2:].all()
+
+
+def test_check_needs_update_mode_to_create_a_baseline(tmp_path):
+    data = png(np.zeros((10, 10, 3), dtype=np.uint8))
+    report = VisualRegression("report", baseline_dir=str(tmp_path / "baselines"), diff_dir=str(tmp_path / "diffs"),
+                              masks_path=str(tmp_path / "masks.json"))
+    assert report.check("homepage", data)['status'] == 'no baseline'
+    assert not os.path.exists(report.baseline_path("homepage"))
+
+    update = VisualRegression("update", baseline_dir=report.baseline_dir, diff_dir=report.diff_dir,
+                              masks_path=str(tmp_path / "masks.json"))
+    assert update.check("homepage", data)['status'] == 'updated'
+    assert report.check("homepage", data)['status'] == 'pass'
+
+
+def test_check_fails_and_writes_diff_over_tolerance(tmp_path):
+    baseline = np.zeros((10, 10, 3), dtype=np.uint8)
+    current = baseline.copy()
+    current[:5] = 255
+    visual = VisualRegression("update", tolerance=0.1, baseline_dir=str(tmp_path / "baselines"),
+                              diff_dir=str(tmp_path / "diffs"), masks_path=str(tmp_path / "masks.json"))
+    visual.check("homepage", png(baseline))
+    visual.mode = "report"
+
+    result = visual.check("homepage", png(current), run_id="r1")
+
+    assert result['status'] == 'fail'
+    assert result['diff_ratio'] == 0.5
+    assert os.path.exists(result['diff_path'])
+    # Masking the changed half brings it back under tolerance
+    assert visual.check("homepage", png(current), rects=[(0, 0, 10, 5)])['status'] == 'pass'
+
+
+def gradient(width=320, height=240, flip=False):
+    row = np.linspace(0, 255, width, dtype=np.uint8)
+    array = np.repeat(np.tile(row, (height, 1))[:, :, None], 3, axis=2)
+    array[height // 3:height // 2, width // 4:width // 2] = 30  # a dark block breaks the monotone gradient
+    return array[:, ::-1].copy() if flip else array
+
+
+def jpeg(array, quality=60):
+    buffer = io.BytesIO()
+    Image.fromarray(array).save(buffer, format="JPEG", quality=quality)
+    return buffer.getvalue()
+
+
+def test_dhash_is_stable_across_encodings_and_sources(tmp_path):
+    path = tmp_path / "shot.png"
+    path.write_bytes(png(gradient()))
+
+    assert dhash(str(path)) == dhash(png(gradient()))
+    assert hamming(dhash(png(gradient())), dhash(jpeg(gradient()))) <= 4
+    assert hamming(dhash(png(gradient())), dhash(png(gradient(flip=True)))) > 20
+
+
+def test_dhash_of_a_tall_capture_matches_its_scaled_down_version():
+    tall = gradient(1366, 6000)
+    small = np.asarray(Image.fromarray(tall).resize((136, 600), Image.BILINEAR))
+
+    assert hamming(dhash(png(tall)), dhash(png(small))) <= 4
+
+
+def test_bktree_search_matches_brute_force():
+    rng = np.random.default_rng(7)
+    values = [int(value) for value in rng.integers(0, 2 ** 63, size=500, dtype=np.int64)]
+    values += [values[0], values[1] ^ 0b101]  # a duplicate and a near neighbour
+    tree = BKTree()
+    for position, value in enumerate(values):
+        tree.add(value, position)
+
+    assert tree.size == len(values)
+    for query in values[:20]:
+        for max_distance in (0, 3, 20):
+            expected = {(hamming(query, value), position) for position, value in enumerate(values)
+                        if hamming(query, value) <= max_distance}
+            assert set(tree.search(query, max_distance)) == expected
+    assert BKTree().search(0, 64) == []
+
+
+def test_perceptual_index_hashes_new_objects_once_and_maps_back_to_entries(tmp_path):
+    store = ScreenshotStore(str(tmp_path / "screenshots"))
+    store.put(png(gradient()), ".png", "r1", "t.py::test_a", "home")
+    store.put(png(gradient(flip=True)), ".png", "r1", "t.py::test_a", "cart")
+    newest = store.put(png(gradient()), ".png", "r2", "t.py::test_a", "home")
+    index_path = str(tmp_path / "screenshots" / "phash.jsonl")
+
+    index = PerceptualIndex(store, index_path)
+    assert index.update() == 2
+    assert index.update() == 0
+
+    matches = PerceptualIndex(store, index_path).query(jpeg(gradient()), max_distance=6)
+    assert [match['entry']['run'] for match in matches] == ["r2", "r1"]
+    assert matches[0]['entry'] == newest